@@ -0,0 +1,710 @@
+"""
+Vectorised analyses over the pain history.
+
+The history is turned into NumPy arrays once: a sparse hour × region matrix in CSR
+layout (see :func:`hourly_readings`), from which each analysis takes the dense
+series it needs for the regions that actually have readings. Results are cached per
+data version, so screens can ask for them on every entry at no cost until the data
+changes.
+"""
+import numpy as np
+
+import data_store
+from data_store import PAIN_SECTIONS
+
+_cache = {}
+
+
+def cached(name: str, data: dict, compute, *args):
+    """
+    Return ``compute(data, *args)``, reusing the previous result while the data
+    version is unchanged.
+
+    :param name: Cache slot for this analysis.
+    :param data: The loaded data dictionary.
+    :param compute: The analysis function.
+    :return: The (possibly cached) result.
+    """
+    key = (name, args)
+    token = data_store.data_token(data)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] == token and token[0] is not None:
+        return hit[1]
+    result = compute(data, *args)
+    _cache[key] = (token, result)
+    return result
+
+
+def hourly_readings(data: dict) -> tuple:
+    """
+    Build the sparse hour × region matrix of pain readings in CSR layout.
+
+    Only the regions scored in an hour take space, so a fine region map costs no more
+    than the readings actually taken.
+
+    :param data: The loaded data dictionary.
+    :return: (hours, indptr, regions, values): ``hours`` is a sorted int64 array of
+             hours since the epoch; the readings of ``hours[i]`` are
+             ``regions[indptr[i]:indptr[i + 1]]`` (column indices into PAIN_SECTIONS,
+             ascending) and the matching ``values``.
+    """
+    keys, columns, readings = [], [], []
+    for sec in data_store.present_sections(data):
+        col = PAIN_SECTIONS.index(sec)
+        for entry in data.get(sec, []):
+            ts = entry.get("timestamp")
+            if isinstance(ts, str) and len(ts) == 19:
+                keys.append(ts)
+                columns.append(col)
+                readings.append(entry.get("value", 0))
+    if not keys:
+        return (np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                np.empty(0, dtype=np.int64), np.empty(0))
+    stamps = np.array(keys, dtype="datetime64[h]").astype(np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    values = np.asarray(readings, dtype=float)
+    order = np.lexsort((columns, stamps))
+    stamps, columns, values = stamps[order], columns[order], values[order]
+    # A region read twice in one hour keeps its last reading.
+    last = np.append((stamps[1:] != stamps[:-1]) | (columns[1:] != columns[:-1]), True)
+    stamps, columns, values = stamps[last], columns[last], values[last]
+    hours, starts = np.unique(stamps, return_index=True)
+    return hours, np.append(starts, len(stamps)), columns, values
+
+
+def _row_index(indptr: np.ndarray) -> np.ndarray:
+    """
+    :return: The row (hour position) of every stored reading.
+    """
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def region_series(readings: tuple, metric: str) -> np.ndarray:
+    """
+    :param readings: The output of :func:`hourly_readings`.
+    :param metric: "Pain (Arb.)" or one of PAIN_SECTIONS.
+    :return: The metric per hour of ``readings``, NaN where the region was not scored.
+    """
+    hours, indptr, regions, values = readings
+    if metric == "Pain (Arb.)":
+        return pain_arb_sparse(indptr, values)
+    series = np.full(len(hours), np.nan)
+    mask = regions == PAIN_SECTIONS.index(metric)
+    series[_row_index(indptr)[mask]] = values[mask]
+    return series
+
+
+def pain_arb_sparse(indptr: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Pain (Arb.) of every row of the CSR readings, missing regions counting as 0.
+
+    :return: Pain (Arb.) per hour.
+    """
+    if len(indptr) < 2:
+        return np.empty(0)
+    sums = np.add.reduceat(values, indptr[:-1])
+    nonzero = np.add.reduceat((values > 0).astype(float), indptr[:-1])
+    return sums / float(data_store.ARB_REGION_COUNT) * nonzero / 3.0
+
+
+def pain_arb_array(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorised Pain (Arb.) of dense rows: (sum / ARB_REGION_COUNT) × non-zero
+    count / 3, as data_store.pain_arb. Columns for regions without readings may be
+    left out.
+
+    :param values: Array (rows, regions), NaN where a region has no reading.
+    :return: Pain (Arb.) per row.
+    """
+    filled = np.nan_to_num(values, nan=0.0)
+    avg = filled.sum(axis=1) / float(data_store.ARB_REGION_COUNT)
+    return avg * (filled > 0).sum(axis=1) / 3.0
+
+
+def daily_means(readings: tuple) -> tuple:
+    """
+    Average the sparse hourly readings per calendar day.
+
+    :param readings: The output of :func:`hourly_readings`.
+    :return: (days, columns, region_means, arb_means): ``days`` as int64 days since the
+             epoch, the region columns that have readings, their per-day means of the
+             readings present (array (days, len(columns)), NaN if none that day) and
+             the daily mean Pain (Arb.).
+    """
+    hours, indptr, regions, values = readings
+    if not len(hours):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 0)), np.empty(0)
+    days, inverse = np.unique(hours // 24, return_inverse=True)
+    columns, position = np.unique(regions, return_inverse=True)
+    cell = inverse[_row_index(indptr)] * len(columns) + position
+    size = len(days) * len(columns)
+    counts = np.bincount(cell, minlength=size).reshape(len(days), len(columns))
+    sums = np.bincount(cell, weights=values, minlength=size).reshape(len(days), len(columns))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        region_means = np.where(counts > 0, sums / counts, np.nan)
+    arb_means = np.bincount(inverse, weights=pain_arb_sparse(indptr, values)) / np.bincount(inverse)
+    return days, columns, region_means, arb_means
+
+
+def day_hour_grid(data: dict, metric: str = "Pain (Arb.)") -> tuple:
+    """
+    Lay one metric out as a dense day × hour-of-day grid, ready for a single image.
+
+    :param data: The loaded data dictionary.
+    :param metric: "Pain (Arb.)" or one of PAIN_SECTIONS.
+    :return: (first_day, grid): ``first_day`` as int64 days since the epoch (None if
+             there is no data) and ``grid`` a float array of shape (days, 24) with NaN
+             where nothing was recorded.
+    """
+    readings = hourly_readings(data)
+    hours = readings[0]
+    if not len(hours):
+        return None, np.empty((0, 24))
+    series = region_series(readings, metric)
+    first_day = int(hours[0] // 24)
+    grid = np.full((int(hours[-1] // 24) - first_day + 1, 24), np.nan)
+    grid[hours // 24 - first_day, hours % 24] = series
+    return first_day, grid
+
+
+def correlation(x: np.ndarray, y: np.ndarray):
+    """
+    :return: The Pearson correlation over the pairs where both values are finite, or
+             None with fewer than three pairs or no variance.
+    """
+    mask = np.isfinite(x) & np.isfinite(y)
+    if mask.sum() < 3:
+        return None
+    x, y = x[mask], y[mask]
+    if x.std() == 0 or y.std() == 0:
+        return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def sleep_pain_correlation(data: dict) -> dict:
+    """
+    Correlate each night's sleep with the pain of the day that follows it.
+
+    A sleep entry dated D describes the night ending on the morning of D (it is
+    logged as that day's sleep), so it is joined with the pain recorded on D.
+
+    :param data: The loaded data dictionary.
+    :return: {"nights": number of nights with pain data the next day,
+              "hours": {metric: r}, "quality": {metric: r}} where metric is
+              "Pain (Arb.)" or a region with readings and r may be None.
+    """
+    days, columns, region_means, arb_means = daily_means(hourly_readings(data))
+
+    by_date = {}
+    for entry in data.get("sleep_data", []):
+        by_date[entry.get("date", "")] = entry
+    dates = [d for d in by_date if len(d) == 10]
+    result = {"nights": 0, "hours": {}, "quality": {}}
+    if not dates or not len(days):
+        return result
+    sleep_days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+    sleep_hours = np.array([float(by_date[d].get("hours_slept", np.nan)) for d in dates])
+    sleep_quality = np.array([float(by_date[d].get("sleep_quality", np.nan)) for d in dates])
+
+    pos = np.clip(np.searchsorted(days, sleep_days), 0, len(days) - 1)
+    matched = days[pos] == sleep_days
+    result["nights"] = int(matched.sum())
+    pos, sleep_hours, sleep_quality = pos[matched], sleep_hours[matched], sleep_quality[matched]
+
+    metrics = {"Pain (Arb.)": arb_means[pos]}
+    for i, col in enumerate(columns):
+        metrics[PAIN_SECTIONS[col]] = region_means[pos, i]
+    for name, series in metrics.items():
+        result["hours"][name] = correlation(sleep_hours, series)
+        result["quality"][name] = correlation(sleep_quality, series)
+    return result
+
+
+MAX_LAG = 48
+ACTIVITY_LEVELS = 5
+# Lagged sums are computed directly below this many multiply-adds, via FFT above it.
+DIRECT_LAG_LIMIT = 200000
+
+
+def response_metrics(data: dict) -> list:
+    """
+    :return: The metrics tracked by the engines below: Pain (Arb.) first, then every
+             region that has readings.
+    """
+    return ["Pain (Arb.)"] + data_store.present_sections(data)
+
+
+def _lagged_dot(a: np.ndarray, b: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    :return: c[k] = sum_t a[t] * b[t + k] for k in 0..max_lag.
+    """
+    n = len(a)
+    lags = min(max_lag, n - 1) + 1 if n else 0
+    out = np.zeros(max_lag + 1)
+    if not lags:
+        return out
+    if n * lags <= DIRECT_LAG_LIMIT:
+        for k in range(lags):
+            out[k] = a[:n - k] @ b[k:]
+        return out
+    size = 1 << (2 * n - 1).bit_length()
+    cc = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+    out[:lags] = cc[:lags]
+    return out
+
+
+def _entries_from(data: dict, start_key: str, sections: list):
+    """
+    Yield (hour key, column, value) pain readings and (hour key, level) activities at or
+    after ``start_key`` (all of them when it is None), comparing keys as strings.
+    Columns index ``sections``.
+    """
+    readings, activities = [], []
+    for col, sec in enumerate(sections):
+        for entry in data.get(sec, []):
+            ts = entry.get("timestamp")
+            if isinstance(ts, str) and len(ts) == 19 and (start_key is None or ts >= start_key):
+                readings.append((ts, col, entry.get("value", 0)))
+    for ts, entries in data.get("activity_data", {}).items():
+        if len(ts) != 19 or (start_key is not None and ts < start_key):
+            continue
+        levels = []
+        for entry in entries:
+            try:
+                levels.append(float(entry.get("activity_level", "")))
+            except (TypeError, ValueError):
+                continue
+        if levels:
+            activities.append((ts, max(levels)))
+    return readings, activities
+
+
+class ActivityResponse:
+    """
+    Lagged relation between logged activity levels and pain in the following hours.
+
+    The history is laid out on a dense hourly grid: ``activity`` holds the highest
+    level logged in each hour (NaN if none) and ``pain`` one column per metric in
+    ``metrics`` (NaN where nothing was recorded). For lags 0..MAX_LAG the engine
+    keeps running sums over all (activity hour t, pain hour t + lag) pairs:
+
+    * the masked moments needed for the Pearson cross-correlation per metric, and
+    * per activity level, the sum and count of pain at t + lag (the response curves).
+
+    Every pair starting at t >= T - MAX_LAG is affected by a change at hour T, so an
+    update subtracts that tail's contribution, refreshes the grid from T on and adds
+    the tail back, instead of recomputing the whole history. A region gaining its
+    first reading adds a metric and rebuilds the engine.
+    """
+
+    def __init__(self, max_lag: int = MAX_LAG, metrics: list = ("Pain (Arb.)",)):
+        self.max_lag = max_lag
+        self.metrics = list(metrics)
+        self.token = None
+        self.origin = None
+        self.activity = np.empty(0)
+        self.pain = np.empty((0, len(self.metrics)))
+        n_metrics = len(self.metrics)
+        self.moments = np.zeros((6, max_lag + 1, n_metrics))
+        self.response_sum = np.zeros((ACTIVITY_LEVELS, max_lag + 1, n_metrics))
+        self.response_count = np.zeros((ACTIVITY_LEVELS, max_lag + 1, n_metrics))
+
+    def _contribution(self, start: int) -> tuple:
+        """
+        :return: (moments, response sums, response counts) of the pairs whose activity
+                 hour is at grid index >= ``start``.
+        """
+        x = self.activity[start:]
+        pain = self.pain[start:]
+        n_metrics = len(self.metrics)
+        moments = np.zeros((6, self.max_lag + 1, n_metrics))
+        response_sum = np.zeros((ACTIVITY_LEVELS, self.max_lag + 1, n_metrics))
+        response_count = np.zeros((ACTIVITY_LEVELS, self.max_lag + 1, n_metrics))
+        mx = np.isfinite(x)
+        if not mx.any():
+            return moments, response_sum, response_count
+        xz = np.where(mx, x, 0.0)
+        mxf = mx.astype(float)
+        for m in range(n_metrics):
+            my = np.isfinite(pain[:, m])
+            yz = np.where(my, pain[:, m], 0.0)
+            myf = my.astype(float)
+            moments[0, :, m] = _lagged_dot(mxf, myf, self.max_lag)
+            moments[1, :, m] = _lagged_dot(xz, myf, self.max_lag)
+            moments[2, :, m] = _lagged_dot(mxf, yz, self.max_lag)
+            moments[3, :, m] = _lagged_dot(xz, yz, self.max_lag)
+            moments[4, :, m] = _lagged_dot(xz * xz, myf, self.max_lag)
+            moments[5, :, m] = _lagged_dot(mxf, yz * yz, self.max_lag)
+
+        levels = np.clip(np.rint(xz), 0, ACTIVITY_LEVELS).astype(int)
+        n = len(x)
+        for level in range(1, ACTIVITY_LEVELS + 1):
+            idx = np.nonzero(mx & (levels == level))[0]
+            for lag in range(self.max_lag + 1):
+                rows = idx[idx + lag < n] + lag
+                if not len(rows):
+                    break
+                values = pain[rows]
+                finite = np.isfinite(values)
+                response_sum[level - 1, lag] = np.where(finite, values, 0.0).sum(axis=0)
+                response_count[level - 1, lag] = finite.sum(axis=0)
+        return moments, response_sum, response_count
+
+    def _fill(self, data: dict, start_key: str) -> None:
+        """
+        Write activities and pain readings at or after ``start_key`` into the grid,
+        growing it as needed. Grid cells from ``start_key`` on must already be NaN.
+        """
+        readings, activities = _entries_from(data, start_key, self.metrics[1:])
+        keys = [ts for ts, _, _ in readings] + [ts for ts, _ in activities]
+        if not keys:
+            return
+        stamps = np.array(keys, dtype="datetime64[h]").astype(np.int64)
+        if self.origin is None:
+            self.origin = int(stamps.min())
+        end = int(stamps.max()) - self.origin + 1
+        if end > len(self.activity):
+            grow = end - len(self.activity)
+            self.activity = np.concatenate([self.activity, np.full(grow, np.nan)])
+            self.pain = np.vstack([self.pain, np.full((grow, len(self.metrics)), np.nan)])
+        idx = stamps - self.origin
+        n_readings = len(readings)
+        if n_readings:
+            rows = idx[:n_readings]
+            cols = np.array([col for _, col, _ in readings]) + 1
+            self.pain[rows, cols] = np.array([v for _, _, v in readings], dtype=float)
+            touched = np.unique(rows)
+            regions = self.pain[touched, 1:]
+            self.pain[touched, 0] = pain_arb_array(regions)
+        if activities:
+            self.activity[idx[n_readings:]] = np.array([level for _, level in activities])
+
+    def _rebuild(self, data: dict) -> None:
+        self.__init__(self.max_lag, response_metrics(data))
+        self._fill(data, None)
+        self.moments, self.response_sum, self.response_count = self._contribution(0)
+
+    def update(self, data: dict) -> "ActivityResponse":
+        """
+        Bring the engine up to date with ``data``, incrementally when the change log
+        allows it.
+
+        :param data: The loaded data dictionary.
+        :return: self.
+        """
+        token = data_store.data_token(data)
+        if self.token is not None and token == self.token and token[0] is not None:
+            return self
+        changed = None
+        if self.token is not None and self.token[0] == token[0] and token[0] is not None:
+            changed = data_store.changes_since(data, self.token[1])
+        hour_changes = sorted(k for k in changed if len(k) == 19) if changed else []
+        first_change = (int(np.datetime64(hour_changes[0], "h").astype(np.int64))
+                        if hour_changes else None)
+
+        if (changed is None or self.origin is None or self.metrics != response_metrics(data)
+                or (first_change is not None and first_change < self.origin)):
+            self._rebuild(data)
+        elif first_change is not None:
+            start = max(0, min(first_change - self.origin, len(self.activity)) - self.max_lag)
+            moments, response_sum, response_count = self._contribution(start)
+            self.moments -= moments
+            self.response_sum -= response_sum
+            self.response_count -= response_count
+            cut = first_change - self.origin
+            self.activity[cut:] = np.nan
+            self.pain[cut:] = np.nan
+            self._fill(data, hour_changes[0])
+            moments, response_sum, response_count = self._contribution(start)
+            self.moments += moments
+            self.response_sum += response_sum
+            self.response_count += response_count
+        self.token = token
+        return self
+
+    def cross_correlation(self) -> np.ndarray:
+        """
+        :return: Array (MAX_LAG + 1, len(metrics)) of the Pearson correlation
+                 between activity at t and pain at t + lag; NaN where undefined.
+        """
+        n, sx, sy, sxy, sxx, syy = self.moments
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        r[n < 3] = np.nan
+        return r
+
+    def response_curves(self) -> np.ndarray:
+        """
+        :return: Array (ACTIVITY_LEVELS, MAX_LAG + 1, len(metrics)) of the mean
+                 pain ``lag`` hours after an hour at each activity level; NaN without data.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.response_count > 0, self.response_sum / self.response_count, np.nan)
+
+
+_activity_response = ActivityResponse()
+
+
+def activity_response(data: dict) -> ActivityResponse:
+    """
+    :param data: The loaded data dictionary.
+    :return: The shared :class:`ActivityResponse` engine, updated for ``data``.
+    """
+    return _activity_response.update(data)
+
+
+# Half-lives, in hours, of the recent level and of the daily/weekly profiles.
+LEVEL_HALF_LIFE = 72.0
+SEASONAL_HALF_LIFE = 28 * 24.0
+# Pseudo-observations pulling a sparse hour-of-week bin towards its hour of day.
+WEEK_SHRINK = 2.0
+
+
+def _hour_of_week(hours: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday; bins start on Monday 00:00.
+    return ((hours // 24 + 3) % 7) * 24 + hours % 24
+
+
+class PainForecast:
+    """
+    Short-term forecast of every metric in ``metrics`` from exponentially
+    weighted means: a recent level plus 24-hour and 7-day seasonal profiles,
+
+        forecast(h) = level + profile(hour of week of h) - baseline
+
+    where ``baseline`` is the mean the profiles are measured against and each
+    hour-of-week bin is shrunk towards its hour-of-day bin when it has little data.
+
+    Each component is kept as a weighted sum and a weight total relative to the
+    latest hour seen, so new readings are folded in by decaying the state to their
+    hour and adding them (constant work per reading); a full fit is the same sums
+    computed over the whole history with NumPy. Changes before the latest hour need
+    a refit; changes to the latest hour itself are swapped in place, as long as no
+    region gains its first reading (which adds a metric).
+    """
+
+    def __init__(self, metrics: list = ("Pain (Arb.)",)):
+        self.metrics = list(metrics)
+        n_metrics = len(self.metrics)
+        self.token = None
+        self.last_hour = None
+        self.last_row = None
+        self.level = np.zeros((2, n_metrics))
+        self.base = np.zeros((2, n_metrics))
+        self.daily = np.zeros((2, 24, n_metrics))
+        self.weekly = np.zeros((2, 168, n_metrics))
+
+    def _add(self, hours: np.ndarray, rows: np.ndarray, sign: float = 1.0) -> None:
+        """
+        Add (or with ``sign`` -1 remove) observations at hours <= ``last_hour``.
+
+        :param rows: Array (len(hours), len(metrics)), NaN where missing.
+        """
+        age = (self.last_hour - hours).astype(float)
+        present = np.isfinite(rows)
+        x = np.where(present, rows, 0.0)
+        w_level = (0.5 ** (age / LEVEL_HALF_LIFE))[:, None] * present
+        w_season = (0.5 ** (age / SEASONAL_HALF_LIFE))[:, None] * present
+        self.level += sign * np.stack([(w_level * x).sum(axis=0), w_level.sum(axis=0)])
+        self.base += sign * np.stack([(w_season * x).sum(axis=0), w_season.sum(axis=0)])
+        for state, index, bins in ((self.daily, hours % 24, 24), (self.weekly, _hour_of_week(hours), 168)):
+            for m in range(len(self.metrics)):
+                state[0, :, m] += sign * np.bincount(index, weights=w_season[:, m] * x[:, m], minlength=bins)
+                state[1, :, m] += sign * np.bincount(index, weights=w_season[:, m], minlength=bins)
+
+    def _advance(self, hour: int) -> None:
+        """
+        Move the reference hour forward, decaying every weighted sum.
+        """
+        if hour <= self.last_hour:
+            return
+        self.level *= 0.5 ** ((hour - self.last_hour) / LEVEL_HALF_LIFE)
+        seasonal = 0.5 ** ((hour - self.last_hour) / SEASONAL_HALF_LIFE)
+        self.base *= seasonal
+        self.daily *= seasonal
+        self.weekly *= seasonal
+        self.last_hour = hour
+
+    def _rows(self, data: dict, start_key: str) -> tuple:
+        """
+        :return: (hours, rows) of the readings at or after ``start_key``, with the
+                 Pain (Arb.) column first as in ``metrics``.
+        """
+        readings, _ = _entries_from(data, start_key, self.metrics[1:])
+        if not readings:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.metrics)))
+        stamps = np.array([ts for ts, _, _ in readings], dtype="datetime64[h]").astype(np.int64)
+        hours, index = np.unique(stamps, return_inverse=True)
+        regions = np.full((len(hours), len(self.metrics) - 1), np.nan)
+        regions[index, [col for _, col, _ in readings]] = [v for _, _, v in readings]
+        return hours, np.column_stack([pain_arb_array(regions), regions])
+
+    def _rebuild(self, data: dict) -> None:
+        self.__init__(response_metrics(data))
+        hours, rows = self._rows(data, None)
+        if len(hours):
+            self.last_hour = int(hours[-1])
+            self.last_row = rows[-1]
+            self._add(hours, rows)
+
+    def update(self, data: dict) -> "PainForecast":
+        """
+        Bring the model up to date with ``data``, incrementally when the change log
+        allows it.
+
+        :param data: The loaded data dictionary.
+        :return: self.
+        """
+        token = data_store.data_token(data)
+        if self.token is not None and token == self.token and token[0] is not None:
+            return self
+        changed = None
+        if self.token is not None and self.token[0] == token[0] and token[0] is not None:
+            changed = data_store.changes_since(data, self.token[1])
+        hour_changes = sorted(k for k in changed if len(k) == 19) if changed else []
+        first_change = (int(np.datetime64(hour_changes[0], "h").astype(np.int64))
+                        if hour_changes else None)
+
+        if (changed is None or self.last_hour is None or self.metrics != response_metrics(data)
+                or (first_change is not None and first_change < self.last_hour)):
+            self._rebuild(data)
+        elif first_change is not None:
+            if first_change == self.last_hour:
+                self._add(np.array([self.last_hour]), self.last_row[None, :], -1.0)
+                self.last_row = np.full(len(self.metrics), np.nan)
+            hours, rows = self._rows(data, hour_changes[0])
+            if len(hours):
+                self._advance(int(hours[-1]))
+                self._add(hours, rows)
+                if hours[-1] == self.last_hour:
+                    self.last_row = rows[-1]
+        self.token = token
+        return self
+
+    def predict(self, hours: np.ndarray) -> np.ndarray:
+        """
+        :param hours: Hours since the epoch.
+        :return: Array (len(hours), len(metrics)) of expected values; NaN
+                 for metrics without readings.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            level = self.level[0] / self.level[1]
+            base = self.base[0] / self.base[1]
+            day = self.daily[0, hours % 24] / self.daily[1, hours % 24]
+            day = np.where(np.isfinite(day), day, base)
+            week = _hour_of_week(hours)
+            profile = (self.weekly[0, week] + WEEK_SHRINK * day) / (self.weekly[1, week] + WEEK_SHRINK)
+            return np.clip(level + profile - base, 0.0, None)
+
+    def day_forecast(self, day: str) -> dict:
+        """
+        :param day: The date to forecast, "%Y-%m-%d".
+        :return: {metric: {"mean": float, "peak": float, "peak_hour": int}} for the
+                 metrics with readings; {} before the first reading.
+        """
+        if self.last_hour is None:
+            return {}
+        hours = np.datetime64(day, "h").astype(np.int64) + np.arange(24)
+        expected = self.predict(hours)
+        result = {}
+        for col, metric in enumerate(self.metrics):
+            if np.isfinite(expected[:, col]).all():
+                peak = int(np.argmax(expected[:, col]))
+                result[metric] = {"mean": float(expected[:, col].mean()),
+                                  "peak": float(expected[peak, col]), "peak_hour": peak}
+        return result
+
+
+_pain_forecast = PainForecast()
+
+
+def pain_forecast(data: dict, day: str) -> dict:
+    """
+    :param data: The loaded data dictionary.
+    :param day: The date to forecast, "%Y-%m-%d".
+    :return: :meth:`PainForecast.day_forecast` from the shared, incrementally updated
+             model, cached per data version and day.
+    """
+    return cached("forecast", data, lambda d, day: _pain_forecast.update(d).day_forecast(day), day)
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, buckets: int) -> tuple:
+    """
+    Reduce a series to at most 2 × ``buckets`` points, keeping the lowest and highest
+    point of each equal-count bucket in their original order so spikes survive.
+
+    :param x: Sorted sample positions.
+    :param y: Finite sample values.
+    :param buckets: Number of buckets.
+    :return: (x, y) of the decimated series.
+    """
+    n = len(x)
+    if n <= 2 * buckets:
+        return x, y
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(blocks), axis=1)
+    blocks = blocks[valid]
+    base = np.nonzero(valid)[0] * size
+    lo = base + np.nanargmin(blocks, axis=1)
+    hi = base + np.nanargmax(blocks, axis=1)
+    idx = np.unique(np.concatenate([lo, hi]))
+    return x[idx], y[idx]
+
+
+class SeriesLevels:
+    """
+    Pyramid of min-max decimations of one series for drawing at screen resolution.
+
+    Level 0 is the full series and every further level has ``factor`` times fewer
+    buckets, down to about ``min_points`` points. Because the min-max of min-max
+    buckets is the min-max of the originals, each level is built from the previous
+    one. A window is served from the coarsest level that still has at least two points
+    per pixel in it, so the work per draw depends on the width, not on the history.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, factor: int = 8, min_points: int = 2048):
+        mask = np.isfinite(y)
+        self.levels = [(x[mask], y[mask])]
+        while len(self.levels[-1][0]) > min_points:
+            lx, ly = self.levels[-1]
+            self.levels.append(minmax_decimate(lx, ly, max(1, len(lx) // (2 * factor))))
+
+    @property
+    def bounds(self) -> tuple:
+        """
+        :return: (first x, last x) of the series, or (None, None) when it is empty.
+        """
+        x = self.levels[0][0]
+        return (x[0], x[-1]) if len(x) else (None, None)
+
+    def window(self, start, end, width: int) -> tuple:
+        """
+        :param start: First x to include.
+        :param end: Last x to include.
+        :param width: Available width in pixels.
+        :return: (x, y) covering [start, end] with at most about 2 × ``width`` points,
+                 at full resolution when the range is small enough.
+        """
+        width = max(1, int(width))
+        for lx, ly in reversed(self.levels):
+            lo = np.searchsorted(lx, start, side="left")
+            hi = np.searchsorted(lx, end, side="right")
+            if hi - lo >= 2 * width or lx is self.levels[0][0]:
+                # Keep one point either side so lines run to the edges of the view.
+                lo, hi = max(0, lo - 1), min(len(lx), hi + 1)
+                return minmax_decimate(lx[lo:hi], ly[lo:hi], width)
+        return self.levels[0]
+
+
+def series_levels(data: dict, metric: str = "Pain (Arb.)") -> SeriesLevels:
+    """
+    :param data: The loaded data dictionary.
+    :param metric: "Pain (Arb.)" or one of PAIN_SECTIONS.
+    :return: The decimation pyramid of that metric over recorded hours, with x in hours
+             since the epoch.
+    """
+    readings = hourly_readings(data)
+    return SeriesLevels(readings[0].astype(float), region_series(readings, metric))
@@ -0,0 +1,214 @@
+"""
+Benchmark suite for the headless data layer.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks                      # print JSON results
+    python -m benchmarks.run_benchmarks --compare            # compare with baseline.json
+    python -m benchmarks.run_benchmarks --update-baseline    # store a new baseline
+
+Each benchmark is timed on synthetic 1, 3 and 10 year histories; the best of
+``--repeat`` runs is reported in seconds.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import data_store
+from benchmarks.synthetic import generate_history
+
+SIZES = {"1y": 1, "3y": 3, "10y": 10}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class BenchContext:
+    """
+    Fixture shared by the benchmarks of one history size: the generated data and a
+    temporary directory holding its data.json.
+    """
+
+    def __init__(self, years: float, seed: int):
+        self.data = generate_history(years, seed=seed)
+        self.tmp_dir = tempfile.mkdtemp(prefix="pain_bench_")
+        self.data_file = os.path.join(self.tmp_dir, "data.json")
+        data_store.write_data(self.data_file, self.data)
+        self.last_day = datetime.strptime(self.data["sleep_data"][-1]["date"], "%Y-%m-%d")
+        self.counter = 0
+        self.model = data_store.DataModel(self.data)
+        self.query_date = self.data["sleep_data"][len(self.data["sleep_data"]) // 2]["date"]
+
+    def next_timestamp(self) -> str:
+        """
+        :return: A fresh hour key after the end of the history.
+        """
+        self.counter += 1
+        return (self.last_day + timedelta(days=1, hours=self.counter)).strftime(data_store.TIMESTAMP_FORMAT)
+
+    def close(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def bench_load_data(ctx):
+    data_store.load_data(ctx.data_file)
+
+
+def bench_save_measurement(ctx):
+    data = data_store.load_data(ctx.data_file)
+    data_store.save_measurement(data, "RU", ctx.next_timestamp(), 5.0)
+    data_store.write_data(ctx.data_file, data)
+
+
+def bench_combine(ctx):
+    data_store.combine_rows(ctx.data)
+
+
+def bench_pain_arb(ctx):
+    data_store.hourly_pain_arb(data_store.combine_pain(ctx.data))
+
+
+def bench_calendar_dates(ctx):
+    data_store.calendar_dates(ctx.data)
+
+
+def bench_day_query_bisect(ctx):
+    ctx.model.day_hours(ctx.query_date)
+    ctx.model.sleep_on(ctx.query_date)
+
+
+def bench_active_medications(ctx):
+    ctx.model.active_medications(ctx.query_date + " 12:00:00")
+
+
+def bench_export_csv(ctx):
+    data_store.export_csv(ctx.data, os.path.join(ctx.tmp_dir, "pain_management.csv"))
+
+
+def bench_export_incremental(ctx):
+    csv_path = os.path.join(ctx.tmp_dir, "incremental.csv")
+    state_path = os.path.join(ctx.tmp_dir, "export_state.json")
+    if not os.path.exists(state_path):
+        # The synthetic history gets its file id with its first change.
+        data_store.save_measurement(ctx.data, "RU", ctx.next_timestamp(), 5.0)
+        data_store.export_csv_incremental(ctx.data, csv_path, state_path)
+    # Sixteen hours after the watermark, so every run appends new rows.
+    for _ in range(16):
+        data_store.save_measurement(ctx.data, "RU", ctx.next_timestamp(), 5.0)
+    assert data_store.export_csv_incremental(ctx.data, csv_path, state_path) == "incremental"
+
+
+BENCHMARKS = [
+    ("load_data", bench_load_data),
+    ("save_measurement", bench_save_measurement),
+    ("combine", bench_combine),
+    ("pain_arb", bench_pain_arb),
+    ("calendar_dates", bench_calendar_dates),
+    ("day_query_bisect", bench_day_query_bisect),
+    ("active_medications", bench_active_medications),
+    ("export_csv_to_internal", bench_export_csv),
+    ("export_csv_incremental", bench_export_incremental),
+]
+
+
+def run(sizes, repeat: int, seed: int, only=None) -> dict:
+    """
+    Run every benchmark on every history size.
+
+    :param sizes: Mapping of size label to years.
+    :param repeat: Number of timed runs per benchmark; the fastest is kept.
+    :param seed: Seed for the synthetic history.
+    :param only: Optional collection of benchmark names to restrict the run to.
+    :return: {size label: {benchmark name: seconds}}.
+    """
+    results = {}
+    for label, years in sizes.items():
+        ctx = BenchContext(years, seed)
+        try:
+            results[label] = {}
+            for name, func in BENCHMARKS:
+                if only and name not in only:
+                    continue
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    func(ctx)
+                    timings.append(time.perf_counter() - start)
+                results[label][name] = min(timings)
+        finally:
+            ctx.close()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :param results: Output of :func:`run`.
+    :param baseline: Previously stored results.
+    :param tolerance: Allowed slowdown factor before a benchmark counts as a regression.
+    :return: A list of (size, name, baseline seconds, current seconds) regressions.
+    """
+    regressions = []
+    for label, timings in results.items():
+        for name, seconds in timings.items():
+            reference = baseline.get(label, {}).get(name)
+            if reference and seconds > reference * tolerance:
+                regressions.append((label, name, reference, seconds))
+    return regressions
+
+
+def missing(results: dict, baseline: dict) -> list:
+    """
+    :param results: Output of :func:`run`.
+    :param baseline: Previously stored results.
+    :return: A list of (size, name) that were run but have no baseline to compare with.
+    """
+    return [(label, name) for label, timings in results.items()
+            for name in timings if not baseline.get(label, {}).get(name)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pain logger data layer.")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        help="Comma separated history sizes to run (default: %(default)s).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default="", help="Comma separated benchmark names.")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--compare", action="store_true", help="Compare results with the baseline.")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    sizes = {label: SIZES[label] for label in args.sizes.split(",") if label}
+    only = {name for name in args.only.split(",") if name}
+    results = run(sizes, args.repeat, args.seed, only)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(output + "\n")
+        return 0
+    if args.compare:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for label, name, reference, seconds in regressions:
+            print(f"REGRESSION {label} {name}: {reference:.4f}s -> {seconds:.4f}s", file=sys.stderr)
+        unmatched = missing(results, baseline)
+        for label, name in unmatched:
+            print(f"NO BASELINE {label} {name}: run with --update-baseline", file=sys.stderr)
+        return 1 if regressions or unmatched else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Stress test for concurrent writers of data.json.
+
+Several processes save readings and edit notes in the same data.json at once, the
+way the UI, a home-screen widget and a quick-entry notification service would.
+Every write must survive:
+
+    python -m benchmarks.stress_writers                    # 4 writers x 50 saves
+    python -m benchmarks.stress_writers --writers 8 --saves 100
+    python -m benchmarks.stress_writers --naive            # unguarded load/write, for comparison
+
+The exit status is non-zero if any entry was lost.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import data_store
+
+START = datetime(2024, 1, 1)
+
+
+def hour_key(writer: int, i: int) -> str:
+    """
+    :return: The hour key that ``writer`` uses for its ``i``-th save; unique per writer.
+    """
+    return (START + timedelta(hours=writer * 10000 + i)).strftime(data_store.TIMESTAMP_FORMAT)
+
+
+def writer(data_file: str, index: int, saves: int, naive: bool) -> None:
+    """
+    Save ``saves`` readings; every fifth save also journals a note edit.
+    """
+    for i in range(saves):
+        ts = hour_key(index, i)
+        if naive:
+            data = data_store.load_data(data_file)
+            data_store.save_measurement(data, "RU", ts, 5.0)
+            data_store.write_data(data_file, data)
+            continue
+        data_store.update_data(data_file, lambda data: data_store.save_measurement(data, "RU", ts, 5.0))
+        if i % 5 == 0:
+            def edit():
+                data = data_store.load_data(data_file)
+                data_store.edit_entry(data_file, data, "note", ts, f"writer {index} note {i}")
+            data_store.retrying(edit, data_file)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4, help="Number of writer processes")
+    parser.add_argument("--saves", type=int, default=50, help="Readings saved by each writer")
+    parser.add_argument("--naive", action="store_true", help="Use unguarded load_data/write_data")
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="pain_stress_")
+    data_file = os.path.join(tmp_dir, "data.json")
+    try:
+        start = time.perf_counter()
+        processes = [multiprocessing.Process(target=writer, args=(data_file, w, args.saves, args.naive))
+                     for w in range(args.writers)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        data = data_store.load_data(data_file)
+        stored = {e["timestamp"] for e in data.get("RU", [])}
+        notes = data.get("notes_data", {})
+        lost_readings = lost_notes = 0
+        for w in range(args.writers):
+            for i in range(args.saves):
+                lost_readings += hour_key(w, i) not in stored
+                if not args.naive and i % 5 == 0:
+                    lost_notes += notes.get(hour_key(w, i)) != f"writer {w} note {i}"
+        failed = sum(p.exitcode != 0 for p in processes)
+        print(f"{args.writers} writers x {args.saves} saves in {elapsed:.2f}s: "
+              f"{lost_readings} readings and {lost_notes} notes lost, {failed} writers failed")
+        return 1 if lost_readings or lost_notes or failed else 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Seeded generator of synthetic pain histories in the data.json layout.
+"""
+import random
+from datetime import datetime, timedelta
+
+from data_store import PAIN_SECTIONS, TIMESTAMP_FORMAT
+
+ACTIVITY_NAMES = ["walk", "swim", "physio", "gardening", "housework", "cycling", "yoga", ""]
+MEDICATIONS = [("ibuprofen", "400 mg", 8), ("paracetamol", "1 g", 6), ("codeine", "30 mg", 4)]
+NOTE_WORDS = ["migraine", "stiff", "tired", "better", "flare", "rain", "stress",
+              "slept", "badly", "walked", "ibuprofen", "heat", "pack", "worse", "back"]
+
+
+def generate_history(years: float, seed: int = 0, start: datetime = datetime(2020, 1, 1)) -> dict:
+    """
+    Generate a synthetic history covering ``years`` years of waking hours.
+
+    Every hour between 07:00 and 22:00 gets readings for two to four sections; roughly
+    one hour in six gets an activity, one in twelve a note and every day a sleep entry
+    and one to three medication doses.
+
+    :param years: Length of the history in years.
+    :param seed: Seed for the random generator, so runs are reproducible.
+    :param start: The first day of the history.
+    :return: A data dictionary as stored in data.json.
+    """
+    rng = random.Random(seed)
+    data = {section: [] for section in PAIN_SECTIONS}
+    activity_data = {}
+    notes_data = {}
+    sleep_data = []
+    days = int(round(years * 365))
+    for day in range(days):
+        date = start + timedelta(days=day)
+        sleep_data.append({
+            "date": date.strftime("%Y-%m-%d"),
+            "hours_slept": round(rng.uniform(3, 10), 1),
+            "sleep_quality": rng.randint(1, 3),
+        })
+        base = rng.uniform(1, 6)
+        for hour in range(7, 23):
+            ts = date.replace(hour=hour).strftime(TIMESTAMP_FORMAT)
+            for section in rng.sample(PAIN_SECTIONS, rng.randint(2, 4)):
+                value = round(min(10.0, max(0.0, rng.gauss(base, 1.5))), 1)
+                data[section].append({"value": value, "timestamp": ts})
+            if rng.random() < 1 / 6:
+                activity_data[ts] = [{"activity_level": str(rng.randint(1, 5)),
+                                      "activity_name": rng.choice(ACTIVITY_NAMES)}]
+            if rng.random() < 1 / 12:
+                notes_data[ts] = " ".join(rng.choice(NOTE_WORDS) for _ in range(rng.randint(3, 12)))
+    data["activity_data"] = activity_data
+    data["notes_data"] = notes_data
+    data["sleep_data"] = sleep_data
+    medication_data = []
+    for day in range(days):
+        date = start + timedelta(days=day)
+        for name, dose, hours in rng.sample(MEDICATIONS, rng.randint(1, 3)):
+            medication_data.append({"timestamp": date.replace(hour=rng.randint(7, 22)).strftime(TIMESTAMP_FORMAT),
+                                    "name": name, "dose": dose, "duration_hours": hours})
+    data["medication_data"] = medication_data
+    return data
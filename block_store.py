@@ -0,0 +1,245 @@
+"""
+Checksummed monthly blocks kept next to data.json.
+
+Every write of data.json also brings a directory of block files up to date: one per
+month ("2024-05.json") holding that month's pain readings, activities, notes and
+sleep, plus "meta.json" and "other.json" for everything else. A manifest records the
+CRC32, size and mtime of every block and of data.json itself.
+
+The blocks are the last good snapshot of the history:
+
+* on start-up only the blocks whose size or mtime no longer match the manifest
+  are read and checksummed;
+* if data.json cannot be parsed, the history is rebuilt from the blocks that are
+  still intact, so damage is limited to the months whose blocks are also bad.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import zlib
+from collections.abc import Mapping
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+MANIFEST = "manifest.json"
+META_BLOCK = "meta"
+OTHER_BLOCK = "other"
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}")
+
+
+def block_dir(data_file: str) -> str:
+    """
+    :return: The directory holding the blocks of ``data_file``.
+    """
+    return data_file + ".blocks"
+
+
+def block_name(key) -> str:
+    """
+    :param key: An hour key, a sleep date or anything else.
+    :return: The block the key belongs to ("YYYY-MM" or OTHER_BLOCK).
+    """
+    return key[:7] if isinstance(key, str) and _MONTH_RE.match(key) else OTHER_BLOCK
+
+
+def split_blocks(data: dict, names=None) -> dict:
+    """
+    Partition ``data`` into blocks.
+
+    :param data: The data dictionary.
+    :param names: Optional collection of block names to build; others are skipped.
+    :return: {block name: partial data dictionary}.
+    """
+    blocks = {}
+
+    def block(name):
+        return blocks.setdefault(name, {})
+
+    for key, value in data.items():
+        if key == "meta":
+            if names is None or META_BLOCK in names:
+                block(META_BLOCK)["meta"] = value
+        elif key in ("activity_data", "notes_data") and isinstance(value, Mapping):
+            if names is not None:
+                # Note bodies are read lazily, so only fetch those of the wanted blocks.
+                value = {ts: value[ts] for ts in value if block_name(ts) in names}
+            for ts, item in value.items():
+                block(block_name(ts)).setdefault(key, {})[ts] = item
+        elif isinstance(value, list):
+            field = "date" if key == "sleep_data" else "timestamp"
+            for entry in value:
+                name = block_name(entry.get(field) if isinstance(entry, dict) else None)
+                if names is None or name in names:
+                    block(name).setdefault(key, []).append(entry)
+        elif names is None or OTHER_BLOCK in names:
+            block(OTHER_BLOCK)[key] = value
+    return blocks
+
+
+def merge_blocks(blocks) -> dict:
+    """
+    :param blocks: Partial data dictionaries, in block name order.
+    :return: The data dictionary they make up.
+    """
+    data = {}
+    for block in blocks:
+        for key, value in block.items():
+            if isinstance(value, list):
+                data.setdefault(key, []).extend(value)
+            elif isinstance(value, dict) and key != "meta":
+                data.setdefault(key, {}).update(value)
+            else:
+                data[key] = value
+    return data
+
+
+def _encode(block: dict) -> bytes:
+    return json.dumps(block, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _atomic_write(path: str, payload: bytes) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _stat(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_manifest(data_file: str) -> dict:
+    """
+    :return: The manifest of ``data_file``'s blocks, or {} if there is none or it is unreadable.
+    """
+    path = os.path.join(block_dir(data_file), MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.exception("Error loading block manifest: %s", e)
+        return {}
+
+
+def data_file_matches(data_file: str) -> bool:
+    """
+    :return: True if ``data_file`` is exactly as the last write left it, judged by
+             the size and mtime recorded in the manifest.
+    """
+    recorded = load_manifest(data_file).get("data_file")
+    return bool(recorded) and os.path.exists(data_file) and _stat(data_file) == recorded
+
+
+def write_blocks(data_file: str, data: dict, names=None) -> list:
+    """
+    Bring the blocks up to date with ``data``, which has just been written to
+    ``data_file``. Blocks whose checksum is unchanged are not rewritten.
+
+    :param data_file: Path of data.json.
+    :param data: The data dictionary that was written.
+    :param names: Block names that may have changed, or None to consider them all
+                  (blocks that no longer exist are then removed).
+    :return: The names of the blocks written.
+    """
+    directory = block_dir(data_file)
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(data_file)
+    entries = manifest.get("blocks", {})
+    blocks = split_blocks(data, names)
+    written = []
+    for name, block in blocks.items():
+        payload = _encode(block)
+        crc = zlib.crc32(payload)
+        path = os.path.join(directory, name + ".json")
+        if entries.get(name, {}).get("crc32") == crc and os.path.exists(path):
+            continue
+        _atomic_write(path, payload)
+        entries[name] = dict(_stat(path), crc32=crc)
+        written.append(name)
+    stale = [name for name in entries if name not in blocks and (names is None or name in names)]
+    for name in stale:
+        del entries[name]
+        path = os.path.join(directory, name + ".json")
+        if os.path.exists(path):
+            os.remove(path)
+    meta = data.get("meta", {})
+    manifest = {
+        "id": meta.get("id"),
+        "version": meta.get("version", 0),
+        "blocks": entries,
+        "data_file": _stat(data_file) if os.path.exists(data_file) else None,
+    }
+    _atomic_write(os.path.join(directory, MANIFEST), json.dumps(manifest, indent=1).encode("utf-8"))
+    return written
+
+
+def _read_block(path: str, expected_crc: int):
+    """
+    :return: The block's data, or None if it is missing, fails its checksum or does not parse.
+    """
+    try:
+        with open(path, "rb") as f:
+            payload = f.read()
+        if zlib.crc32(payload) != expected_crc:
+            return None
+        return json.loads(payload.decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def verify(data_file: str, full: bool = False) -> dict:
+    """
+    Check the blocks against the manifest.
+
+    :param data_file: Path of data.json.
+    :param full: Checksum every block instead of only those whose size or mtime changed.
+    :return: {"checked": number of blocks read, "bad": [names of missing or corrupt blocks]}.
+    """
+    entries = load_manifest(data_file).get("blocks", {})
+    directory = block_dir(data_file)
+    checked, bad = 0, []
+    for name, entry in sorted(entries.items()):
+        path = os.path.join(directory, name + ".json")
+        if not os.path.exists(path):
+            bad.append(name)
+            continue
+        if not full and _stat(path) == {"size": entry.get("size"), "mtime_ns": entry.get("mtime_ns")}:
+            continue
+        checked += 1
+        if _read_block(path, entry.get("crc32")) is None:
+            bad.append(name)
+    return {"checked": checked, "bad": bad}
+
+
+def recover(data_file: str) -> tuple:
+    """
+    Rebuild the data dictionary from the intact blocks.
+
+    :param data_file: Path of data.json.
+    :return: (data, names of the blocks that could not be read); data is {} when
+             there are no blocks.
+    """
+    entries = load_manifest(data_file).get("blocks", {})
+    directory = block_dir(data_file)
+    blocks, lost = [], []
+    for name in sorted(entries):
+        block = _read_block(os.path.join(directory, name + ".json"), entries[name].get("crc32"))
+        if block is None:
+            lost.append(name)
+        else:
+            blocks.append(block)
+    return merge_blocks(blocks), lost
+
+
+def remove(data_file: str) -> None:
+    """
+    Delete the blocks of ``data_file``.
+    """
+    shutil.rmtree(block_dir(data_file), ignore_errors=True)
@@ -15,7 +15,7 @@ package.domain = io.twilson
 source.dir = .
 
 # (list) Source files to include (let empty to include all the files)
-source.include_exts = py,png,jpg,kv,atlas
+source.include_exts = py,png,jpg,kv,atlas,json
 
 # (list) List of inclusions using pattern matching
 #source.include_patterns = assets/*,images/*.png
@@ -24,7 +24,7 @@ source.include_exts = py,png,jpg,kv,atlas
 #source.exclude_exts = spec
 
 # (list) List of directory to exclude (let empty to not exclude anything)
-#source.exclude_dirs = tests, bin, venv
+source.exclude_dirs = benchmarks, tests
 
 # (list) List of exclusions using pattern matching
 # Do not prefix with './'
@@ -39,7 +39,7 @@ version = 0.1
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,pyjnius,kivy,kivy_garden.matplotlib,matplotlib
+requirements = python3,pyjnius,kivy,kivy_garden.matplotlib,matplotlib,numpy
 
 
 
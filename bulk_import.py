@@ -0,0 +1,361 @@
+"""
+Bulk import of pain histories from the app's CSV export or a foreign data.json.
+
+The importer never touches the Kivy app: it streams records out of the input file,
+merges them into an already loaded data dictionary and leaves the single write
+to the caller, so a whole history is committed in one batch.
+"""
+import csv
+import logging
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+import journal
+from data_store import (PAIN_SECTIONS, TIMESTAMP_FORMAT, EXPORT_TIMESTAMP_FORMAT, load_data, medication_window,
+                        record_change, sort_pain_sections)
+from json_stream import StreamedArray, StreamedData, StreamedObject
+from notes_blob import LazyNotes
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+
+class ImportReport:
+    """
+    Counters collected while merging imported records.
+
+    ``conflicts`` counts records that hit an hour (or sleep date) that already held
+    data; ``updated`` is the subset of those where the imported pain value was higher
+    and replaced the stored one.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.added = 0
+        self.updated = 0
+        self.conflicts = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        :return: Input rows processed per second of merge time.
+        """
+        return self.rows / self.elapsed if self.elapsed > 0 else float(self.rows)
+
+    def summary(self) -> str:
+        """
+        :return: A short multi-line description suitable for a popup or log line.
+        """
+        return (f"Rows read: {self.rows}\n"
+                f"Added: {self.added}, updated: {self.updated}\n"
+                f"Conflicts: {self.conflicts}, skipped: {self.skipped}\n"
+                f"{self.rows_per_second:.0f} rows/s")
+
+
+def _split_list_field(field: str) -> list:
+    """
+    Split an exported "[a,b,c]" field back into its items.
+
+    :param field: The raw CSV cell.
+    :return: A list of strings (empty if the cell was blank).
+    """
+    field = field.strip()
+    if not field:
+        return []
+    if field.startswith("[") and field.endswith("]"):
+        field = field[1:-1]
+    return field.split(",")
+
+
+def _sleep_entry(day, hours_slept, sleep_quality) -> dict:
+    """
+    :return: A sleep entry with a "%Y-%m-%d" date, float hours and an int quality.
+    :raises ValueError: If a field is missing or malformed.
+    """
+    try:
+        return {"date": datetime.strptime(day, "%Y-%m-%d").strftime("%Y-%m-%d"),
+                "hours_slept": float(hours_slept),
+                "sleep_quality": int(float(sleep_quality))}
+    except TypeError as e:
+        raise ValueError(e)
+
+
+def iter_csv_records(path: str):
+    """
+    Stream records out of a CSV written by ``export_csv_to_internal``.
+
+    Yields tuples of one of the forms
+    ``("pain", timestamp, section, value)``, ``("activity", timestamp, entry)``,
+    ``("note", timestamp, text)`` or ``("sleep", entry)``.
+    Each input row is also announced with a ``("row",)`` marker (or ``("skip",)``
+    if it could not be parsed) so throughput is reported on rows rather than records.
+
+    :param path: Path of the CSV file.
+    """
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        columns = {name.strip(): idx for idx, name in enumerate(header)}
+        ts_col = columns.get("Timestamp (dd/mm/yyyy hh:mm)", 0)
+        in_sleep = False
+        for row in reader:
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if row[0] == "Sleep Data":
+                in_sleep = True
+                continue
+            if in_sleep:
+                if row[0] == "date" or len(row) < 3:
+                    continue
+                try:
+                    entry = _sleep_entry(row[0], row[1], row[2])
+                except ValueError:
+                    yield ("skip",)
+                    continue
+                yield ("row",)
+                yield ("sleep", entry)
+                continue
+
+            try:
+                ts = datetime.strptime(row[ts_col], EXPORT_TIMESTAMP_FORMAT).strftime(TIMESTAMP_FORMAT)
+            except (ValueError, IndexError):
+                yield ("skip",)
+                continue
+            yield ("row",)
+
+            for section in PAIN_SECTIONS:
+                idx = columns.get(section)
+                if idx is None or idx >= len(row) or not row[idx].strip():
+                    continue
+                try:
+                    yield ("pain", ts, section, float(row[idx]))
+                except ValueError:
+                    continue
+
+            level_idx = columns.get("Activity Value")
+            name_idx = columns.get("Activity")
+            levels = _split_list_field(row[level_idx]) if level_idx is not None and level_idx < len(row) else []
+            names = _split_list_field(row[name_idx]) if name_idx is not None and name_idx < len(row) else []
+            for i, level in enumerate(levels):
+                name = names[i] if i < len(names) else ""
+                yield ("activity", ts, {"activity_level": level, "activity_name": name})
+
+            notes_idx = columns.get("Notes")
+            if notes_idx is not None and notes_idx < len(row) and row[notes_idx].strip():
+                yield ("note", ts, row[notes_idx])
+
+
+def _array_section(data, key):
+    value = data.get(key)
+    return value if isinstance(value, (StreamedArray, list)) else []
+
+
+def _object_section(data, key):
+    value = data.get(key)
+    return value if isinstance(value, (StreamedObject, Mapping)) else {}
+
+
+def iter_json_records(path: str):
+    """
+    Stream records out of a data.json written by this app on another device.
+
+    Yields the same tuples as :func:`iter_csv_records`, plus ``("medication", entry)``
+    for logged doses (the CSV only lists them per hour), with one ``("row",)``
+    marker per source entry. Sleep and activity entries are validated as in the CSV
+    path. The file is read section by section through
+    :class:`json_stream.StreamedData`, so only one entry is decoded at a time,
+    unless it has an edit journal: it is then loaded with ``load_data``, which
+    replays the edits and deletions made on the other device. Note bodies are read
+    from the file's note blob, which must have been copied along with it.
+
+    :param path: Path of the JSON file.
+    :raises FileNotFoundError: If the file indexes notes but their blob is missing.
+    """
+    data = load_data(path) if journal.count(path) else StreamedData(path)
+    notes = _object_section(data, "notes_data")
+    if isinstance(notes, LazyNotes):
+        # Fail before anything is merged rather than dropping every note.
+        notes.require_blob()
+    for section in PAIN_SECTIONS:
+        for entry in _array_section(data, section):
+            try:
+                ts = entry["timestamp"]
+                datetime.strptime(ts, TIMESTAMP_FORMAT)
+                value = float(entry["value"])
+            except (KeyError, TypeError, ValueError):
+                yield ("skip",)
+                continue
+            yield ("row",)
+            yield ("pain", ts, section, value)
+    for ts, entries in _object_section(data, "activity_data").items():
+        try:
+            datetime.strptime(ts, TIMESTAMP_FORMAT)
+        except ValueError:
+            entries = None
+        if not isinstance(entries, (list, StreamedArray)):
+            yield ("skip",)
+            continue
+        for entry in entries:
+            if not isinstance(entry, Mapping):
+                yield ("skip",)
+                continue
+            yield ("row",)
+            yield ("activity", ts, {"activity_level": str(entry.get("activity_level", "")),
+                                    "activity_name": str(entry.get("activity_name", ""))})
+    for ts, note in _object_section(data, "notes_data").items():
+        yield ("row",)
+        yield ("note", ts, note)
+    for entry in _array_section(data, "sleep_data"):
+        try:
+            entry = _sleep_entry(entry["date"], entry["hours_slept"], entry["sleep_quality"])
+        except (KeyError, TypeError, ValueError):
+            yield ("skip",)
+            continue
+        yield ("row",)
+        yield ("sleep", entry)
+    for entry in _array_section(data, "medication_data"):
+        if medication_window(entry) is None:
+            yield ("skip",)
+            continue
+        yield ("row",)
+        yield ("medication", entry)
+
+
+def merge_records(data: dict, records) -> ImportReport:
+    """
+    Merge streamed records into ``data`` in place.
+
+    Pain readings follow the same rule as ``MeasurementInputScreen.save_measurement``:
+    an hour that already has a reading keeps the higher of the two values.
+    Identical activities for the same hour are not duplicated, an existing note is
+    kept over an imported one, an existing sleep entry for a date is kept and
+    identical medication doses are not duplicated.
+    Existing entries are indexed once up front so each record is merged in O(1).
+
+    :param data: The loaded data dictionary; modified in place.
+    :param records: An iterable from :func:`iter_csv_records` or :func:`iter_json_records`.
+    :return: An :class:`ImportReport` describing the merge.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+
+    pain_index = {}
+    for section in PAIN_SECTIONS:
+        for entry in data.get(section, []):
+            pain_index[(section, entry.get("timestamp"))] = entry
+    activity_data = data.setdefault("activity_data", {})
+    activity_seen = {
+        (ts, str(e.get("activity_level", "")), e.get("activity_name", ""))
+        for ts, entries in activity_data.items() for e in entries
+    }
+    notes_data = data.setdefault("notes_data", {})
+    sleep_dates = {e.get("date") for e in data.get("sleep_data", [])}
+
+    def dose_key(e):
+        return e.get("timestamp"), e.get("name", ""), e.get("dose", ""), float(e["duration_hours"])
+
+    doses_seen = {dose_key(e) for e in data.get("medication_data", []) if medication_window(e)}
+    changed_keys = set()
+
+    for record in records:
+        kind = record[0]
+        if kind == "row":
+            report.rows += 1
+        elif kind == "skip":
+            report.rows += 1
+            report.skipped += 1
+        elif kind == "pain":
+            _, ts, section, value = record
+            if not 0 <= value <= 10:
+                report.skipped += 1
+                continue
+            existing = pain_index.get((section, ts))
+            if existing is None:
+                entry = {"value": value, "timestamp": ts}
+                data.setdefault(section, []).append(entry)
+                pain_index[(section, ts)] = entry
+                changed_keys.add(ts)
+                report.added += 1
+            else:
+                report.conflicts += 1
+                if existing["value"] < value:
+                    existing["value"] = value
+                    changed_keys.add(ts)
+                    report.updated += 1
+        elif kind == "activity":
+            _, ts, entry = record
+            key = (ts, entry["activity_level"], entry["activity_name"])
+            if key in activity_seen:
+                report.conflicts += 1
+                continue
+            activity_seen.add(key)
+            activity_data.setdefault(ts, []).append(entry)
+            changed_keys.add(ts)
+            report.added += 1
+        elif kind == "note":
+            _, ts, note = record
+            existing_note = notes_data.get(ts, "")
+            if existing_note.strip():
+                if existing_note != note:
+                    report.conflicts += 1
+                continue
+            notes_data[ts] = note
+            changed_keys.add(ts)
+            report.added += 1
+        elif kind == "sleep":
+            entry = record[1]
+            if entry.get("date") in sleep_dates:
+                report.conflicts += 1
+                continue
+            sleep_dates.add(entry.get("date"))
+            data.setdefault("sleep_data", []).append(entry)
+            changed_keys.add(entry.get("date", ""))
+            report.added += 1
+        elif kind == "medication":
+            entry = record[1]
+            key = dose_key(entry)
+            if key in doses_seen:
+                report.conflicts += 1
+                continue
+            doses_seen.add(key)
+            data.setdefault("medication_data", []).append(entry)
+            changed_keys.add(entry["timestamp"])
+            report.added += 1
+
+    for key in sorted(changed_keys):
+        record_change(data, key)
+    sort_pain_sections(data)
+    if "sleep_data" in data:
+        data["sleep_data"].sort(key=lambda e: e.get("date", ""))
+    if not activity_data:
+        data.pop("activity_data")
+    if not notes_data:
+        data.pop("notes_data")
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def import_file(data: dict, path: str) -> ImportReport:
+    """
+    Merge the CSV or JSON file at ``path`` into ``data``.
+
+    The format is chosen from the file extension. The caller is responsible for
+    writing ``data`` back once, after the merge.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param path: Path of a ``.csv`` export or a ``.json`` data file.
+    :return: An :class:`ImportReport` describing the merge.
+    """
+    if path.lower().endswith(".json"):
+        records = iter_json_records(path)
+    else:
+        records = iter_csv_records(path)
+    report = merge_records(data, records)
+    logger.info("Imported %s: %d rows, %d added, %d updated, %d conflicts, %.0f rows/s",
+                path, report.rows, report.added, report.updated, report.conflicts,
+                report.rows_per_second)
+    return report
@@ -0,0 +1,207 @@
+"""
+Lightweight charts drawn directly with Kivy canvas instructions.
+
+The charts here do not go through matplotlib: every series is a ``Line`` (plus a
+``Mesh`` for filled areas) created once and then updated in place by assigning new
+points or vertices, so a redraw only re-uploads the changed vertex buffers instead of
+rasterising a whole figure on the CPU.
+"""
+import colorsys
+import math
+
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Line, Mesh, Rectangle
+from kivy.properties import ListProperty, NumericProperty
+from kivy.uix.widget import Widget
+
+
+def series_colour(i: int, total: int, alpha: float = 1.0) -> tuple:
+    """
+    :return: An RGBA colour spread evenly over a blue-to-yellow range for series ``i``.
+    """
+    hue = 0.7 - 0.55 * (i / float(max(1, total - 1)))
+    r, g, b = colorsys.hsv_to_rgb(hue, 0.8, 0.9)
+    return r, g, b, alpha
+
+
+def _text_texture(text: str, font_size: float = 12):
+    label = CoreLabel(text=text, font_size=font_size)
+    label.refresh()
+    return label.texture
+
+
+class _Chart(Widget):
+    """
+    Shared plumbing: a static layer (axes, labels) rebuilt only on resize and a
+    pool of per-series instructions reused across data updates.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._series = []
+        self.bind(pos=self._on_geometry, size=self._on_geometry)
+
+    def _on_geometry(self, *args):
+        self.canvas.before.clear()
+        with self.canvas.before:
+            self.draw_static()
+        self.update()
+
+    def _ensure_series(self, count: int, filled: bool = False) -> None:
+        """
+        Grow or shrink the pool of series instructions to ``count`` entries, each a
+        dict of its Color, Line and (if ``filled``) fill Color and Mesh.
+        """
+        while len(self._series) < count:
+            entry = {}
+            with self.canvas:
+                if filled:
+                    entry["fill_colour"] = Color(0, 0, 0, 0)
+                    entry["mesh"] = Mesh(mode="triangle_fan")
+                entry["colour"] = Color(1, 1, 1, 1)
+                entry["line"] = Line(width=1.2)
+            self._series.append(entry)
+        while len(self._series) > count:
+            entry = self._series.pop()
+            for instruction in entry.values():
+                self.canvas.remove(instruction)
+
+    def draw_static(self) -> None:
+        pass
+
+    def update(self, *args) -> None:
+        pass
+
+
+class RadarChart(_Chart):
+    """
+    Radar chart with one closed, lightly filled polygon per series.
+
+    ``labels`` names the axes and ``series`` is a list of value lists in axis order.
+    """
+    labels = ListProperty([])
+    series = ListProperty([])
+    max_value = NumericProperty(10)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bind(series=self.update, max_value=self.update, labels=self._on_geometry)
+
+    def _geometry(self) -> tuple:
+        cx, cy = self.center
+        radius = max(1.0, min(self.width, self.height) / 2.0 - 30)
+        n = max(1, len(self.labels))
+        # First axis at the top, going clockwise like the matplotlib version.
+        angles = [math.pi / 2 - 2 * math.pi * i / n for i in range(n)]
+        return cx, cy, radius, angles
+
+    def draw_static(self) -> None:
+        cx, cy, radius, angles = self._geometry()
+        Color(0.6, 0.6, 0.6, 1)
+        for ring in (0.25, 0.5, 0.75, 1.0):
+            r = radius * ring
+            points = []
+            for a in angles + angles[:1]:
+                points += [cx + r * math.cos(a), cy + r * math.sin(a)]
+            Line(points=points, width=1)
+        for label, a in zip(self.labels, angles):
+            Line(points=[cx, cy, cx + radius * math.cos(a), cy + radius * math.sin(a)], width=1)
+            texture = _text_texture(label)
+            x = cx + (radius + 14) * math.cos(a) - texture.width / 2.0
+            y = cy + (radius + 14) * math.sin(a) - texture.height / 2.0
+            Color(1, 1, 1, 1)
+            Rectangle(texture=texture, pos=(x, y), size=texture.size)
+            Color(0.6, 0.6, 0.6, 1)
+
+    def update(self, *args) -> None:
+        cx, cy, radius, angles = self._geometry()
+        total = len(self.series)
+        self._ensure_series(total, filled=True)
+        scale = radius / float(self.max_value or 1)
+        for i, (values, entry) in enumerate(zip(self.series, self._series)):
+            points, vertices = [], [cx, cy, 0, 0]
+            for v, a in zip(values, angles):
+                x, y = cx + v * scale * math.cos(a), cy + v * scale * math.sin(a)
+                points += [x, y]
+                vertices += [x, y, 0, 0]
+            points += points[:2]
+            vertices += vertices[4:8]
+            entry["colour"].rgba = series_colour(i, total)
+            entry["fill_colour"].rgba = series_colour(i, total, 0.1)
+            entry["line"].points = points
+            entry["mesh"].vertices = vertices
+            entry["mesh"].indices = list(range(len(vertices) // 4))
+
+
+def _clip(xs, ys, x0: float, x1: float) -> list:
+    """
+    :return: The (x, y) points of the polyline with x ascending that lie in
+             [x0, x1], plus the points where it crosses x0 and x1.
+    """
+    out = []
+    prev = None
+    for x, y in zip(xs, ys):
+        if prev is not None:
+            px, py = prev
+            if px < x0 <= x:
+                out.append((x0, py + (y - py) * (x0 - px) / ((x - px) or 1)))
+            if px <= x1 < x:
+                out.append((x1, py + (y - py) * (x1 - px) / ((x - px) or 1)))
+        if x0 <= x <= x1:
+            out.append((x, y))
+        prev = (x, y)
+    return out
+
+
+class LineChart(_Chart):
+    """
+    Line chart of several series over shared axes.
+
+    ``series`` is a list of (xs, ys) pairs with xs ascending, ``names`` optionally
+    labels them in a legend, and ``x_range`` / ``y_range`` are the visible data
+    ranges; lines are clipped at the x range.
+    """
+    series = ListProperty([])
+    names = ListProperty([])
+    x_range = ListProperty([0, 1])
+    y_range = ListProperty([0, 10])
+    padding = NumericProperty(24)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bind(series=self.update, x_range=self.update, y_range=self._on_geometry,
+                  names=self._on_geometry)
+
+    def draw_static(self) -> None:
+        p = self.padding
+        Color(0.6, 0.6, 0.6, 1)
+        Line(rectangle=(self.x + p, self.y + p, self.width - 2 * p, self.height - 2 * p), width=1)
+        lo, hi = self.y_range
+        for frac in (0.0, 0.5, 1.0):
+            texture = _text_texture(f"{lo + (hi - lo) * frac:g}", 10)
+            y = self.y + p + (self.height - 2 * p) * frac - texture.height / 2.0
+            Color(1, 1, 1, 1)
+            Rectangle(texture=texture, pos=(self.x + 2, y), size=texture.size)
+            Color(0.6, 0.6, 0.6, 1)
+        x = self.x + p + 4
+        for i, name in enumerate(self.names):
+            texture = _text_texture(name, 10)
+            Color(*series_colour(i, len(self.names)))
+            Rectangle(texture=texture, pos=(x, self.top - p - texture.height - 2), size=texture.size)
+            x += texture.width + 8
+
+    def update(self, *args) -> None:
+        p = self.padding
+        x0, x1 = self.x_range
+        y0, y1 = self.y_range
+        sx = (self.width - 2 * p) / float((x1 - x0) or 1)
+        sy = (self.height - 2 * p) / float((y1 - y0) or 1)
+        ox, oy = self.x + p, self.y + p
+        total = len(self.series)
+        self._ensure_series(total)
+        for i, ((xs, ys), entry) in enumerate(zip(self.series, self._series)):
+            points = []
+            for x, y in _clip(xs, ys, x0, x1):
+                points += [ox + (x - x0) * sx, oy + (y - y0) * sy]
+            entry["colour"].rgba = series_colour(i, total)
+            entry["line"].points = points
@@ -0,0 +1,122 @@
+"""
+Command-line batch mode: export and summarise a data.json without starting the GUI.
+
+    python cli.py path/to/data.json --export out.csv
+    python cli.py path/to/data.json --export out.csv --state out.state.json   # incremental
+    python cli.py path/to/data.json --stats            # print to stdout
+    python cli.py path/to/data.json --stats stats.json --json
+    python cli.py path/to/data.json --export out.csv --stream   # bounded memory
+    python cli.py path/to/data.json --rollup month > months.csv   # day/week/month rollups
+
+Only the headless data layer is imported, never Kivy or matplotlib, so start-up is fast
+enough for nightly scripts.
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+
+import data_store
+import journal
+from json_stream import StreamedData
+
+
+def build_stats(data: dict) -> dict:
+    """
+    Collect the same figures as the stats screen for one data file.
+
+    :param data: The loaded data dictionary.
+    :return: A JSON-serialisable dict of section and Pain (Arb.) statistics.
+    """
+    summary = data_store.section_summary(data)
+    arb = data_store.pain_arb_summary(data_store.hourly_pain_arb(data_store.combine_pain(data)))
+    highest = summary["highest"]
+    return {
+        "total_entries": summary["total_entries"],
+        "section_averages": {sec: round(avg, 3) for sec, avg in summary["averages"].items()},
+        "highest": ({"section": highest[0], "value": highest[1], "timestamp": highest[2]}
+                    if highest else None),
+        "pain_arb": {
+            "hours": arb["hours"],
+            "mean": round(arb["mean"], 3),
+            "min": round(arb["min"], 3),
+            "max": round(arb["max"], 3),
+            "max_at": arb["max_at"].strftime(data_store.TIMESTAMP_FORMAT) if arb["max_at"] else None,
+        },
+        "sleep_entries": len(data.get("sleep_data", [])),
+    }
+
+
+def format_stats(stats: dict) -> str:
+    """
+    :param stats: The output of :func:`build_stats`.
+    :return: A plain-text report in the style of the stats screen.
+    """
+    lines = [f"Total pain entries: {stats['total_entries']}"]
+    for section, avg in stats["section_averages"].items():
+        lines.append(f"{section}: avg pain {avg:.2f}")
+    if stats["highest"]:
+        h = stats["highest"]
+        lines.append(f"Highest recorded: {h['value']:.1f} in {h['section']} at {h['timestamp']}")
+    arb = stats["pain_arb"]
+    lines.append(f"Pain (Arb.): {arb['hours']} hours, mean {arb['mean']:.2f}, "
+                 f"min {arb['min']:.2f}, max {arb['max']:.2f} at {arb['max_at']}")
+    lines.append(f"Sleep entries: {stats['sleep_entries']}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export or summarise a pain logger data file.")
+    parser.add_argument("data_file", help="Path of the data.json to read.")
+    parser.add_argument("--export", metavar="CSV_PATH", help="Write the CSV export to this path.")
+    parser.add_argument("--state", metavar="STATE_PATH",
+                        help="Export incrementally, keeping the watermark in this file.")
+    parser.add_argument("--stats", metavar="PATH", nargs="?", const="-",
+                        help="Write statistics to PATH (stdout if omitted).")
+    parser.add_argument("--json", action="store_true", help="Write statistics as JSON.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream data.json section by section instead of loading it whole "
+                             "(lower peak memory, slower); it is loaded anyway while edits are "
+                             "still journalled.")
+    parser.add_argument("--rollup", choices=data_store.ROLLUP_LEVELS,
+                        help="Write the day, ISO-week or month rollups as CSV to stdout.")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.export and not args.stats and not args.rollup:
+        parser.error("nothing to do: pass --export, --stats and/or --rollup")
+    if args.rollup and args.stream:
+        parser.error("--rollup needs the loaded data; drop --stream")
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format="%(levelname)s - %(message)s")
+    # Journalled edits and deletions are only applied by load_data, so the stream is
+    # only used when there are none.
+    if args.stream and not journal.count(args.data_file):
+        data = StreamedData(args.data_file)
+    else:
+        data = data_store.load_data(args.data_file)
+
+    if args.export:
+        if args.state:
+            data_store.export_csv_incremental(data, args.export, args.state)
+        else:
+            data_store.export_csv(data, args.export)
+
+    if args.stats:
+        stats = build_stats(data)
+        text = json.dumps(stats, indent=2) if args.json else format_stats(stats)
+        if args.stats == "-":
+            print(text)
+        else:
+            with open(args.stats, "w") as f:
+                f.write(text + "\n")
+
+    if args.rollup:
+        csv.writer(sys.stdout).writerows(data_store.rollup_csv_rows(data, args.rollup))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
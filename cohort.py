@@ -0,0 +1,204 @@
+"""
+Cohort reports over a directory of patient data files.
+
+    python cohort.py patients/ --output cohort.csv --workers 8
+
+Every ``*.json`` (data.json layout) and ``*.csv`` (app export) file in the directory is
+summarised in its own worker process using the headless data layer; the per-patient
+summaries are then merged into one table with a cohort row at the end.
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import data_store
+from bulk_import import import_file
+
+# Upper bounds of the Pain (Arb.) distribution buckets; the last bucket is open ended.
+ARB_BUCKETS = [1, 2, 3, 4, 6]
+ARB_BUCKET_LABELS = [f"arb_{lo}-{hi}" for lo, hi in zip([0] + ARB_BUCKETS, ARB_BUCKETS)] + \
+    [f"arb_{ARB_BUCKETS[-1]}+"]
+COUNT_COLUMNS = {"hours", "sleep_nights", "activity_hours", *ARB_BUCKET_LABELS}
+
+
+def load_patient_file(path: str) -> dict:
+    """
+    :param path: A data.json or CSV export.
+    :return: The data dictionary for that patient.
+    """
+    if path.lower().endswith(".csv"):
+        data = {}
+        import_file(data, path)
+        return data
+    return data_store.load_data(path)
+
+
+def pearson(xs: list, ys: list):
+    """
+    :return: The Pearson correlation of two equal-length sequences, or None if undefined.
+    """
+    n = len(xs)
+    if n < 3:
+        return None
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x == 0 or var_y == 0:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def _percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarise_patient(path: str) -> dict:
+    """
+    Compute the cohort columns for one patient file. Runs inside a worker process.
+
+    :param path: A data.json or CSV export.
+    :return: A flat dict of report columns.
+    """
+    data = load_patient_file(path)
+    row = {"patient": os.path.splitext(os.path.basename(path))[0]}
+
+    averages = data_store.section_summary(data)["averages"]
+    for section in data_store.PAIN_SECTIONS:
+        row[f"avg_{section}"] = averages.get(section)
+
+    hourly = data_store.hourly_pain_arb(data_store.combine_pain(data))
+    arb_values = sorted(v for _, v in hourly)
+    row["hours"] = len(arb_values)
+    row["arb_mean"] = sum(arb_values) / len(arb_values) if arb_values else None
+    row["arb_median"] = _percentile(arb_values, 50) if arb_values else None
+    row["arb_p90"] = _percentile(arb_values, 90) if arb_values else None
+    bounds = [0] + ARB_BUCKETS + [math.inf]
+    for label, lower, upper in zip(ARB_BUCKET_LABELS, bounds, bounds[1:]):
+        row[label] = sum(1 for v in arb_values if lower <= v < upper)
+
+    sleep = data.get("sleep_data", [])
+    row["sleep_nights"] = len(sleep)
+    row["sleep_mean_hours"] = (sum(float(e.get("hours_slept", 0)) for e in sleep) / len(sleep)
+                               if sleep else None)
+    row["sleep_mean_quality"] = (sum(float(e.get("sleep_quality", 0)) for e in sleep) / len(sleep)
+                                 if sleep else None)
+
+    arb_by_hour = {dt.strftime(data_store.TIMESTAMP_FORMAT): v for dt, v in hourly}
+    levels, pains = [], []
+    for ts, entries in data.get("activity_data", {}).items():
+        if ts not in arb_by_hour:
+            continue
+        for entry in entries:
+            try:
+                levels.append(float(entry.get("activity_level", "")))
+            except (TypeError, ValueError):
+                continue
+            pains.append(arb_by_hour[ts])
+    row["activity_hours"] = len(levels)
+    row["activity_pain_corr"] = pearson(levels, pains)
+    return row
+
+
+def cohort_row(rows: list) -> dict:
+    """
+    Merge per-patient rows into one cohort row: counts are summed, other columns are
+    averaged weighted by the number of hours (or nights) each patient contributed, so
+    the cohort median and p90 are approximations.
+
+    :param rows: Rows from :func:`summarise_patient`.
+    :return: The cohort summary row.
+    """
+    merged = {"patient": f"COHORT ({len(rows)})"}
+    if not rows:
+        return merged
+    for key in rows[0]:
+        if key == "patient":
+            continue
+        if key in COUNT_COLUMNS:
+            merged[key] = sum(r[key] for r in rows)
+            continue
+        weight_key = "sleep_nights" if key.startswith("sleep_") else \
+            "activity_hours" if key.startswith("activity_") else "hours"
+        weighted = [(r[key], r[weight_key]) for r in rows if r.get(key) is not None and r[weight_key]]
+        total_weight = sum(w for _, w in weighted)
+        merged[key] = sum(v * w for v, w in weighted) / total_weight if total_weight else None
+    return merged
+
+
+def find_patient_files(directory: str) -> list:
+    """
+    :return: The sorted .json and .csv files directly inside ``directory``.
+    """
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith((".json", ".csv"))
+    )
+
+
+def run_cohort(paths: list, workers: int = None) -> tuple:
+    """
+    Summarise every file in ``paths`` on a process pool.
+
+    :param paths: Patient files.
+    :param workers: Number of worker processes (default: CPU count).
+    :return: (rows including the cohort row, failed paths, elapsed seconds).
+    """
+    start = time.perf_counter()
+    rows, failed = [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(summarise_patient, path): path for path in paths}
+        for future, path in futures.items():
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print(f"Failed to summarise {path}: {e}", file=sys.stderr)
+                failed.append(path)
+    rows.append(cohort_row(rows))
+    return rows, failed, time.perf_counter() - start
+
+
+def write_table(rows: list, path: str) -> None:
+    """
+    Write the summary table as CSV, rounding floats to three decimals.
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: round(v, 3) if isinstance(v, float) else ("" if v is None else v)
+                             for k, v in row.items()})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Summarise a directory of patient data files.")
+    parser.add_argument("directory")
+    parser.add_argument("--output", default="cohort_report.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    paths = find_patient_files(args.directory)
+    if not paths:
+        print(f"No .json or .csv files found in {args.directory}", file=sys.stderr)
+        return 1
+    rows, failed, elapsed = run_cohort(paths, args.workers)
+    if len(rows) == 1:
+        print("No patient file could be summarised.", file=sys.stderr)
+        return 1
+    write_table(rows, args.output)
+    done = len(paths) - len(failed)
+    print(f"Summarised {done} files in {elapsed:.2f}s ({done / elapsed:.1f} files/s); "
+          f"{len(failed)} failed. Report written to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
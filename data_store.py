@@ -0,0 +1,1732 @@
+"""
+Headless data layer for the pain logger.
+
+Everything in here works on a plain data dictionary (the parsed data.json) or on an
+explicit file path, so it can be used and timed without starting Kivy. The screens
+in main.py only resolve the file path and render what these functions return.
+"""
+import bisect
+import calendar
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import block_store
+import journal
+import notes_blob
+import perf
+import regions
+from json_stream import StreamedArray
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Configured body regions (see regions.py): [(key, label)], the keys alone and the
+# order of the region picker buttons.
+_region_config = regions.load_config()
+REGIONS = _region_config["regions"]
+PAIN_SECTIONS = [key for key, _ in REGIONS]
+REGION_LABELS = dict(REGIONS)
+REGION_PICKER_ORDER = _region_config["picker_order"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+EXPORT_TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M"
+# Number of recent changes kept in data["meta"]["changes"].
+CHANGE_LOG_LIMIT = 2000
+# Entry edits kept in data["meta"]["undo"] once they are compacted into data.json.
+UNDO_LIMIT = 20
+# Journalled edits after which data.json is rewritten to fold them in.
+COMPACT_THRESHOLD = 200
+ENTRY_KINDS = ("pain", "activity", "note", "sleep")
+ROLLUP_LEVELS = ("day", "week", "month")
+ARB_METRIC = "Pain (Arb.)"
+# Pain (Arb.) averages over the six regions of the original body chart whatever
+# regions are configured, so adding regions never changes the values of a history.
+ARB_REGION_COUNT = len(regions.DEFAULT_REGIONS)
+# Seconds a writer waits for another process to release data.json before giving up.
+LOCK_TIMEOUT = 2.0
+# Shorter wait for compacting the journal on pause or exit, which must not hold up the UI.
+COMPACT_LOCK_TIMEOUT = 0.5
+# Attempts of a load-modify-write cycle that keeps losing the version check.
+UPDATE_RETRIES = 5
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+
+class ConflictError(RuntimeError):
+    """
+    data.json changed (or stayed locked) between loading it and writing it back.
+    """
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _try_lock(f) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def locked(data_file: str, timeout: float = LOCK_TIMEOUT):
+    """
+    Hold the exclusive writer lock of ``data_file`` (an OS lock on "data.json.lock",
+    so it also excludes other processes such as a widget or notification service).
+    The lock is re-entrant within a process.
+
+    :param data_file: Path of data.json.
+    :param timeout: Seconds to wait for the lock.
+    :raises ConflictError: If the lock could not be taken in time.
+    """
+    with _locks_guard:
+        state = _locks.setdefault(data_file, {"thread_lock": threading.RLock(), "depth": 0, "file": None})
+    if not state["thread_lock"].acquire(timeout=timeout):
+        raise ConflictError(f"{data_file} is locked by another thread")
+    try:
+        if state["depth"] == 0:
+            f = open(data_file + ".lock", "a+")
+            deadline = time.monotonic() + timeout
+            while not _try_lock(f):
+                if time.monotonic() > deadline:
+                    f.close()
+                    raise ConflictError(f"{data_file} is locked by another process")
+                time.sleep(0.01)
+            state["file"] = f
+        state["depth"] += 1
+        try:
+            yield
+        finally:
+            state["depth"] -= 1
+            if state["depth"] == 0:
+                _unlock(state["file"])
+                state["file"].close()
+                state["file"] = None
+    finally:
+        state["thread_lock"].release()
+
+
+def stored_token(data_file: str) -> tuple:
+    """
+    The :func:`data_token` of what is currently stored, journal included. Cheap when
+    data.json is as our last write left it: the id and version then come from the
+    block manifest instead of parsing the file.
+
+    :param data_file: Path of data.json.
+    :return: (file id, data version).
+    """
+    manifest = block_store.load_manifest(data_file)
+    if not os.path.exists(data_file):
+        token = (None, 0)
+    elif manifest.get("id") is not None and block_store.data_file_matches(data_file):
+        token = (manifest["id"], manifest.get("version", 0))
+    else:
+        try:
+            with open(data_file, "r") as f:
+                token = data_token(json.load(f))
+        except ValueError:
+            token = (manifest.get("id"), manifest.get("version", 0))
+    for op in journal.read(data_file):
+        if op.get("id") == token[0] and op.get("version", 0) > token[1]:
+            token = (token[0], op["version"])
+    return token
+
+
+def check_unchanged(data_file: str, token: tuple) -> None:
+    """
+    Optimistic concurrency check; call it while holding :func:`locked`.
+
+    :param token: The :func:`data_token` of the data when it was loaded.
+    :raises ConflictError: If another writer has changed the stored data since.
+    """
+    current = stored_token(data_file)
+    if current != tuple(token):
+        raise ConflictError(f"{data_file} changed from version {token} to {current}")
+
+
+def retrying(attempt, data_file: str = None, retries: int = UPDATE_RETRIES):
+    """
+    Call ``attempt`` until it gets through without a :class:`ConflictError`,
+    backing off a little longer after each conflict. With ``data_file`` given, the
+    last attempt runs entirely under :func:`locked`, so a writer that keeps losing
+    the optimistic race still gets its turn.
+
+    :param attempt: Callable that loads, modifies and stores the data.
+    :param data_file: Path of data.json.
+    :param retries: Number of attempts before the last ConflictError is raised.
+    :return: What ``attempt`` returns.
+    """
+    for i in range(retries - 1):
+        try:
+            return attempt()
+        except ConflictError as e:
+            logger.info("Retrying after a concurrent write (%s)", e)
+            time.sleep(random.uniform(0, 0.02 * (i + 1)))
+    if data_file is None:
+        return attempt()
+    with locked(data_file):
+        return attempt()
+
+
+def update_data(data_file: str, mutate, retries: int = UPDATE_RETRIES) -> tuple:
+    """
+    Safe load-modify-write cycle for data.json when other processes may write too.
+
+    The data is loaded and ``mutate`` runs without holding the lock; the lock is
+    only taken to check that nobody else wrote in the meantime and to write. On a
+    conflict the cycle starts again from the fresh file, so ``mutate`` must only
+    depend on the data it is given.
+
+    :param data_file: Path of data.json.
+    :param mutate: Callable modifying the data dictionary in place (recording its
+                   changes with :func:`record_change`).
+    :param retries: Attempts before giving up.
+    :return: (the data as written, what ``mutate`` returned).
+    :raises ConflictError: If the lock could not be taken.
+    """
+    def attempt():
+        data = load_data(data_file)
+        token = data_token(data)
+        result = mutate(data)
+        if data_token(data) != token:
+            with locked(data_file):
+                check_unchanged(data_file, token)
+                write_data(data_file, data)
+        return data, result
+
+    return retrying(attempt, data_file, retries)
+
+
+@perf.timed("load_data")
+def load_data(data_file: str) -> dict:
+    """
+    Load the data dictionary from a JSON file.
+
+    If the file cannot be parsed, the history is rebuilt from the intact blocks of
+    the checksummed snapshot (see block_store); the unreadable file itself is kept
+    aside by the next :func:`write_data`. Entry edits still in the journal are
+    applied on top. Note bodies stay in the note blob until they are read (see
+    notes_blob). Sleep lists written by older versions are sorted by date with one
+    entry per date, and pain sections by timestamp.
+
+    :param data_file: Path of data.json.
+    :return: The loaded data, or an empty dict if the file is missing or unreadable
+             and nothing could be recovered.
+    """
+    logger.debug("Loading data from %s", data_file)
+    if os.path.exists(data_file):
+        try:
+            with open(data_file, "r") as f:
+                data = notes_blob.attach(data_file, json.load(f))
+            _normalise_sleep(data)
+            sort_pain_sections(data)
+            logger.debug(
+                "Data loaded successfully with %d total entries",
+                sum(len(v) for v in data.values() if isinstance(v, list))
+            )
+            _replay_journal(data_file, data)
+            return data
+        except Exception as e:
+            logger.exception("Error loading data: %s", e)
+            data, lost = block_store.recover(data_file)
+            _normalise_sleep(data)
+            sort_pain_sections(data)
+            if data:
+                logger.warning("Recovered data from the block snapshot; unreadable blocks: %s",
+                               ", ".join(lost) or "none")
+                _replay_journal(data_file, data)
+                return data
+    return {}
+
+
+def _preserve_unreadable(data_file: str) -> None:
+    """
+    Move ``data_file`` aside if it exists but cannot be parsed, so that a write never
+    replaces unreadable data. Files left exactly as our last write are not re-parsed.
+    """
+    if not os.path.exists(data_file) or block_store.data_file_matches(data_file):
+        return
+    try:
+        with open(data_file, "r") as f:
+            json.load(f)
+    except ValueError:
+        aside = f"{data_file}.unreadable-{datetime.now():%Y%m%d-%H%M%S}"
+        os.replace(data_file, aside)
+        logger.error("%s could not be parsed; it was kept as %s instead of being overwritten.",
+                     data_file, aside)
+
+
+def _dirty_blocks(data_file: str, data: dict):
+    """
+    :return: The names of the blocks that may differ from the stored snapshot, or
+             None if the change log cannot tell (all blocks are then checked). The
+             other block is included with any change, since the rollups and flare
+             state it holds follow every logged change.
+    """
+    manifest = block_store.load_manifest(data_file)
+    meta = data.get("meta", {})
+    if not manifest or meta.get("id") is None or manifest.get("id") != meta.get("id"):
+        return None
+    changed = changes_since(data, manifest.get("version", 0))
+    if changed is None:
+        return None
+    names = {block_store.block_name(key) for key in changed} | {block_store.META_BLOCK}
+    if changed:
+        names.add(block_store.OTHER_BLOCK)
+    return names
+
+
+@perf.timed("write_data")
+def write_data(data_file: str, data: dict) -> None:
+    """
+    Write the data dictionary to a JSON file and update its block snapshot.
+
+    The file is replaced atomically; an existing file that cannot be parsed is kept
+    aside rather than overwritten. Only the monthly blocks touched since the last
+    write (according to the change log) are re-encoded. Journalled entry edits are
+    part of ``data`` (load_data applied them), so the journal is folded into the
+    undo history and emptied. The rollups are refreshed before writing. New note
+    bodies are appended to the note blob; data.json only indexes them.
+
+    :param data_file: Path of data.json.
+    :param data: The data dictionary to write.
+    """
+    logger.debug("Writing data to %s", data_file)
+    try:
+        with locked(data_file):
+            _write_locked(data_file, data)
+        logger.info("Data written successfully.")
+    except Exception as e:
+        logger.exception("Error writing data: %s", e)
+
+
+def _write_locked(data_file: str, data: dict) -> None:
+    _preserve_unreadable(data_file)
+    ops = _fold_journal(data_file, data)
+    refresh_rollups(data)
+    document = notes_blob.store(data_file, data)
+    tmp_path = data_file + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    names = _dirty_blocks(data_file, data)
+    os.replace(tmp_path, data_file)
+    if ops:
+        journal.clear(data_file)
+    if "notes_index" in document:
+        notes_blob.remove_stale(data_file, document["notes_index"]["blob"])
+    block_store.write_blocks(data_file, data, names)
+
+
+@perf.timed("verify_storage")
+def verify_storage(data_file: str) -> dict:
+    """
+    Start-up integrity check: checksum the blocks whose files changed since the last
+    write and rebuild any bad block from data.json. A snapshot is created for data
+    files that do not have one yet.
+
+    :param data_file: Path of data.json.
+    :return: {"checked": blocks read, "bad": bad block names, "repaired": bool}.
+    """
+    report = block_store.verify(data_file)
+    report["repaired"] = False
+    missing_snapshot = not block_store.load_manifest(data_file)
+    if not os.path.exists(data_file) or not (report["bad"] or missing_snapshot):
+        return report
+    with locked(data_file):
+        try:
+            with open(data_file, "r") as f:
+                data = notes_blob.attach(data_file, json.load(f))
+        except ValueError as e:
+            logger.error("Cannot repair blocks %s: %s is unreadable (%s)", report["bad"], data_file, e)
+            return report
+        for name in report["bad"]:
+            path = os.path.join(block_store.block_dir(data_file), name + ".json")
+            if os.path.exists(path):
+                os.remove(path)
+        block_store.write_blocks(data_file, data, None if missing_snapshot else set(report["bad"]))
+    report["repaired"] = True
+    return report
+
+
+def data_version(data: dict) -> int:
+    """
+    :param data: The loaded data dictionary.
+    :return: The number of recorded changes to ``data``; 0 for files without metadata.
+    """
+    return data.get("meta", {}).get("version", 0)
+
+
+def data_token(data: dict) -> tuple:
+    """
+    Identify the current state of a data file for caching derived results.
+
+    :param data: The loaded data dictionary.
+    :return: (file id, data version); the id changes when the data is deleted and
+             started again, so versions of different histories never collide.
+    """
+    meta = data.get("meta", {})
+    return meta.get("id"), meta.get("version", 0)
+
+
+def record_change(data: dict, key: str) -> int:
+    """
+    Bump the data version and log which hour key (or sleep date) changed.
+
+    The log in data["meta"]["changes"] holds the last CHANGE_LOG_LIMIT
+    [version, key] pairs, so consumers that remember a version can find out what
+    changed since then without rescanning the history.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param key: The hour key, or "%Y-%m-%d" date for sleep entries, that changed.
+    :return: The new data version.
+    """
+    meta = data.setdefault("meta", {})
+    meta.setdefault("id", uuid.uuid4().hex)
+    version = meta.get("version", 0) + 1
+    _log_change(meta, version, key)
+    return version
+
+
+def _log_change(meta: dict, version: int, key: str) -> None:
+    meta["version"] = version
+    changes = meta.setdefault("changes", [])
+    changes.append([version, key])
+    if len(changes) > CHANGE_LOG_LIMIT:
+        del changes[:len(changes) - CHANGE_LOG_LIMIT]
+
+
+def changes_since(data: dict, version: int):
+    """
+    :param data: The loaded data dictionary.
+    :param version: A version previously returned by :func:`data_version`.
+    :return: The set of keys changed after ``version``, or None if the change log no
+             longer reaches back that far (or ``version`` is from another file).
+    """
+    current = data_version(data)
+    if version > current:
+        return None
+    if version == current:
+        return set()
+    changes = data.get("meta", {}).get("changes", [])
+    if not changes or changes[0][0] > version + 1:
+        return None
+    return {key for v, key in changes if v > version}
+
+
+def save_measurement(data: dict, section: str, timestamp_str: str, value: float) -> str:
+    """
+    Merge one pain reading into ``data``, keeping the higher value for an existing hour.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param section: The body section, e.g. "RU".
+    :param timestamp_str: The hour key in TIMESTAMP_FORMAT.
+    :param value: The pain score.
+    :return: "new", "updated" or "skipped".
+    """
+    section_entries = data.setdefault(section, [])
+    i = bisect.bisect_left(section_entries, timestamp_str, key=_pain_timestamp)
+    if i < len(section_entries) and _pain_timestamp(section_entries[i]) == timestamp_str:
+        existing_entry = section_entries[i]
+        if existing_entry["value"] < value:
+            existing_entry["value"] = value
+            record_change(data, timestamp_str)
+            return "updated"
+        return "skipped"
+    section_entries.insert(i, {"value": value, "timestamp": timestamp_str})
+    record_change(data, timestamp_str)
+    return "new"
+
+
+def save_measurements(data: dict, readings) -> dict:
+    """
+    Merge many pain readings at once with the keep-higher rule of :func:`save_measurement`.
+
+    Each section is indexed by hour once, so a batch costs one pass over the
+    history instead of one scan per reading.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param readings: Iterable of (section, hour key, value).
+    :return: The number of readings that were "new", "updated" and "skipped".
+    """
+    counts = {"new": 0, "updated": 0, "skipped": 0}
+    index = {}
+    for section, timestamp_str, value in readings:
+        if section not in index:
+            index[section] = {e["timestamp"]: e for e in reversed(data.setdefault(section, []))}
+        existing_entry = index[section].get(timestamp_str)
+        if existing_entry is None:
+            entry = {"value": value, "timestamp": timestamp_str}
+            bisect.insort(data[section], entry, key=_pain_timestamp)
+            index[section][timestamp_str] = entry
+            status = "new"
+        elif existing_entry["value"] < value:
+            existing_entry["value"] = value
+            status = "updated"
+        else:
+            status = "skipped"
+        if status != "skipped":
+            record_change(data, timestamp_str)
+        counts[status] += 1
+    return counts
+
+
+def upsert_sleep(data: dict, entry: dict) -> bool:
+    """
+    Store a sleep entry, replacing any entry already recorded for the same date.
+
+    data["sleep_data"] is kept sorted by date with one entry per date, so the
+    position of a date is found by binary search. Lists written by older versions
+    (append-only, possibly with duplicates) are normalised by :func:`load_data`.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param entry: A sleep entry with a "date" in "%Y-%m-%d" format.
+    :return: True if an existing entry for that date was replaced.
+    """
+    replaced = _place_sleep(data, entry)
+    record_change(data, entry["date"])
+    return replaced
+
+
+def _sleep_date(entry: dict) -> str:
+    return entry.get("date", "")
+
+
+def _normalise_sleep(data: dict) -> None:
+    """
+    Sort data["sleep_data"] by date with one entry per date, keeping the last entry
+    logged for each date, if it is not already.
+    """
+    entries = data.get("sleep_data")
+    if not isinstance(entries, list):
+        return
+    dates = [_sleep_date(e) for e in entries]
+    if any(a >= b for a, b in zip(dates, dates[1:])):
+        by_date = {_sleep_date(e): e for e in entries}
+        entries[:] = [by_date[d] for d in sorted(by_date)]
+
+
+def _pain_timestamp(entry: dict) -> str:
+    ts = entry.get("timestamp")
+    return ts if isinstance(ts, str) else ""
+
+
+def sort_pain_sections(data: dict) -> None:
+    """
+    Sort the pain sections of ``data`` by timestamp, if they are not already. Every
+    write keeps them sorted, so the readings of an hour or a day are found by
+    binary search; code that appends readings itself calls this afterwards.
+    """
+    for sec in PAIN_SECTIONS:
+        entries = data.get(sec)
+        if not isinstance(entries, list):
+            continue
+        stamps = [_pain_timestamp(e) for e in entries]
+        if any(a > b for a, b in zip(stamps, stamps[1:])):
+            entries.sort(key=_pain_timestamp)
+
+
+def _pain_slice(entries: list, start: str, end: str) -> list:
+    """
+    :param entries: A pain section, sorted by timestamp.
+    :return: The entries with ``start <= timestamp < end``.
+    """
+    lo = bisect.bisect_left(entries, start, key=_pain_timestamp)
+    return entries[lo:bisect.bisect_left(entries, end, lo=lo, key=_pain_timestamp)]
+
+
+def _place_sleep(data: dict, entry: dict) -> bool:
+    entries = data.setdefault("sleep_data", [])
+    i = bisect.bisect_left(entries, entry["date"], key=_sleep_date)
+    replaced = i < len(entries) and _sleep_date(entries[i]) == entry["date"]
+    if replaced:
+        entries[i] = entry
+    else:
+        entries.insert(i, entry)
+    return replaced
+
+
+def add_medication(data: dict, entry: dict) -> None:
+    """
+    Store a medication dose.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param entry: {"timestamp": hour key the dose was taken, "name": str, "dose": str,
+                   "duration_hours": number of hours the dose stays active}.
+    :raises ValueError: If the entry has no valid start or a non-positive duration.
+    """
+    if medication_window(entry) is None:
+        raise ValueError(f"Invalid medication entry: {entry!r}")
+    data.setdefault("medication_data", []).append(entry)
+    record_change(data, entry["timestamp"])
+
+
+def medication_window(entry: dict):
+    """
+    :param entry: A medication entry, see :func:`add_medication`.
+    :return: (start, end) hour keys of the half-open window the dose is active in,
+             or None if the entry is malformed.
+    """
+    start = _parse_timestamp(entry.get("timestamp")) if isinstance(entry, dict) else None
+    try:
+        hours = float(entry["duration_hours"])
+    except (TypeError, KeyError, ValueError):
+        return None
+    if start is None or not hours > 0:
+        return None
+    return entry["timestamp"], (start + timedelta(hours=hours)).strftime(TIMESTAMP_FORMAT)
+
+
+def _doses_reaching(entries, start: str) -> list:
+    """
+    :return: The medication entries that started at most the longest logged duration
+             before hour key ``start``, a superset of those still active from ``start``
+             on, chosen by comparing keys without parsing them.
+    """
+    longest = 0.0
+    for entry in entries:
+        try:
+            longest = max(longest, float(entry["duration_hours"]))
+        except (TypeError, KeyError, ValueError):
+            continue
+    first = _parse_timestamp(start)
+    if first is None:
+        return list(entries)
+    earliest = (first - timedelta(hours=longest)).strftime(TIMESTAMP_FORMAT)
+    return [entry for entry in entries
+            if isinstance(entry, dict) and isinstance(entry.get("timestamp"), str)
+            and entry["timestamp"] >= earliest]
+
+
+def medication_label(entry: dict) -> str:
+    """
+    :return: The name and dose of a medication entry, e.g. "Ibuprofen 400 mg".
+    """
+    return f"{entry.get('name', '')} {entry.get('dose', '')}".strip()
+
+
+def has_medications(data: dict) -> bool:
+    """
+    :return: True if ``data`` (a dict or a json_stream.StreamedData) has medication
+             entries; a streamed list counts without being scanned.
+    """
+    entries = _entries(data, "medication_data")
+    return isinstance(entries, StreamedArray) or bool(entries)
+
+
+def entry_value(data: dict, kind: str, key: str, section: str = None):
+    """
+    :param data: The loaded data dictionary.
+    :param kind: One of ENTRY_KINDS.
+    :param key: The hour key, or the "%Y-%m-%d" date for sleep.
+    :param section: The body section, for pain readings.
+    :return: The stored value: the pain score, the hour's list of activity entries,
+             the note text or the sleep entry; None if there is none.
+    """
+    if kind == "pain":
+        for entry in data.get(section, []):
+            if entry.get("timestamp") == key:
+                return entry.get("value")
+        return None
+    if kind == "activity":
+        return data.get("activity_data", {}).get(key)
+    if kind == "note":
+        return data.get("notes_data", {}).get(key)
+    if kind == "sleep":
+        return latest_sleep(data, key)
+    raise ValueError(f"Unknown entry kind: {kind}")
+
+
+def _set_entry(data: dict, kind: str, key: str, value, section: str = None) -> None:
+    """
+    Store ``value`` as the entry, or remove the entry if ``value`` is None. The
+    change is not recorded.
+    """
+    if kind == "pain":
+        entries = data.setdefault(section, [])
+        lo = bisect.bisect_left(entries, key, key=_pain_timestamp)
+        hi = bisect.bisect_right(entries, key, lo=lo, key=_pain_timestamp)
+        if value is None:
+            del entries[lo:hi]
+        elif hi > lo:
+            entries[lo]["value"] = value
+        else:
+            entries.insert(lo, {"value": value, "timestamp": key})
+    elif kind in ("activity", "note"):
+        store = data.setdefault("activity_data" if kind == "activity" else "notes_data", {})
+        if value is None:
+            store.pop(key, None)
+        else:
+            store[key] = value
+    elif kind == "sleep":
+        if value is None:
+            entries = data.get("sleep_data", [])
+            lo = bisect.bisect_left(entries, key, key=_sleep_date)
+            del entries[lo:bisect.bisect_right(entries, key, lo=lo, key=_sleep_date)]
+        else:
+            _place_sleep(data, dict(value, date=key))
+    else:
+        raise ValueError(f"Unknown entry kind: {kind}")
+
+
+def edit_entry(data_file: str, data: dict, kind: str, key: str, value,
+               section: str = None, undoes: int = None) -> dict:
+    """
+    Replace or delete one pain reading, hour of activities, note or sleep entry.
+
+    The edit is applied to ``data`` and appended to the journal as one patch
+    (or, with ``value`` None, tombstone) record, so it costs O(1) to write however
+    long the history is. data.json itself is rewritten only when the journal grows
+    past COMPACT_THRESHOLD, or by the next ordinary :func:`write_data`.
+
+    :param data_file: Path of data.json.
+    :param data: The data dictionary loaded from ``data_file``; modified in place.
+    :param kind: One of ENTRY_KINDS.
+    :param key: The hour key, or the "%Y-%m-%d" date for sleep.
+    :param value: The new value (see :func:`entry_value`), or None to delete.
+    :param section: The body section, for pain readings.
+    :param undoes: The version of the edit this one reverts, when called by :func:`undo_edit`.
+    :return: The journal record.
+    :raises ConflictError: If the stored data changed since ``data`` was loaded;
+                           ``data`` is left untouched.
+    """
+    if kind not in ENTRY_KINDS or (kind == "pain" and section not in PAIN_SECTIONS):
+        raise ValueError(f"Cannot edit {kind} entry {key} ({section})")
+    op = {"kind": kind, "key": key, "value": value, "prev": entry_value(data, kind, key, section)}
+    if section is not None:
+        op["section"] = section
+    if undoes is not None:
+        op["undoes"] = undoes
+    new_file = "id" not in data.get("meta", {})
+    with locked(data_file):
+        check_unchanged(data_file, data_token(data))
+        _set_entry(data, kind, key, value, section)
+        op["version"] = record_change(data, key)
+        op["id"] = data["meta"]["id"]
+        journal.append(data_file, op)
+        # A file without an id cannot be matched by the journal yet, so write it out.
+        if new_file or journal.count(data_file) >= COMPACT_THRESHOLD:
+            write_data(data_file, data)
+    return op
+
+
+def delete_entry(data_file: str, data: dict, kind: str, key: str, section: str = None) -> dict:
+    """
+    Delete one entry; see :func:`edit_entry`.
+    """
+    return edit_entry(data_file, data, kind, key, None, section)
+
+
+def undo_history(data_file: str, data: dict) -> list:
+    """
+    :param data_file: Path of data.json.
+    :param data: The data dictionary loaded from ``data_file``.
+    :return: The entry edits that can still be undone, most recent first.
+    """
+    meta = data.get("meta", {})
+    ops = meta.get("undo", []) + [op for op in journal.read(data_file)
+                                  if op.get("id") == meta.get("id")
+                                  and op.get("version", 0) <= meta.get("version", 0)]
+    undone = {op["undoes"] for op in ops if "undoes" in op}
+    return [op for op in reversed(ops) if "undoes" not in op and op["version"] not in undone]
+
+
+def undo_edit(data_file: str, data: dict):
+    """
+    Revert the most recent entry edit that has not been undone yet. Repeated
+    calls step back through the last UNDO_LIMIT edits.
+
+    :param data_file: Path of data.json.
+    :param data: The data dictionary loaded from ``data_file``; modified in place.
+    :return: The journal record of the revert, or None if there is nothing to undo.
+    """
+    history = undo_history(data_file, data)
+    if not history:
+        return None
+    op = history[0]
+    return edit_entry(data_file, data, op["kind"], op["key"], op["prev"],
+                      op.get("section"), undoes=op["version"])
+
+
+def compact(data_file: str, timeout: float = LOCK_TIMEOUT) -> bool:
+    """
+    Fold the journalled edits into data.json.
+
+    :param data_file: Path of data.json.
+    :param timeout: Seconds to wait for the writer lock.
+    :return: True if there was anything to fold in.
+    :raises ConflictError: If another writer held data.json for longer than ``timeout``.
+    """
+    with locked(data_file, timeout):
+        if not journal.count(data_file):
+            return False
+        write_data(data_file, load_data(data_file))
+    return True
+
+
+def _replay_journal(data_file: str, data: dict, ops: list = None) -> None:
+    """
+    Apply the journalled edits that are newer than ``data``. Each keeps the version
+    it was given when it was made, so replaying is deterministic and the change log
+    sees the same keys as the process that made the edits.
+    """
+    meta = data.get("meta", {})
+    for op in journal.read(data_file) if ops is None else ops:
+        if op.get("id") != meta.get("id") or op.get("version", 0) <= meta.get("version", 0):
+            continue
+        _set_entry(data, op["kind"], op["key"], op["value"], op.get("section"))
+        _log_change(meta, op["version"], op["key"])
+
+
+def _fold_journal(data_file: str, data: dict) -> list:
+    """
+    Make ``data`` include every journalled edit and move those edits into its undo
+    history, ready for the journal to be emptied.
+
+    :return: The journal records that were read.
+    """
+    ops = journal.read(data_file)
+    _replay_journal(data_file, data, ops)
+    meta = data.get("meta", {})
+    included = [op for op in ops if op.get("id") == meta.get("id")]
+    if included:
+        meta["undo"] = (meta.get("undo", []) + included)[-UNDO_LIMIT:]
+    return ops
+
+
+def _parse_timestamp(ts: str):
+    """
+    :return: The parsed datetime, or None if ``ts`` is not a valid hour key.
+    """
+    try:
+        return datetime.strptime(ts, TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _entries(data: dict, section: str):
+    """
+    :return: The entries of a list section of ``data`` (a dict or a
+             json_stream.StreamedData), or an empty list if it is missing or not a list.
+    """
+    entries = data.get(section)
+    return entries if isinstance(entries, (list, StreamedArray)) else []
+
+
+def present_sections(data: dict) -> list:
+    """
+    :param data: The loaded data dictionary (or a json_stream.StreamedData).
+    :return: The configured regions that have readings in ``data``, in configured
+             order. Streamed sections count as present without being scanned.
+    """
+    present = []
+    for sec in PAIN_SECTIONS:
+        entries = _entries(data, sec)
+        if isinstance(entries, StreamedArray) or entries:
+            present.append(sec)
+    return present
+
+
+def csv_header(sections: list, medications: bool = False) -> list:
+    """
+    :param sections: The region columns, e.g. :func:`present_sections`.
+    :param medications: Whether to end with the "Active Medications" column.
+    :return: The header row of the CSV export.
+    """
+    header = ["Timestamp (dd/mm/yyyy hh:mm)", "Activity Value", "Activity"] + list(sections) + ["Notes"]
+    return header + ["Active Medications"] if medications else header
+
+
+def combine_rows(data: dict, start: str = None) -> dict:
+    """
+    Combine pain, activity and notes into one row per hour, as shown in the export.
+
+    :param data: The loaded data dictionary.
+    :param start: Optional hour key; earlier hours are skipped without being parsed,
+                  and the sorted pain sections are entered by binary search.
+    :return: A dict mapping datetime to
+             {"pain": {section: value}, "activity_levels": [...], "activity_names": [...], "notes": str}.
+    """
+    combined_rows = {}
+
+    def row_for(dt):
+        if dt not in combined_rows:
+            combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
+        return combined_rows[dt]
+
+    for section in present_sections(data):
+        entries = _entries(data, section)
+        if start is not None and isinstance(entries, list):
+            entries = entries[bisect.bisect_left(entries, start, key=_pain_timestamp):]
+        for entry in entries:
+            ts_str = entry.get("timestamp")
+            if start is not None and (not isinstance(ts_str, str) or ts_str < start):
+                continue
+            dt = _parse_timestamp(ts_str)
+            if dt is None:
+                continue
+            row_for(dt)["pain"][section] = entry["value"]
+
+    for ts_str, entries in data.get("activity_data", {}).items():
+        if start is not None and ts_str < start:
+            continue
+        dt = _parse_timestamp(ts_str)
+        if dt is None:
+            continue
+        row = row_for(dt)
+        for entry in entries:
+            row["activity_levels"].append(str(entry.get("activity_level", "")))
+            row["activity_names"].append(entry.get("activity_name", ""))
+
+    notes = data.get("notes_data", {})
+    if start is not None:
+        # Only read the bodies of the exported notes from the note blob.
+        notes = {ts_str: notes[ts_str] for ts_str in notes if ts_str >= start}
+    for ts_str, note in notes.items():
+        dt = _parse_timestamp(ts_str)
+        if dt is None:
+            continue
+        row_for(dt)["notes"] = note
+    return combined_rows
+
+
+def format_row(dt: datetime, row: dict, sections: list) -> list:
+    """
+    Format a combined row as the export columns (without the Notes column).
+
+    :param dt: The hour of the row.
+    :param row: A row from :func:`combine_rows`.
+    :param sections: The region columns, as in :func:`csv_header`.
+    :return: [timestamp, activity values, activity names, one value per section].
+    """
+    act_levels = row["activity_levels"]
+    act_names = row["activity_names"]
+    act_val_str = f"[{','.join(act_levels)}]" if act_levels else ""
+    act_names_str = f"[{','.join(act_names)}]" if act_names else ""
+    pain_vals = [row["pain"].get(sec, "") for sec in sections]
+    return [dt.strftime(EXPORT_TIMESTAMP_FORMAT), act_val_str, act_names_str] + pain_vals
+
+
+def combine_pain(data: dict) -> dict:
+    """
+    Combine the pain sections into one sparse reading per hour.
+
+    :param data: The loaded data dictionary.
+    :return: A dict mapping datetime to {section: value} for the sections recorded in
+             that hour; missing regions count as 0.
+    """
+    combined = {}
+    for sec in present_sections(data):
+        for entry in _entries(data, sec):
+            dt = _parse_timestamp(entry.get("timestamp"))
+            if dt is None:
+                continue
+            combined.setdefault(dt, {})[sec] = entry.get("value", 0)
+    return combined
+
+
+def pain_arb(values: dict) -> float:
+    """
+    Compute Pain (Arb.) for one hour.
+
+    Pain (Arb.) = (sum of the scores / ARB_REGION_COUNT × number of non-zero scores) / 3,
+    i.e. the average over the six original regions with missing regions counted as 0.
+
+    :param values: A sparse mapping of section to score.
+    :return: The Pain (Arb.) value.
+    """
+    scores = [v for v in values.values() if v]
+    avg = sum(scores) / float(ARB_REGION_COUNT)
+    nonzero_count = sum(1 for v in scores if v > 0)
+    return (avg * nonzero_count) / 3.0
+
+
+def hourly_pain_arb(combined: dict) -> list:
+    """
+    :param combined: The output of :func:`combine_pain`.
+    :return: A list of (datetime, Pain (Arb.)) sorted by time.
+    """
+    return [(dt, pain_arb(combined[dt])) for dt in sorted(combined)]
+
+
+def pain_arb_summary(hourly: list) -> dict:
+    """
+    Summarise an hourly Pain (Arb.) series.
+
+    :param hourly: The output of :func:`hourly_pain_arb`.
+    :return: {"hours": int, "mean": float, "min": float, "max": float, "max_at": datetime or None}.
+    """
+    if not hourly:
+        return {"hours": 0, "mean": 0.0, "min": 0.0, "max": 0.0, "max_at": None}
+    values = [v for _, v in hourly]
+    max_at, max_val = max(hourly, key=lambda item: item[1])
+    return {"hours": len(values), "mean": sum(values) / len(values),
+            "min": min(values), "max": max_val, "max_at": max_at}
+
+
+def section_summary(data: dict) -> dict:
+    """
+    Summarise the pain sections for the stats screen.
+
+    :param data: The loaded data dictionary.
+    :return: {"total_entries": int, "averages": {section: avg},
+              "highest": (section, value, timestamp) or None}.
+    """
+    total_entries = 0
+    section_averages = {}
+    highest_score = -1
+    highest_entry = None
+    for section in present_sections(data):
+        count, total, section_max = 0, 0.0, None
+        for e in _entries(data, section):
+            count += 1
+            total += e["value"]
+            if section_max is None or e["value"] > section_max[0]:
+                section_max = (e["value"], e["timestamp"])
+        total_entries += count
+        if count:
+            section_averages[section] = total / count
+            if section_max[0] > highest_score:
+                highest_score = section_max[0]
+                highest_entry = (section, section_max[0], section_max[1])
+    return {"total_entries": total_entries, "averages": section_averages, "highest": highest_entry}
+
+
+def latest_sleep(data: dict, date_str: str):
+    """
+    :param data: The loaded data dictionary.
+    :param date_str: A date in "%Y-%m-%d" format.
+    :return: The last sleep entry recorded for that date, or None. The entries are
+             sorted by date (see :func:`upsert_sleep`), so this is a binary search.
+    """
+    entries = data.get("sleep_data", [])
+    i = bisect.bisect_right(entries, date_str, key=_sleep_date) - 1
+    return entries[i] if i >= 0 and _sleep_date(entries[i]) == date_str else None
+
+
+def calendar_dates(data: dict) -> list:
+    """
+    Collect every date that has pain, activity, note or sleep data.
+
+    :param data: The loaded data dictionary.
+    :return: A sorted list of datetime.date objects.
+    """
+    dates_set = set()
+    for sec in PAIN_SECTIONS:
+        for entry in _entries(data, sec):
+            dt = _parse_timestamp(entry.get("timestamp"))
+            if dt is not None:
+                dates_set.add(dt.date())
+    for key in ("activity_data", "notes_data"):
+        for ts in data.get(key, {}).keys():
+            dt = _parse_timestamp(ts)
+            if dt is not None:
+                dates_set.add(dt.date())
+    for entry in _entries(data, "sleep_data"):
+        try:
+            dates_set.add(datetime.strptime(entry.get("date", ""), "%Y-%m-%d").date())
+        except (TypeError, ValueError):
+            continue
+    return sorted(dates_set)
+
+
+def hour_pain(data: dict, timestamp_key: str) -> dict:
+    """
+    :param data: The loaded data dictionary, with sorted pain sections.
+    :param timestamp_key: The hour key in TIMESTAMP_FORMAT.
+    :return: {section: value} for the sections recorded in that hour, found by
+             binary search in each section.
+    """
+    end = timestamp_key + "\x00"
+    detail_values = {}
+    for sec in PAIN_SECTIONS:
+        entries = data.get(sec)
+        if isinstance(entries, list):
+            hour = _pain_slice(entries, timestamp_key, end)
+            if hour:
+                detail_values[sec] = hour[0].get("value", "")
+    return detail_values
+
+
+def _csv_bytes(rows: list) -> bytes:
+    """
+    :return: ``rows`` encoded exactly as csv.writer writes them to a file opened with newline="".
+    """
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def _sleep_appendix(data: dict) -> bytes:
+    """
+    :return: The encoded sleep section written after the hourly rows, if any.
+    """
+    if "sleep_data" not in data:
+        return b""
+    rows = [[], ["Sleep Data"], ["date", "hours_slept", "sleep_quality"]]
+    rows.extend([entry.get("date", ""), entry.get("hours_slept", ""), entry.get("sleep_quality", "")]
+                for entry in _entries(data, "sleep_data"))
+    return _csv_bytes(rows)
+
+
+def _export_columns(data: dict) -> tuple:
+    """
+    :return: (region columns, whether there is an "Active Medications" column) of
+             the export of ``data``.
+    """
+    return present_sections(data), has_medications(data)
+
+
+def _write_rows(f, data: dict, columns: tuple, start: str = None) -> tuple:
+    """
+    Write the hourly rows from ``start`` on, then the sleep appendix, at the current
+    position of the binary file ``f``. ``columns`` is :func:`_export_columns`.
+
+    The active medications of the rows are found in one merge pass of the sorted
+    rows against a :class:`DoseIndex` of the doses that can reach ``start``.
+
+    :return: (offset of the last hourly row, offset where the sleep appendix starts,
+              key of the last hourly row); the offsets are None/unchanged when no row
+              was written.
+    """
+    sections, medications = columns
+    combined_rows = combine_rows(data, start)
+    hours = sorted(combined_rows.keys())
+    keys = [dt.strftime(TIMESTAMP_FORMAT) for dt in hours]
+    active = None
+    if medications:
+        doses = _entries(data, "medication_data")
+        if start is not None:
+            doses = _doses_reaching(doses, start)
+        active = DoseIndex(doses).sweep(keys)
+    last_row_offset = None
+    last_key = None
+    for dt, key in zip(hours, keys):
+        row = combined_rows[dt]
+        last_row_offset = f.tell()
+        last_key = key
+        fields = format_row(dt, row, sections) + [row["notes"]]
+        if active is not None:
+            labels = [medication_label(entry) for entry in next(active)]
+            fields.append(f"[{','.join(labels)}]" if labels else "")
+        f.write(_csv_bytes([fields]))
+    rows_end = f.tell()
+    f.write(_sleep_appendix(data))
+    f.truncate()
+    return last_row_offset, rows_end, last_key
+
+
+def _write_full_export(data: dict, csv_path: str) -> dict:
+    """
+    Regenerate the whole CSV and return the export state describing it.
+    """
+    if os.path.exists(csv_path):
+        os.remove(csv_path)
+    columns = _export_columns(data)
+    header = csv_header(*columns)
+    with open(csv_path, "wb") as f:
+        f.write(_csv_bytes([header]))
+        header_end = f.tell()
+        last_row_offset, rows_end, last_key = _write_rows(f, data, columns)
+        size = f.tell()
+    file_id, version = data_token(data)
+    return {
+        "csv_path": csv_path,
+        "columns": header,
+        "id": file_id,
+        "version": version,
+        "watermark": last_key,
+        "last_row_offset": last_row_offset if last_row_offset is not None else header_end,
+        "rows_end": rows_end,
+        "size": size,
+    }
+
+
+@perf.timed("export_csv")
+def export_csv(data: dict, csv_path: str) -> str:
+    """
+    Write the CSV export of ``data`` to ``csv_path``, replacing any existing file.
+
+    The columns are :func:`csv_header` with a column per region that has readings
+    and, once medications are logged, the doses active in each hour; sleep data is appended separately after a blank row.
+
+    :param data: The loaded data dictionary.
+    :param csv_path: Destination file.
+    :return: ``csv_path``.
+    """
+    _write_full_export(data, csv_path)
+    return csv_path
+
+
+def _load_export_state(state_path: str, csv_path: str):
+    """
+    :return: The stored export state if it still describes ``csv_path`` as it is on
+             disk, otherwise None.
+    """
+    if not os.path.exists(state_path) or not os.path.exists(csv_path):
+        return None
+    try:
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    except Exception as e:
+        logger.exception("Error loading export state: %s", e)
+        return None
+    if state.get("csv_path") != csv_path or os.path.getsize(csv_path) != state.get("size"):
+        return None
+    return state
+
+
+@perf.timed("export_csv_incremental")
+def export_csv_incremental(data: dict, csv_path: str, state_path: str) -> str:
+    """
+    Bring the CSV at ``csv_path`` up to date, rewriting as little as possible.
+
+    ``state_path`` remembers the data file id and version and the last exported hour
+    key (the watermark) of the previous export. Hours changed since then that lie after the
+    watermark are appended; a change to the watermark hour itself rewrites only that
+    last row. The sleep appendix is rewritten after the hourly rows. A change to an
+    hour before the watermark, a region gaining its first or losing its last reading
+    or the first medication being logged (the columns change), a trimmed change log,
+    a different data file id (the data was deleted and started again) or a CSV that
+    no longer matches the stored state fall back to a full rebuild.
+    A medication is recorded as a change at its start hour, so a dose starting
+    before the watermark also rebuilds the rows it is active in.
+
+    :param data: The loaded data dictionary.
+    :param csv_path: Destination file.
+    :param state_path: Where the export state is kept between exports.
+    :return: "full", "incremental" or "unchanged".
+    """
+    state = _load_export_state(state_path, csv_path)
+    if state is not None and state.get("id") != data_token(data)[0]:
+        # The data was deleted and started again since the last export.
+        state = None
+    changed = changes_since(data, state["version"]) if state else None
+    hour_changes = sorted(key for key in changed if len(key) > 10) if changed else []
+    watermark = state.get("watermark") if state else None
+    columns = _export_columns(data)
+
+    if (state is None or changed is None or state.get("columns") != csv_header(*columns)
+            or (hour_changes and watermark and hour_changes[0] < watermark)):
+        mode = "full"
+        state = _write_full_export(data, csv_path)
+    elif not changed:
+        return "unchanged"
+    else:
+        mode = "incremental"
+        if hour_changes and watermark and hour_changes[0] == watermark:
+            offset, start = state["last_row_offset"], watermark
+        elif hour_changes:
+            offset, start = state["rows_end"], hour_changes[0]
+        else:
+            offset, start = state["rows_end"], None
+        with open(csv_path, "r+b") as f:
+            f.seek(offset)
+            if start is None:
+                rows_end = f.tell()
+                f.write(_sleep_appendix(data))
+                f.truncate()
+                last_row_offset, last_key = None, None
+            else:
+                last_row_offset, rows_end, last_key = _write_rows(f, data, columns, start)
+            size = f.tell()
+        if last_key is not None:
+            state["watermark"] = last_key
+            state["last_row_offset"] = last_row_offset
+        state["rows_end"] = rows_end
+        state["size"] = size
+        state["version"] = data_version(data)
+
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+    logger.info("CSV export (%s) written to %s", mode, csv_path)
+    return mode
+
+
+def rollup_periods(day: str) -> tuple:
+    """
+    :param day: A date in "%Y-%m-%d" format.
+    :return: (day, ISO week "YYYY-Www", month "YYYY-MM") the date belongs to.
+    """
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return day, f"{year}-W{week:02d}", day[:7]
+
+
+def _period_days(level: str, period: str) -> list:
+    """
+    :return: The "%Y-%m-%d" dates making up a week or month period.
+    """
+    if level == "week":
+        year, week = period.split("-W")
+        return [date.fromisocalendar(int(year), int(week), d).isoformat() for d in range(1, 8)]
+    year, month = int(period[:4]), int(period[5:7])
+    return [date(year, month, d).isoformat() for d in range(1, calendar.monthrange(year, month)[1] + 1)]
+
+
+def _valid_day(day: str) -> bool:
+    try:
+        date.fromisoformat(day)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _add_stat(stat, value: float) -> list:
+    """
+    :param stat: [count, sum, min, max] or None.
+    :return: ``stat`` with ``value`` added.
+    """
+    if stat is None:
+        return [1, value, value, value]
+    stat[0] += 1
+    stat[1] += value
+    stat[2] = min(stat[2], value)
+    stat[3] = max(stat[3], value)
+    return stat
+
+
+def _merge_stat(stat, other: list) -> list:
+    if stat is None:
+        return list(other)
+    return [stat[0] + other[0], stat[1] + other[1], min(stat[2], other[2]), max(stat[3], other[3])]
+
+
+def _day_rollups(data: dict, days=None) -> dict:
+    """
+    Aggregate the raw entries of some days (all days if ``days`` is None). The
+    entries of given days are found by binary search in the sorted pain sections and
+    sleep list, so refreshing a few days does not depend on the length of the history.
+
+    :return: {day: {region or ARB_METRIC: [count, sum, min, max],
+                    "sleep": [nights, hours slept, quality sum]}}; regions without
+             readings that day are left out.
+    """
+    rows = {}
+    hours = {}
+    valid = {}
+    if days is not None:
+        bounds = [(day, (date.fromisoformat(day) + timedelta(days=1)).isoformat())
+                  for day in sorted(days) if _valid_day(day)]
+    for sec in PAIN_SECTIONS:
+        entries = _entries(data, sec)
+        if days is not None:
+            entries = [e for day, end in bounds for e in _pain_slice(entries, day, end)]
+        for entry in entries:
+            ts = entry.get("timestamp")
+            if not isinstance(ts, str):
+                continue
+            day = ts[:10]
+            if day not in valid:
+                valid[day] = _valid_day(day)
+            if not valid[day]:
+                continue
+            value = entry.get("value", 0) or 0
+            row = rows.setdefault(day, {})
+            row[sec] = _add_stat(row.get(sec), value)
+            hours.setdefault(ts, {})[sec] = value
+    for ts, values in hours.items():
+        row = rows[ts[:10]]
+        row[ARB_METRIC] = _add_stat(row.get(ARB_METRIC), pain_arb(values))
+    # The last entry recorded for a date wins, as on the stats and day screens.
+    sleep_by_date = {}
+    sleep = _entries(data, "sleep_data")
+    if days is not None:
+        sleep = [e for day, _ in bounds
+                 for e in sleep[bisect.bisect_left(sleep, day, key=_sleep_date):
+                                bisect.bisect_right(sleep, day, key=_sleep_date)]]
+    for entry in sleep:
+        day = entry.get("date")
+        if _valid_day(day):
+            sleep_by_date[day] = entry
+    for day, entry in sleep_by_date.items():
+        try:
+            hours_slept = float(entry.get("hours_slept") or 0)
+            quality = float(entry.get("sleep_quality") or 0)
+        except (TypeError, ValueError):
+            continue
+        rows.setdefault(day, {})["sleep"] = [1, hours_slept, quality]
+    return rows
+
+
+def _period_rollup(day_rows: dict, days: list) -> dict:
+    """
+    :return: The rollup of a week or month from its day rows.
+    """
+    row = {}
+    for day in days:
+        for metric, stat in day_rows.get(day, {}).items():
+            if metric == "sleep":
+                row[metric] = [a + b for a, b in zip(row.get(metric, [0, 0.0, 0.0]), stat)]
+            else:
+                row[metric] = _merge_stat(row.get(metric), stat)
+    return row
+
+
+def refresh_rollups(data: dict) -> dict:
+    """
+    Bring the day, ISO-week and month rollups in data["rollups"] up to date.
+
+    Only the days whose hours (or sleep dates) appear in the change log since the
+    rollups were last refreshed are re-aggregated, followed by the weeks and months
+    containing them; the whole history is aggregated only when the change log does
+    not reach back far enough. :func:`write_data` calls this, so the rollups are
+    stored with the data.
+
+    :param data: The loaded data dictionary; data["rollups"] is updated in place.
+    :return: {"day" | "week" | "month": {period: row}, "id": ..., "version": ...}
+             with rows as described in :func:`_day_rollups`.
+    """
+    meta = data.get("meta", {})
+    rollups = data.get("rollups")
+    changed = None
+    if isinstance(rollups, dict) and rollups.get("id") == meta.get("id"):
+        changed = changes_since(data, rollups.get("version", 0))
+    if changed == set():
+        return rollups
+    if changed is None:
+        sort_pain_sections(data)
+        rollups = {"day": _day_rollups(data)}
+        days = set(rollups["day"])
+    else:
+        days = {key[:10] for key in changed if isinstance(key, str) and _valid_day(key[:10])}
+        fresh = _day_rollups(data, days)
+        for day in days:
+            if day in fresh:
+                rollups["day"][day] = fresh[day]
+            else:
+                rollups["day"].pop(day, None)
+    day_rows = rollups["day"]
+    for level, position in (("week", 1), ("month", 2)):
+        table = rollups.setdefault(level, {})
+        for period in {rollup_periods(day)[position] for day in days}:
+            row = _period_rollup(day_rows, _period_days(level, period))
+            if row:
+                table[period] = row
+            else:
+                table.pop(period, None)
+    rollups["id"] = meta.get("id")
+    rollups["version"] = meta.get("version", 0)
+    data["rollups"] = rollups
+    return rollups
+
+
+def rollup_rows(data: dict, level: str, start: str = None, end: str = None) -> list:
+    """
+    Read one level of the rollup pyramid.
+
+    :param data: The loaded data dictionary; its rollups are refreshed first.
+    :param level: One of ROLLUP_LEVELS.
+    :param start: First period key to include ("2024-03-01", "2024-W09", "2024-03").
+    :param end: Period key to stop before.
+    :return: [(period, {metric: {"count", "sum", "min", "max", "mean"},
+                        "sleep": {"nights", "hours", "mean_quality"}})] in period order.
+    """
+    table = refresh_rollups(data)[level]
+    keys = sorted(table)
+    lo, hi = _slice_bounds(keys, start, end)
+    rows = []
+    for period in keys[lo:hi]:
+        row = {}
+        for metric, stat in table[period].items():
+            if metric == "sleep":
+                nights, hours_slept, quality = stat
+                row[metric] = {"nights": nights, "hours": hours_slept,
+                               "mean_quality": quality / nights if nights else 0.0}
+            else:
+                count, total, low, high = stat
+                row[metric] = {"count": count, "sum": total, "min": low, "max": high,
+                               "mean": total / count}
+        rows.append((period, row))
+    return rows
+
+
+def rollup_csv_rows(data: dict, level: str) -> list:
+    """
+    :return: A header and one CSV row per period of the rollup level, with count,
+             mean, min and max of every region with readings and of Pain (Arb.), and
+             the sleep totals.
+    """
+    metrics = present_sections(data) + [ARB_METRIC]
+    header = ["Period"]
+    for metric in metrics:
+        header += [f"{metric} count", f"{metric} mean", f"{metric} min", f"{metric} max"]
+    header += ["Sleep nights", "Sleep hours", "Sleep quality (mean)"]
+    rows = [header]
+    for period, row in rollup_rows(data, level):
+        line = [period]
+        for metric in metrics:
+            stat = row.get(metric)
+            line += ([stat["count"], round(stat["mean"], 3), stat["min"], stat["max"]]
+                     if stat else [0, "", "", ""])
+        sleep = row.get("sleep")
+        line += ([sleep["nights"], round(sleep["hours"], 2), round(sleep["mean_quality"], 2)]
+                 if sleep else [0, "", ""])
+        rows.append(line)
+    return rows
+
+
+def _range_key(bound):
+    """
+    Normalise a range bound to the string form used by the stored keys.
+
+    Hour keys ("%Y-%m-%d %H:%M:%S") and sleep dates ("%Y-%m-%d") sort lexicographically
+    in time order, so a date string bound compares correctly against hour keys too.
+
+    :param bound: None, a datetime, a date or a string.
+    :return: None or a string bound.
+    """
+    if bound is None or isinstance(bound, str):
+        return bound
+    if isinstance(bound, datetime):
+        return bound.strftime(TIMESTAMP_FORMAT)
+    if isinstance(bound, date):
+        return bound.strftime("%Y-%m-%d")
+    raise TypeError(f"Unsupported range bound: {bound!r}")
+
+
+def _slice_bounds(keys: list, start, end) -> tuple:
+    """
+    :return: (lo, hi) indices of the keys in [start, end); None means unbounded.
+    """
+    start, end = _range_key(start), _range_key(end)
+    lo = 0 if start is None else bisect.bisect_left(keys, start)
+    hi = len(keys) if end is None else bisect.bisect_left(keys, end)
+    return lo, max(lo, hi)
+
+
+class DoseIndex:
+    """
+    Sorted-sweep index over the windows in which medication doses are active.
+
+    The start and end keys of the windows cut the timeline into segments in which the
+    set of active doses does not change: ``_bounds[i]`` is where segment ``i``
+    starts and ``_active[i]`` holds the doses active from there up to
+    ``_bounds[i + 1]``. Building it sorts the 2n window boundaries once; "what is
+    active at this hour" is then one binary search, and a sorted run of hours is
+    answered by a single merge pass instead of checking every dose for every hour.
+    """
+
+    def __init__(self, entries):
+        doses, events = [], []
+        for entry in entries:
+            window = medication_window(entry)
+            if window is None:
+                continue
+            # At a shared key, windows ending there are closed before new ones open.
+            events.append((window[0], 1, len(doses)))
+            events.append((window[1], 0, len(doses)))
+            doses.append(entry)
+        events.sort()
+        active = set()
+        self._bounds, self._active = [], []
+        for key, opens, i in events:
+            if opens:
+                active.add(i)
+            else:
+                active.discard(i)
+            if self._bounds and self._bounds[-1] == key:
+                self._active[-1] = tuple(doses[j] for j in sorted(active))
+            else:
+                self._bounds.append(key)
+                self._active.append(tuple(doses[j] for j in sorted(active)))
+
+    def active_at(self, timestamp_key: str) -> tuple:
+        """
+        :param timestamp_key: An hour key.
+        :return: The medication entries active in that hour, in the order they were logged.
+        """
+        i = bisect.bisect_right(self._bounds, timestamp_key) - 1
+        return self._active[i] if i >= 0 else ()
+
+    def sweep(self, keys):
+        """
+        :param keys: Hour keys in ascending order.
+        :return: A lazy iterator of the active entries (as :meth:`active_at`) of each key.
+        """
+        i = 0
+        for key in keys:
+            while i < len(self._bounds) and self._bounds[i] <= key:
+                i += 1
+            yield self._active[i - 1] if i else ()
+
+
+class DataModel:
+    """
+    Read-only query view over a loaded data dictionary.
+
+    Sorted key arrays are built once so that every range query is two binary
+    searches plus a walk over the matching entries: the cost depends on the size of
+    the result, not on the length of the history. Ranges are half open,
+    ``start <= key < end``, and either bound may be None.
+
+    Pain readings form a sparse hour × region matrix in CSR layout: the readings of
+    hour ``_hour_keys[i]`` are ``_regions[j]`` (an index into PAIN_SECTIONS) and
+    ``_values[j]`` for ``_indptr[i] <= j < _indptr[i + 1]``. An hour only holds the
+    regions scored in it, however many regions are configured.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        readings = sorted(
+            ((e["timestamp"], col, e.get("value", 0))
+             for col, sec in enumerate(PAIN_SECTIONS) for e in _entries(data, sec)
+             if isinstance(e.get("timestamp"), str)),
+            key=lambda reading: reading[:2])
+        self._hour_keys, self._indptr, self._regions, self._values = [], [], [], []
+        for ts, col, value in readings:
+            if not self._hour_keys or self._hour_keys[-1] != ts:
+                self._hour_keys.append(ts)
+                self._indptr.append(len(self._regions))
+            self._regions.append(col)
+            self._values.append(value)
+        self._indptr.append(len(self._regions))
+        self._activity_keys = sorted(data.get("activity_data", {}))
+        self._note_keys = sorted(data.get("notes_data", {}))
+        # The last entry recorded for a date wins, as on the stats and day screens.
+        sleep_by_date = {}
+        for entry in data.get("sleep_data", []):
+            sleep_by_date[entry.get("date", "")] = entry
+        self._sleep_dates = sorted(sleep_by_date)
+        self._sleep = sleep_by_date
+        self._doses = DoseIndex(_entries(data, "medication_data"))
+
+    def _hour_readings(self, lo: int, hi: int, wanted):
+        for i in range(lo, hi):
+            ts = self._hour_keys[i]
+            for j in range(self._indptr[i], self._indptr[i + 1]):
+                if wanted is None or self._regions[j] in wanted:
+                    yield ts, PAIN_SECTIONS[self._regions[j]], self._values[j]
+
+    def readings(self, start=None, end=None, sections=None):
+        """
+        :param sections: The sections to include (default: all).
+        :return: A lazy iterator of (hour key, section, value) in time order, and in
+                 configured region order within an hour.
+        """
+        wanted = None if sections is None else {PAIN_SECTIONS.index(sec) for sec in sections}
+        lo, hi = _slice_bounds(self._hour_keys, start, end)
+        return self._hour_readings(lo, hi, wanted)
+
+    def activities(self, start=None, end=None):
+        """
+        :return: A lazy iterator of (hour key, [activity entries]) in time order.
+        """
+        activity_data = self.data.get("activity_data", {})
+        lo, hi = _slice_bounds(self._activity_keys, start, end)
+        return ((ts, activity_data[ts]) for ts in self._activity_keys[lo:hi])
+
+    def notes(self, start=None, end=None):
+        """
+        :return: A lazy iterator of (hour key, note text) in time order.
+        """
+        notes_data = self.data.get("notes_data", {})
+        lo, hi = _slice_bounds(self._note_keys, start, end)
+        return ((ts, notes_data[ts]) for ts in self._note_keys[lo:hi])
+
+    def sleep(self, start_date=None, end_date=None):
+        """
+        :return: A lazy iterator of sleep entries (one per date) in date order.
+        """
+        lo, hi = _slice_bounds(self._sleep_dates, start_date, end_date)
+        return (self._sleep[d] for d in self._sleep_dates[lo:hi])
+
+    def sleep_on(self, date_str: str):
+        """
+        :param date_str: A date in "%Y-%m-%d" format.
+        :return: The sleep entry for that date, or None.
+        """
+        return self._sleep.get(date_str)
+
+    def active_medications(self, timestamp_key: str) -> tuple:
+        """
+        :param timestamp_key: An hour key.
+        :return: The medication entries active in that hour, found by binary search.
+        """
+        return self._doses.active_at(timestamp_key)
+
+    def day_hours(self, date_str: str) -> list:
+        """
+        :param date_str: A date in "%Y-%m-%d" format.
+        :return: The sorted hours (ints) of that date with pain, activity or note data.
+        """
+        next_day = (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        keys = {ts for ts, _, _ in self.readings(date_str, next_day)}
+        keys.update(ts for ts, _ in self.activities(date_str, next_day))
+        keys.update(ts for ts, _ in self.notes(date_str, next_day))
+        return sorted(int(ts[11:13]) for ts in keys)
+
+    def hour_detail(self, timestamp_key: str) -> dict:
+        """
+        Gather everything recorded for one hour, found by binary search.
+
+        :param timestamp_key: The hour key in TIMESTAMP_FORMAT.
+        :return: {"pain": {section: value} for the sections recorded in that hour,
+                  "activity_levels": [...], "activity_names": [...], "note": str,
+                  "medications": [medication entries active in that hour]}.
+        """
+        end = timestamp_key + "\x00"
+        detail_values = {}
+        for ts, sec, value in self.readings(timestamp_key, end):
+            detail_values[sec] = value
+        entries = self.data.get("activity_data", {}).get(timestamp_key, [])
+        return {
+            "pain": detail_values,
+            "activity_levels": [str(entry.get("activity_level", "")) for entry in entries],
+            "activity_names": [entry.get("activity_name", "") for entry in entries],
+            "note": self.data.get("notes_data", {}).get(timestamp_key, ""),
+            "medications": list(self.active_medications(timestamp_key)),
+        }
+
+
+_model_cache = {}
+
+
+def load_model(data_file: str) -> DataModel:
+    """
+    Return a :class:`DataModel` for ``data_file``, reusing the previous one while the
+    file and its journal are unchanged on disk.
+
+    :param data_file: Path of data.json.
+    :return: The query model.
+    """
+    try:
+        st = os.stat(data_file)
+        signature = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        signature = None
+    if signature is not None and os.path.exists(journal.journal_path(data_file)):
+        st = os.stat(journal.journal_path(data_file))
+        signature += (st.st_mtime_ns, st.st_size)
+    cached = _model_cache.get(data_file)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1]
+    model = DataModel(load_data(data_file))
+    _model_cache[data_file] = (signature, model)
+    return model
@@ -0,0 +1,124 @@
+"""
+Online flare detection evaluated when a reading is saved.
+
+Per region the detector keeps an exponentially weighted mean and variance of the
+readings seen so far, so each new reading is scored against recent history in
+O(1) time and memory:
+
+    z = (value - mean) / sqrt(variance)
+
+A reading is flagged when its z-score reaches ``z_threshold`` (once the region has
+``warmup`` readings), or when the Pain (Arb.) of its hour reaches ``arb_threshold``.
+The state and the flags live in data["flare"], are written with the data and are
+never rebuilt from the full history.
+
+The EWMA assumes readings arrive in time order, so only live entry feeds it;
+backfilled history (batch grid, imports) does not.
+"""
+import math
+
+import data_store
+from data_store import ARB_METRIC, PAIN_SECTIONS
+
+DEFAULT_PARAMS = {
+    "alpha": 0.05,         # weight of the newest reading in the EWMA
+    "z_threshold": 2.5,
+    "arb_threshold": 8.0,
+    "warmup": 24,          # readings of a region before its z-score is trusted
+}
+
+
+def detector_state(data: dict) -> dict:
+    """
+    :param data: The loaded data dictionary; the state is created if missing.
+    :return: {"params": {...}, "regions": {section: [n, mean, variance]},
+              "flags": {hour key: {...}}}.
+    """
+    state = data.setdefault("flare", {})
+    state.setdefault("params", {})
+    state.setdefault("regions", {})
+    state.setdefault("flags", {})
+    # Earlier versions cached the readings of the last hour here; edits made it stale.
+    state.pop("hour", None)
+    return state
+
+
+def params(data: dict) -> dict:
+    """
+    :return: The detector parameters: DEFAULT_PARAMS overridden by the stored ones.
+    """
+    return dict(DEFAULT_PARAMS, **data.get("flare", {}).get("params", {}))
+
+
+def configure(data: dict, **overrides) -> dict:
+    """
+    Change detector parameters; they are stored with the data.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param overrides: Any of the keys of DEFAULT_PARAMS.
+    :return: The resulting parameters.
+    """
+    unknown = set(overrides) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown flare detector parameters: {', '.join(sorted(unknown))}")
+    detector_state(data)["params"].update(overrides)
+    return params(data)
+
+
+def observe(data: dict, section: str, timestamp_str: str, value: float) -> dict:
+    """
+    Score a newly stored reading and fold it into the detector state.
+
+    :param data: The loaded data dictionary; modified in place.
+    :param section: The body section, e.g. "RU".
+    :param timestamp_str: The hour key in TIMESTAMP_FORMAT.
+    :param value: The stored pain score.
+    :return: The reasons the hour is flagged, e.g. {"RU": 3.1, "Pain (Arb.)": 8.4};
+             empty if it is not.
+    """
+    state = detector_state(data)
+    p = params(data)
+    reasons = {}
+    n, mean, variance = state["regions"].get(section, [0, 0.0, 0.0])
+    if n >= p["warmup"] and variance > 0:
+        z = (value - mean) / math.sqrt(variance)
+        if z >= p["z_threshold"]:
+            reasons[section] = round(z, 2)
+    if n == 0:
+        mean = value
+    else:
+        delta = value - mean
+        mean += p["alpha"] * delta
+        variance = (1 - p["alpha"]) * (variance + p["alpha"] * delta * delta)
+    state["regions"][section] = [n + 1, mean, variance]
+
+    # The hour is read back from the data, so edits, deletes and undos are seen.
+    hour = {s: v for s, v in data_store.hour_pain(data, timestamp_str).items() if v != ""}
+    hour[section] = value
+    arb = data_store.pain_arb(hour)
+    if arb >= p["arb_threshold"]:
+        reasons[ARB_METRIC] = round(arb, 2)
+    if reasons:
+        state["flags"].setdefault(timestamp_str, {}).update(reasons)
+    return reasons
+
+
+def flags_at(data: dict, timestamp_str: str) -> dict:
+    """
+    :return: The reasons the hour was flagged when its readings were saved, or {}.
+    """
+    return data.get("flare", {}).get("flags", {}).get(timestamp_str, {})
+
+
+def describe(reasons: dict, separator: str = ", ") -> str:
+    """
+    :param reasons: The output of :func:`observe` or :func:`flags_at`.
+    :param separator: Placed between the reasons (e.g. "\n" for a narrow popup).
+    :return: A warning naming each reason, or "" if there are none.
+    """
+    if not reasons:
+        return ""
+    parts = [f"{sec} z={reasons[sec]:.1f}" for sec in PAIN_SECTIONS if sec in reasons]
+    if ARB_METRIC in reasons:
+        parts.append(f"{ARB_METRIC} {reasons[ARB_METRIC]:.1f}")
+    return "Possible flare: " + separator.join(parts)
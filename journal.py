@@ -0,0 +1,71 @@
+"""
+Append-only journal of single-entry edits and deletions.
+
+Correcting one reading should not rewrite the whole of data.json, so edits made from
+the detail screens are appended here as one JSON line each. data_store.load_data
+replays the journal over data.json and the next full write_data folds it into the
+file (compaction) and empties it.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+
+def journal_path(data_file: str) -> str:
+    """
+    :return: The journal file of ``data_file``.
+    """
+    return data_file + ".journal"
+
+
+def append(data_file: str, op: dict) -> None:
+    """
+    Durably append one operation.
+
+    :param data_file: Path of data.json.
+    :param op: A JSON-serialisable operation record.
+    """
+    with open(journal_path(data_file), "a") as f:
+        f.write(json.dumps(op, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read(data_file: str) -> list:
+    """
+    :param data_file: Path of data.json.
+    :return: The journalled operations in order. A line cut short by a crash is skipped.
+    """
+    path = journal_path(data_file)
+    if not os.path.exists(path):
+        return []
+    ops = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping unreadable journal line: %r", line[:80])
+    return ops
+
+
+def count(data_file: str) -> int:
+    """
+    :return: The number of journalled operations.
+    """
+    path = journal_path(data_file)
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def clear(data_file: str) -> None:
+    """
+    Remove the journal once its operations are part of data.json.
+    """
+    path = journal_path(data_file)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,296 @@
+"""
+Bounded-memory reading of data.json.
+
+``json.load`` turns the whole file into Python objects before anything can look at
+it. The reader here walks the top-level object instead: one pass records the byte
+offset of every section, and each section is then streamed entry by entry with
+``json.JSONDecoder.raw_decode`` over a buffer of a few chunks. At most one entry
+(plus the buffer) is materialised at a time.
+
+:class:`StreamedData` wraps this in the read-only subset of the dict interface that
+the data_store functions use, so exports, the calendar and the statistics can be
+computed straight from the file:
+
+    data = StreamedData("data.json")
+    data_store.calendar_dates(data)
+"""
+import json
+import os
+import re
+
+import notes_blob
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """
+    Incremental JSON tokenizer over a binary file.
+
+    The buffer holds decoded text; ``_base`` is the byte offset of its first
+    character, so positions can be turned back into seekable file offsets.
+    """
+
+    def __init__(self, f, offset: int = 0, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        f.seek(offset)
+        self._base = offset
+        self.buf = ""
+        self.pos = 0
+        self._pending = b""
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """
+        Drop the consumed text and append the next chunk.
+
+        :return: False at the end of the file.
+        """
+        if self._eof:
+            return False
+        consumed = self.buf[:self.pos]
+        if consumed:
+            self._base += len(consumed.encode("utf-8"))
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        raw = self._pending + self.f.read(self.chunk_size)
+        if len(raw) == len(self._pending):
+            self._eof = True
+            self.buf += raw.decode("utf-8")
+            self._pending = b""
+            return bool(raw)
+        # Keep an incomplete UTF-8 sequence at the end for the next chunk.
+        lead = len(raw) - 1
+        while lead > 0 and len(raw) - lead < 4 and (raw[lead] & 0xC0) == 0x80:
+            lead -= 1
+        if raw[lead] >= 0xC0:
+            needed = 2 if raw[lead] < 0xE0 else 3 if raw[lead] < 0xF0 else 4
+            cut = lead if len(raw) - lead < needed else len(raw)
+        else:
+            cut = len(raw)
+        self.buf += raw[:cut].decode("utf-8")
+        self._pending = raw[cut:]
+        return True
+
+    def offset(self) -> int:
+        """
+        :return: The byte offset of the current position in the file.
+        """
+        return self._base + len(self.buf[:self.pos].encode("utf-8"))
+
+    def peek(self) -> str:
+        """
+        :return: The next non-whitespace character without consuming it ("" at EOF).
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at byte {self.offset()}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number or literal ending exactly at the buffer end may be cut short.
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _separator(self, close: str) -> bool:
+        """
+        Consume a "," or the closing bracket after a member.
+
+        :return: True if another member follows.
+        """
+        char = self.peek()
+        self.pos += 1
+        if char == ",":
+            return True
+        if char == close:
+            return False
+        raise ValueError(f"Expected ',' or {close!r} at byte {self.offset()}, found {char!r}")
+
+    def iter_array(self):
+        """
+        Yield the elements of the array starting at the current position.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if not self._separator("]"):
+                return
+
+    def iter_object(self, decode_values: bool = True):
+        """
+        Yield (key, value) for the object starting at the current position. With
+        ``decode_values`` False the values are skipped and yielded as their byte offset.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            if decode_values:
+                yield key, self.value()
+            else:
+                self.peek()
+                start = self.offset()
+                self.skip_value()
+                yield key, start
+            if not self._separator("}"):
+                return
+
+    def skip_value(self) -> None:
+        """
+        Consume the next value, element by element for arrays and objects so that a
+        large section is never decoded as a whole.
+        """
+        char = self.peek()
+        if char == "[":
+            for _ in self.iter_array():
+                pass
+        elif char == "{":
+            for _ in self.iter_object(decode_values=False):
+                pass
+        else:
+            self.value()
+
+
+def section_offsets(path: str) -> dict:
+    """
+    :param path: Path of a JSON file whose top level is an object.
+    :return: {section name: byte offset of its value}.
+    """
+    with open(path, "rb") as f:
+        return dict(JsonStream(f).iter_object(decode_values=False))
+
+
+class StreamedArray:
+    """
+    Re-iterable view of an array section; every iteration reads it from the file.
+    """
+
+    def __init__(self, path: str, offset: int):
+        self.path = path
+        self.offset = offset
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            yield from JsonStream(f, self.offset).iter_array()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class StreamedObject:
+    """
+    Read-only, dict-like view of an object section; every call reads it from the file.
+    """
+
+    def __init__(self, path: str, offset: int):
+        self.path = path
+        self.offset = offset
+
+    def items(self):
+        with open(self.path, "rb") as f:
+            yield from JsonStream(f, self.offset).iter_object()
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.items())
+
+    def get(self, key, default=None):
+        for k, value in self.items():
+            if k == key:
+                return value
+        return default
+
+    def __contains__(self, key) -> bool:
+        return any(k == key for k in self.keys())
+
+    def __getitem__(self, key):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+
+class StreamedData:
+    """
+    Read-only stand-in for the data dictionary that streams sections from data.json.
+
+    Array sections come back as :class:`StreamedArray`, object sections as
+    :class:`StreamedObject` and scalars as their value; "notes_data" is the
+    :class:`notes_blob.LazyNotes` of the stored note index. The file must not be
+    rewritten while the object is in use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        offsets = section_offsets(path) if os.path.exists(path) else {}
+        self._notes_index = "notes_index" in offsets
+        self._offsets = {("notes_data" if key == "notes_index" else key): offset
+                         for key, offset in offsets.items()}
+
+    def _section(self, key):
+        offset = self._offsets[key]
+        with open(self.path, "rb") as f:
+            stream = JsonStream(f, offset)
+            if key == "notes_data" and self._notes_index:
+                return notes_blob.LazyNotes(self.path, stream.value())
+            char = stream.peek()
+            if char not in "[{":
+                return stream.value()
+        return StreamedArray(self.path, offset) if char == "[" else StreamedObject(self.path, offset)
+
+    def __getitem__(self, key):
+        return self._section(key)
+
+    def get(self, key, default=None):
+        return self._section(key) if key in self._offsets else default
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def keys(self):
+        return self._offsets.keys()
+
+    def items(self):
+        return ((key, self._section(key)) for key in self._offsets)
@@ -1,12 +1,12 @@
-import json
 import os
-import csv
 import logging
 from datetime import datetime, timedelta
 import math
+import numpy as np
 
 import matplotlib.pyplot as plt
 from matplotlib.cm import get_cmap
+from matplotlib.ticker import FuncFormatter
 from kivy.utils import platform
 from kivy.app import App
 from kivy.lang import Builder
@@ -15,14 +15,27 @@ from kivy.uix.popup import Popup
 from kivy.uix.button import Button
 from kivy_garden.matplotlib.backend_kivyagg import FigureCanvasKivyAgg
 from kivy.animation import Animation
-from kivy.properties import StringProperty
+from kivy.properties import ListProperty, NumericProperty, StringProperty
 from kivy.metrics import dp
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
+from kivy.uix.textinput import TextInput
 from kivy.core.window import Window
 from kivy.clock import Clock
 
+import analysis
+import block_store
+import data_store
+import flare
+import journal
+import notes_blob
+import perf
+from data_store import PAIN_SECTIONS
+from bulk_import import import_file
+from charts import LineChart, RadarChart
+from json_stream import StreamedData
+from search_index import SearchIndex
 
 Window.softinput_mode = 'pan'  # alternatives: 'resize'
 
@@ -56,6 +69,234 @@ def get_data_file_path() -> str:
     return os.path.join(data_dir, "data.json")
 
 
+def get_export_state_path() -> str:
+    """
+    :return: Absolute path to the state of the incremental CSV export.
+    """
+    return os.path.join(App.get_running_app().user_data_dir, "export_state.json")
+
+
+def get_data_model() -> data_store.DataModel:
+    """
+    Return the range-query model of data.json, rebuilt only when the file has changed.
+
+    :return: A data_store.DataModel.
+    """
+    return data_store.load_model(get_data_file_path())
+
+
+def sync_children(container, widgets: dict, keys: list, create, offset: int = 0) -> None:
+    """
+    Diff-update ``container`` so that it shows one widget per key, in ``keys`` order,
+    reusing existing widgets and only creating, removing or moving the ones that differ.
+
+    :param container: A vertical layout whose keyed widgets are contiguous.
+    :param widgets: Mapping of key to its widget, updated in place.
+    :param keys: The keys to show, top to bottom.
+    :param create: Callable building the widget for a new key.
+    :param offset: Number of unkeyed widgets below the keyed ones (e.g. a Back button).
+    """
+    wanted = set(keys)
+    for key in [k for k in widgets if k not in wanted]:
+        container.remove_widget(widgets.pop(key))
+    # Kivy lists children bottom-up, so walk the keys from the last one.
+    position = offset
+    for key in reversed(keys):
+        widget = widgets.get(key)
+        if widget is None:
+            widget = widgets[key] = create(key)
+            container.add_widget(widget, index=position)
+        elif container.children[position] is not widget:
+            container.remove_widget(widget)
+            container.add_widget(widget, index=position)
+        position += 1
+
+
+def show_only(container, widget) -> None:
+    """
+    Make ``widget`` the only child of ``container``, leaving it alone if it already is.
+    """
+    if container.children != [widget]:
+        container.clear_widgets()
+        container.add_widget(widget)
+
+
+class VersionedScreen(Screen):
+    """
+    Screen that remembers the data token and parameters of its last render.
+
+    Subclasses call :meth:`is_up_to_date` at the start of ``on_pre_enter`` and return
+    early when it is true, and :meth:`mark_rendered` once their content is built.
+    The token is the file id and version stored in data.json (journal included), so
+    writes made by another process or the CLI invalidate the screen as well.
+    When a rebuild is needed, :meth:`sync_rows` keeps the widgets of unchanged rows.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rendered = None
+        self._row_widgets = {}
+
+    def render_params(self) -> tuple:
+        """
+        :return: The inputs other than the data that the screen content depends on.
+        """
+        return ()
+
+    def _render_key(self) -> tuple:
+        return data_store.data_token(get_data_model().data), self.render_params()
+
+    def is_up_to_date(self) -> bool:
+        return self._rendered == self._render_key()
+
+    def mark_rendered(self) -> None:
+        self._rendered = self._render_key()
+
+    def sync_rows(self, container, rows: list) -> None:
+        """
+        Show ``rows`` in ``container``, reusing the widgets of the rows it already shows.
+
+        :param container: A vertical layout only filled through this method.
+        :param rows: (key, create) pairs, top to bottom. The key must describe
+                     everything the row displays and does; ``create`` builds the row
+                     and is only called for keys not shown before.
+        """
+        widgets = self._row_widgets.setdefault(container, {})
+        creators, keys, seen = {}, [], {}
+        for key, create in rows:
+            # Identical rows (e.g. two equal activities) are told apart by occurrence.
+            seen[key] = seen.get(key, 0) + 1
+            keys.append((key, seen[key]))
+            creators[keys[-1]] = create
+        sync_children(container, widgets, keys, lambda key: creators[key]())
+
+
+class EntryEditScreen(VersionedScreen):
+    """
+    Detail screen whose entries can be edited or deleted, with undo.
+
+    Edits go through data_store.edit_entry, which appends them to the journal
+    instead of rewriting data.json.
+    """
+
+    def entry_row(self, text: str, on_edit=None, on_delete=None) -> BoxLayout:
+        """
+        :param text: The entry as shown.
+        :param on_edit: Callable opening the editor, or None for no Edit button.
+        :param on_delete: Callable deleting the entry, or None for no Delete button.
+        :return: A row with the label and its buttons.
+        """
+        row = BoxLayout(size_hint_y=None, height="30dp", spacing=5)
+        row.add_widget(Label(text=text, font_size="14sp"))
+        for label, action in (("Edit", on_edit), ("Delete", on_delete)):
+            if action is not None:
+                btn = Button(text=label, size_hint_x=None, width="70dp", font_size="13sp")
+                btn.bind(on_release=lambda inst, action=action: action())
+                row.add_widget(btn)
+        return row
+
+    def open_editor(self, title: str, fields: list, on_save) -> None:
+        """
+        Show a popup with one text field per entry of ``fields``.
+
+        :param title: Popup title.
+        :param fields: List of (hint, initial text).
+        :param on_save: Callable taking the list of texts; returns an error message,
+                        or None once the edit is saved.
+        """
+        layout = BoxLayout(orientation="vertical", padding=10, spacing=10)
+        inputs = []
+        for hint, text in fields:
+            field = TextInput(text=str(text), hint_text=hint, multiline=False,
+                              size_hint_y=None, height="40dp")
+            inputs.append(field)
+            layout.add_widget(field)
+        message = Label(text="", font_size="13sp", size_hint_y=None, height="30dp")
+        layout.add_widget(message)
+        buttons = BoxLayout(spacing=10, size_hint_y=None, height="48dp")
+        cancel_btn = Button(text="Cancel")
+        save_btn = Button(text="Save")
+        buttons.add_widget(cancel_btn)
+        buttons.add_widget(save_btn)
+        layout.add_widget(buttons)
+        popup = Popup(title=title, content=layout, size_hint=(0.9, None),
+                      height=dp(170 + 50 * len(fields)), auto_dismiss=False)
+
+        def save(*args):
+            error = on_save([field.text.strip() for field in inputs])
+            if error:
+                message.text = error
+            else:
+                popup.dismiss()
+
+        cancel_btn.bind(on_release=popup.dismiss)
+        save_btn.bind(on_release=save)
+        popup.open()
+
+    def apply_edit(self, kind: str, key: str, value, section: str = None) -> None:
+        """
+        Store ``value`` for one entry (None deletes it) and refresh the screen.
+        """
+        data_file = get_data_file_path()
+
+        def attempt():
+            data = data_store.load_data(data_file)
+            data_store.edit_entry(data_file, data, kind, key, value, section)
+            return data
+
+        data = self._retry(attempt)
+        if data is None:
+            return
+        App.get_running_app().logger.info("Edited %s entry %s %s: %r", kind, key, section or "", value)
+        self._edited(data, kind, key)
+
+    def undo_last_edit(self) -> None:
+        """
+        Revert the most recent edit or deletion.
+        """
+        data_file = get_data_file_path()
+
+        def attempt():
+            data = data_store.load_data(data_file)
+            return data, data_store.undo_edit(data_file, data)
+
+        outcome = self._retry(attempt)
+        if outcome is None:
+            return
+        data, op = outcome
+        if op is None:
+            Popup(title="Undo", content=Label(text="Nothing to undo."),
+                  size_hint=(None, None), size=(dp(300), dp(200))).open()
+            return
+        App.get_running_app().logger.info("Undid edit of %s entry %s", op["kind"], op["key"])
+        self._edited(data, op["kind"], op["key"])
+
+    @staticmethod
+    def _retry(attempt):
+        """
+        :return: What ``attempt`` returns, or None if concurrent writers kept winning.
+        """
+        try:
+            return data_store.retrying(attempt, get_data_file_path())
+        except data_store.ConflictError as e:
+            App.get_running_app().logger.error("Giving up on an edit after repeated concurrent writes: %s", e)
+            Popup(title="Busy", content=Label(text="The data is being saved elsewhere.\nPlease try again."),
+                  size_hint=(None, None), size=(dp(300), dp(200))).open()
+            return None
+
+    def _edited(self, data: dict, kind: str, key: str) -> None:
+        app = App.get_running_app()
+        if kind in ("activity", "note"):
+            app.search_index.update_from_data(data, key)
+        app.notify_data_changed()
+        self.on_pre_enter()
+
+    def undo_button(self) -> Button:
+        btn = Button(text="Undo Last Edit", size_hint_y=None, height="40dp")
+        btn.bind(on_release=lambda x: self.undo_last_edit())
+        return btn
+
+
 def round_up_to_hour(dt: datetime) -> str:
     """
     Round the given datetime up to the next hour if it's not already exactly on the hour.
@@ -77,6 +318,7 @@ def round_up_to_hour(dt: datetime) -> str:
 
 class HomeScreen(Screen):
     """Home screen for navigating to different app pages."""
+    @perf.timed("on_pre_enter:home")
     def on_pre_enter(self):
         """
         Force a layout update shortly after the screen is entered,
@@ -92,6 +334,20 @@ class DataEntryScreen(Screen):
     """
     historical_timestamp = StringProperty("")
 
+    def on_pre_enter(self):
+        """
+        Add a button per configured body region the first time the screen is shown.
+        """
+        grid = self.ids.region_grid
+        if grid.children:
+            return
+        app = App.get_running_app()
+        total = len(data_store.REGION_PICKER_ORDER)
+        for i, key in enumerate(data_store.REGION_PICKER_ORDER, start=1):
+            button = Button(text=data_store.REGION_LABELS[key], background_color=app.get_rainbow_colour(i, total))
+            button.bind(on_press=lambda instance, key=key: self.open_input_screen(key))
+            grid.add_widget(button)
+
     def open_input_screen(self, section_tag: str) -> None:
         """
         Open the measurement input screen for a specified section,
@@ -204,36 +460,36 @@ class MeasurementInputScreen(Screen):
             timestamp_str = self.historical_timestamp
         else:
             timestamp_str = round_up_to_hour(datetime.now())
-        entry = {"value": value, "timestamp": timestamp_str}
-
-        data = self.load_data()
-        section_entries = data.get(self.selected_section, [])
-        updated = False
-
-        for existing_entry in section_entries:
-            if existing_entry["timestamp"] == timestamp_str:
-                updated = True
-                if existing_entry["value"] < value:
-                    existing_entry["value"] = value
-                    app.logger.debug("Updated entry with a higher value: %s", value)
-                    self._show_message("Measurement updated.")
-                else:
-                    app.logger.debug("Existing measurement not lower; skip save.")
-                    self._show_message(
-                        "Existing measurement\nis equal or higher;\n not saved."
-                    )
-                break
-
-        if not updated:
-            section_entries.append(entry)
+
+        section = self.selected_section
+
+        def save(data):
+            status = data_store.save_measurement(data, section, timestamp_str, value)
+            reasons = flare.observe(data, section, timestamp_str, value) if status != "skipped" else {}
+            return status, reasons
+
+        outcome = self.update_data(save)
+        if outcome is None:
+            return False
+        status, reasons = outcome[1]
+        warning = flare.describe(reasons, "\n")
+        if warning:
+            app.logger.info("Flare flagged at %s: %s", timestamp_str, reasons)
+            warning = "\n\n" + warning
+        if status == "updated":
+            app.logger.debug("Updated entry with a higher value: %s", value)
+            self._show_message("Measurement updated." + warning)
+        elif status == "skipped":
+            app.logger.debug("Existing measurement not lower; skip save.")
+            self._show_message(
+                "Existing measurement\nis equal or higher;\n not saved."
+            )
+        else:
             app.logger.info(
-                "New measurement saved: %s for section %s",
-                entry, self.selected_section
+                "New measurement saved: %s at %s for section %s",
+                value, timestamp_str, self.selected_section
             )
-            self._show_message("Measurement saved.")
-
-        data[self.selected_section] = section_entries
-        self.write_data(data)
+            self._show_message("Measurement saved." + warning)
 
         # Reset input field
         self.entered_value = ""
@@ -260,39 +516,28 @@ class MeasurementInputScreen(Screen):
 
         :return: The loaded data as a dictionary.
         """
-        logger = App.get_running_app().logger
-        data_file = get_data_file_path()
-        logger.debug("Loading data from %s", data_file)
-        if os.path.exists(data_file):
-            try:
-                with open(data_file, "r") as f:
-                    data = json.load(f)
-                logger.debug(
-                    "Data loaded successfully with %d total entries",
-                    sum(len(v) for v in data.values() if isinstance(v, list))
-                )
-                return data
-            except Exception as e:
-                logger.exception("Error loading data: %s", e)
-        return {}
-
+        return data_store.load_data(get_data_file_path())
 
     @staticmethod
-    def write_data(data: dict) -> None:
+    def update_data(mutate):
         """
-        Write data to the JSON file in the user data directory.
+        Load, modify and write data.json without losing concurrent writes from
+        other processes (see data_store.update_data).
 
-        :param data: The data dictionary to write.
+        :param mutate: Callable modifying the data dictionary in place.
+        :return: (data, what ``mutate`` returned), or None if the data stayed busy;
+                 the user has then been told to try again.
         """
-        logger = App.get_running_app().logger
-        data_file = get_data_file_path()
-        logger.debug("Writing data to %s", data_file)
+        app = App.get_running_app()
         try:
-            with open(data_file, "w") as f:
-                json.dump(data, f, indent=2)
-            logger.info("Data written successfully.")
-        except Exception as e:
-            logger.exception("Error writing data: %s", e)
+            outcome = data_store.update_data(get_data_file_path(), mutate)
+        except data_store.ConflictError as e:
+            app.logger.error("Giving up on a save after repeated concurrent writes: %s", e)
+            Popup(title="Busy", content=Label(text="The data is being saved elsewhere.\nPlease try again."),
+                  size_hint=(None, None), size=(dp(300), dp(200))).open()
+            return None
+        app.notify_data_changed()
+        return outcome
 
 
 class ActivityScreen(Screen):
@@ -305,6 +550,7 @@ class ActivityScreen(Screen):
     """
     historical_timestamp = StringProperty("")
 
+    @perf.timed("on_pre_enter:activity")
     def on_pre_enter(self):
         """
         Reset the activity spinner and text input when entering the screen.
@@ -333,9 +579,15 @@ class ActivityScreen(Screen):
             else round_up_to_hour(datetime.now())
         )
         entry = {"activity_level": level, "activity_name": name}
-        data = MeasurementInputScreen.load_data()
-        data.setdefault("activity_data", {}).setdefault(ts, []).append(entry)
-        MeasurementInputScreen.write_data(data)
+
+        def add_activity(data):
+            data.setdefault("activity_data", {}).setdefault(ts, []).append(entry)
+            data_store.record_change(data, ts)
+
+        outcome = MeasurementInputScreen.update_data(add_activity)
+        if outcome is None:
+            return
+        App.get_running_app().search_index.update_from_data(outcome[0], ts)
 
         # clear override and navigate
         target = "historical_date" if self.historical_timestamp else "home"
@@ -350,6 +602,71 @@ class ActivityScreen(Screen):
         self.manager.current = "home"
 
 
+class MedicationScreen(Screen):
+    """
+    Screen for logging a medication dose.
+
+    Provides text inputs for the medication name, the dose and the number of hours
+    the dose stays active. The dose is active from the current (or historical) hour
+    for that many hours, and is listed with every pain reading taken meanwhile.
+    """
+    historical_timestamp = StringProperty("")
+
+    @perf.timed("on_pre_enter:medication")
+    def on_pre_enter(self):
+        """
+        Reset the inputs when entering the screen.
+        """
+        self.ids.medication_name_input.text = ""
+        self.ids.medication_dose_input.text = ""
+        self.ids.medication_duration_input.text = ""
+        self.ids.medication_message.text = ""
+
+    def save_medication(self) -> None:
+        """
+        Save the dose. Return to HistoricalDateScreen if historical_timestamp set,
+        else return home.
+        """
+        name = self.ids.medication_name_input.text.strip()
+        dose = self.ids.medication_dose_input.text.strip()
+        target = "historical_date" if self.historical_timestamp else "home"
+
+        if not name:
+            # no data entered
+            self.manager.current = target
+            return
+        try:
+            duration = float(self.ids.medication_duration_input.text)
+            if duration <= 0:
+                raise ValueError
+        except ValueError:
+            self.ids.medication_message.text = "Enter how long the dose lasts (hours)."
+            return
+
+        ts = (
+            self.historical_timestamp
+            if self.historical_timestamp
+            else round_up_to_hour(datetime.now())
+        )
+        entry = {"timestamp": ts, "name": name, "dose": dose, "duration_hours": duration}
+
+        outcome = MeasurementInputScreen.update_data(lambda data: data_store.add_medication(data, entry))
+        if outcome is None:
+            return
+        App.get_running_app().logger.info("Logged medication %s from %s for %g h",
+                                          data_store.medication_label(entry), ts, duration)
+
+        # clear override and navigate
+        self.historical_timestamp = ""
+        self.manager.current = target
+
+    def return_without_save(self):
+        """
+        Return to the home screen without saving.
+        """
+        self.manager.current = "home"
+
+
 class NotesScreen(Screen):
     """
     Screen for editing notes for the current hour.
@@ -358,6 +675,7 @@ class NotesScreen(Screen):
     """
     historical_timestamp = StringProperty("")
 
+    @perf.timed("on_pre_enter:notes")
     def on_pre_enter(self):
         """
         Load notes for the current hour when the screen is entered.
@@ -375,9 +693,16 @@ class NotesScreen(Screen):
         to HistoricalDateScreen if in historical mode, else to home.
         """
         ts = self.historical_timestamp or round_up_to_hour(datetime.now())
-        data = MeasurementInputScreen.load_data()
-        data.setdefault("notes_data", {})[ts] = self.ids.notes_input.text
-        MeasurementInputScreen.write_data(data)
+        text = self.ids.notes_input.text
+
+        def set_note(data):
+            data.setdefault("notes_data", {})[ts] = text
+            data_store.record_change(data, ts)
+
+        outcome = MeasurementInputScreen.update_data(set_note)
+        if outcome is None:
+            return
+        App.get_running_app().search_index.update_from_data(outcome[0], ts)
 
 
         # go back
@@ -386,278 +711,632 @@ class NotesScreen(Screen):
         self.manager.current = target
 
 
-class ViewDataScreen(Screen):
+class ViewDataScreen(VersionedScreen):
     """
     Screen for viewing saved data.
 
     The displayed data format mimics the export CSV:
       a) A main row with columns:
-         Timestamp (dd/mm/yyyy hh:mm), Activity Value, Activity, RU, RL, LU, LL, Axial, Head.
+         Timestamp (dd/mm/yyyy hh:mm), Activity Value, Activity and one column per
+         body region that has readings.
       b) If any notes exist for that timestamp, a second row is added showing:
          "Notes: <text>"
 
-    A ScrollView is used to allow scrolling when many records are present.
+    A ScrollView is used to allow scrolling when many records are present. Each record
+    is one widget; after a write only the hours in the change log are rebuilt, unless
+    a region gained or lost its column.
     """
+    # Fixed widths of the leading columns and of each region column, shared by the
+    # header and every row.
+    COLUMN_WIDTHS = [100, 60, 80]
+    REGION_WIDTH = 45
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._records = {}
+        self._token = None
+        self._sections = None
 
+    def column_widths(self) -> list:
+        return self.COLUMN_WIDTHS + [self.REGION_WIDTH] * len(self._sections)
+
+    @perf.timed("on_pre_enter:view_data")
     def on_pre_enter(self):
         """
         Populate the view with combined pain, activity and notes data in a scrollable layout.
         """
-        # Clear previous records from the container
-        self.ids.data_box.clear_widgets()
+        if self.is_up_to_date():
+            return
+        data = MeasurementInputScreen.load_data()
+        token = data_store.data_token(data)
+        sections = data_store.present_sections(data)
+        changed = None
+        if (self._token is not None and token[0] is not None and self._token[0] == token[0]
+                and sections == self._sections):
+            changed = data_store.changes_since(data, self._token[1])
+
+        if changed is None:
+            self._sections = sections
+            self.reset_records()
+        else:
+            for key in changed:
+                try:
+                    dt = datetime.strptime(key, data_store.TIMESTAMP_FORMAT)
+                except ValueError:
+                    continue
+                widget = self._records.pop(dt, None)
+                if widget is not None:
+                    self.ids.data_box.remove_widget(widget)
+
+        combined_rows = data_store.combine_rows(data)
+        sync_children(self.ids.data_box, self._records, sorted(combined_rows),
+                      lambda dt: self.make_record(dt, combined_rows[dt]))
+        self._token = token
+        self.mark_rendered()
 
-        # Header row for main fields
-        header_titles = ["Timestamp", "A-Value", "Activity", "RU", "RL", "LU", "LL", "Axial", "Head"]
+    def reset_records(self) -> None:
+        """
+        Clear every record and put the header row back.
+        """
+        self.ids.data_box.clear_widgets()
+        self._records = {}
+        header_titles = ["Timestamp", "A-Value", "Activity"] + self._sections
         header_layout = BoxLayout(orientation="horizontal", size_hint_y=None, height=dp(30), spacing=5)
-        # Define fixed widths for each header label
-        header_widths = [dp(100), dp(60), dp(80), dp(40), dp(40), dp(40), dp(40), dp(50), dp(50)]
-        for title, width in zip(header_titles, header_widths):
-            header_label = Label(text=title, font_size="12sp", size_hint_x=None, width=width)
+        for title, width in zip(header_titles, self.column_widths()):
+            header_label = Label(text=title, font_size="12sp", size_hint_x=None, width=dp(width))
             header_layout.add_widget(header_label)
         self.ids.data_box.add_widget(header_layout)
 
-        # Load data from file
-        data = {}
-        if os.path.exists(get_data_file_path()):
-            try:
-                with open(get_data_file_path(), "r") as f:
-                    data = json.load(f)
-            except Exception as e:
-                App.get_running_app().logger.exception("Error loading data for view: %s", e)
-
-        # Define the pain measurement sections
-        pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-
-        # Build combined rows keyed by the rounded timestamp.
-        combined_rows = {}
-        # Process pain measurements (from body sections)
-        for section in pain_sections:
-            if section in data and isinstance(data[section], list):
-                for entry in data[section]:
-                    try:
-                        dt = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-                    except Exception:
-                        continue
-                    if dt not in combined_rows:
-                        combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
-                    combined_rows[dt]["pain"][section] = entry["value"]
+    def make_record(self, dt: datetime, row: dict) -> BoxLayout:
+        """
+        Build the widget of one hour: the main row, its note (if any) and a separator.
 
-        # Process activity data
-        if "activity_data" in data:
-            for ts_str, entries in data["activity_data"].items():
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    continue
-                if dt not in combined_rows:
-                    combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
-                for entry in entries:
-                    combined_rows[dt]["activity_levels"].append(str(entry.get("activity_level", "")))
-                    combined_rows[dt]["activity_names"].append(entry.get("activity_name", ""))
-
-        # Process notes data
-        if "notes_data" in data:
-            for ts_str, note in data["notes_data"].items():
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    continue
-                if dt not in combined_rows:
-                    combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
-                combined_rows[dt]["notes"] = note
-
-        # Sort the combined rows by timestamp ascending and add them to the layout
-        for dt in sorted(combined_rows.keys()):
-            ts_formatted = dt.strftime("%d/%m/%Y %H:%M")
-            act_levels = combined_rows[dt]["activity_levels"]
-            act_names = combined_rows[dt]["activity_names"]
-            act_val_str = f"[{','.join(act_levels)}]" if act_levels else ""
-            act_names_str = f"[{','.join(act_names)}]" if act_names else ""
-            # Retrieve pain measurements with blank if not present
-            pain_vals = [str(combined_rows[dt]["pain"].get(sec, "")) for sec in pain_sections]
-
-            # Create the main row container inside a HorizontalScrollView
-            hs_view = ScrollView(size_hint_y=None, height=dp(30), do_scroll_x=True, do_scroll_y=False)
-            main_row = BoxLayout(orientation="horizontal", size_hint_y=None, height=dp(30), spacing=5)
-            # Corresponding fixed widths for each column (same as header)
-            col_widths = [dp(100), dp(60), dp(80), dp(40), dp(40), dp(40), dp(40), dp(50), dp(50)]
-            row_fields = [ts_formatted, act_val_str, act_names_str] + pain_vals
-            for field, width in zip(row_fields, col_widths):
-                lbl = Label(text=field, font_size="12sp", size_hint_x=None, width=width)
-                main_row.add_widget(lbl)
-            hs_view.add_widget(main_row)
-            self.ids.data_box.add_widget(hs_view)
-
-            # If there are notes, display them in a second row spanning full width.
-            note_text = combined_rows[dt]["notes"]
-            if note_text.strip():
-                note_label = Label(text="Notes: " + note_text, font_size="11sp", halign="left",
-                                   size_hint_y=None, height="25dp")
-                self.ids.data_box.add_widget(note_label)
-
-            # Add an optional separator between records
-            separator = Label(text=" ", size_hint_y=None, height=dp(10))
-            self.ids.data_box.add_widget(separator)
-
-
-class PlotScreen(Screen):
+        :param dt: The hour.
+        :param row: The combined row for that hour.
+        """
+        row_fields = [str(field) for field in data_store.format_row(dt, row, self._sections)]
+        record = BoxLayout(orientation="vertical", size_hint_y=None)
+
+        # Create the main row container inside a HorizontalScrollView
+        hs_view = ScrollView(size_hint_y=None, height=dp(30), do_scroll_x=True, do_scroll_y=False)
+        main_row = BoxLayout(orientation="horizontal", size_hint_y=None, height=dp(30), spacing=5)
+        for field, width in zip(row_fields, self.column_widths()):
+            lbl = Label(text=field, font_size="12sp", size_hint_x=None, width=dp(width))
+            main_row.add_widget(lbl)
+        hs_view.add_widget(main_row)
+        record.add_widget(hs_view)
+
+        # If there are notes, display them in a second row spanning full width.
+        note_text = row["notes"]
+        if note_text.strip():
+            note_label = Label(text="Notes: " + note_text, font_size="11sp", halign="left",
+                               size_hint_y=None, height=dp(25))
+            record.add_widget(note_label)
+
+        # Add an optional separator between records
+        separator = Label(text=" ", size_hint_y=None, height=dp(10))
+        record.add_widget(separator)
+        record.height = sum(child.height for child in record.children)
+        return record
+
+
+class PlotScreen(VersionedScreen):
     """
     Screen for plotting a spider (radar) diagram of the pain measurements.
 
-    For each hour, a line is plotted representing RU, RL, LU, LL, Axial, and Head.
-    If any region is missing a value, 0 is assumed.
+    For each hour, a line is plotted over the body regions that have readings. If a
+    region is missing a value in an hour, 0 is assumed.
+
+    The chart is drawn either with matplotlib or, when ``engine`` is "canvas", with
+    the native Kivy chart from charts.py. Both are kept between visits: the canvas
+    chart only has its vertex data replaced, and the matplotlib figure only gains or
+    loses the lines of hours whose readings changed.
     """
+    engine = StringProperty("matplotlib")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._radar = None
+        self._ax = None
+        self._canvas = None
+        self._sections = None
+        self._artists = {}
+
+    def on_engine(self, instance, value):
+        if self.manager and self.manager.current == self.name:
+            self.on_pre_enter()
+
+    def render_params(self) -> tuple:
+        return (self.engine,)
 
+    def toggle_engine(self) -> None:
+        """
+        Switch between the matplotlib and the native canvas chart.
+        """
+        self.engine = "canvas" if self.engine == "matplotlib" else "matplotlib"
+
+    @perf.timed("on_pre_enter:plot_screen")
     def on_pre_enter(self):
         """
         Generate and display a radar chart with a line per hour.
         """
-        self.ids.plot_container.clear_widgets()
+        if self.is_up_to_date():
+            return
         if not os.path.exists(get_data_file_path()):
+            self.ids.plot_container.clear_widgets()
             return
 
         try:
-            with open(get_data_file_path(), "r") as f:
-                data = json.load(f)
-            # Define pain regions
-            pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-            # Build combined pain data keyed by timestamp (rounded hour)
-            combined = {}
-            for section in pain_sections:
-                if section in data and isinstance(data[section], list):
-                    for entry in data[section]:
-                        try:
-                            dt = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-                        except Exception:
-                            continue
-                        if dt not in combined:
-                            # Initialise all regions to 0 by default.
-                            combined[dt] = {s: 0 for s in pain_sections}
-                        combined[dt][section] = entry.get("value", 0)
+            data = get_data_model().data
+            combined = data_store.combine_pain(data)
             if not combined:
+                self.ids.plot_container.clear_widgets()
                 return
-            sorted_timestamps = sorted(combined.keys())
-            N = len(pain_sections)
-            # Compute angles for radar chart
-            angles = [n / float(N) * 2 * math.pi for n in range(N)]
-            angles += angles[:1]  # Repeat first angle to close the loop
+            sections = data_store.present_sections(data)
+            if self.engine == "canvas":
+                self.render_radar_canvas(combined, sections)
+            else:
+                self.render_radar(combined, sections)
+            self.mark_rendered()
+        except Exception as e:
+            App.get_running_app().logger.exception("Error generating radar plot: %s", e)
+
+    @perf.timed("render:radar_canvas")
+    def render_radar_canvas(self, combined: dict, sections: list) -> None:
+        """
+        Draw the radar chart with Kivy canvas instructions, reusing the chart widget.
+
+        :param combined: Readings keyed by hour, as returned by data_store.combine_pain.
+        :param sections: The regions to draw an axis for.
+        """
+        if self._radar is None:
+            self._radar = RadarChart(labels=sections, max_value=10)
+        self._radar.labels = sections
+        self._radar.series = [[combined[dt].get(s, 0) for s in sections] for dt in sorted(combined)]
+        show_only(self.ids.plot_container, self._radar)
+
+    @perf.timed("render:radar")
+    def render_radar(self, combined: dict, sections: list) -> None:
+        """
+        Draw the radar chart for the combined hourly readings into the plot container.
+
+        The figure is created once per set of regions; later calls only remove the
+        lines of hours that changed or disappeared, add the new ones and recolour.
 
+        :param combined: Readings keyed by hour, as returned by data_store.combine_pain.
+        :param sections: The regions to draw an axis for.
+        """
+        pain_sections = sections
+        N = len(pain_sections)
+        # Compute angles for radar chart
+        angles = [n / float(N) * 2 * math.pi for n in range(N)]
+        angles += angles[:1]  # Repeat first angle to close the loop
+
+        if self._ax is None or pain_sections != self._sections:
             fig = plt.figure()
             ax = plt.subplot(111, polar=True)
             # Offset so first axis is at the top
             ax.set_theta_offset(math.pi / 2)
             ax.set_theta_direction(-1)
             plt.xticks(angles[:-1], pain_sections)
-
-            # Use a colour map to differentiate lines
-            cmap = plt.get_cmap("viridis")
-            total = len(sorted_timestamps)
-            for i, dt in enumerate(sorted_timestamps):
-                values = [combined[dt][s] for s in pain_sections]
-                values += values[:1]  # Close the loop
-                colour = cmap(i / float(total))
-                ax.plot(angles, values, label=dt.strftime("%d/%m %H:%M"), color=colour)
-                ax.fill(angles, values, alpha=0.1, color=colour)
-            ax.legend(loc="upper right", bbox_to_anchor=(1.3, 1.1))
             ax.grid(True)
-            canvas = FigureCanvasKivyAgg(fig)
-            self.ids.plot_container.add_widget(canvas)
+            self._ax, self._sections, self._artists = ax, pain_sections, {}
+            self._canvas = FigureCanvasKivyAgg(fig)
+
+        ax = self._ax
+        sorted_timestamps = sorted(combined.keys())
+        for dt in list(self._artists):
+            values = self._artists[dt][0]
+            if dt not in combined or values != [combined[dt].get(s, 0) for s in pain_sections]:
+                for artist in self._artists.pop(dt)[1:]:
+                    artist.remove()
+
+        # Use a colour map to differentiate lines
+        cmap = plt.get_cmap("viridis")
+        total = len(sorted_timestamps)
+        for i, dt in enumerate(sorted_timestamps):
+            colour = cmap(i / float(total))
+            if dt in self._artists:
+                for artist in self._artists[dt][1:]:
+                    artist.set_color(colour)
+                continue
+            values = [combined[dt].get(s, 0) for s in pain_sections]
+            closed = values + values[:1]  # Close the loop
+            line, = ax.plot(angles, closed, label=dt.strftime("%d/%m %H:%M"), color=colour)
+            fill, = ax.fill(angles, closed, alpha=0.1, color=colour)
+            self._artists[dt] = (values, line, fill)
+        handles = [self._artists[dt][1] for dt in sorted_timestamps]
+        ax.legend(handles=handles, loc="upper right", bbox_to_anchor=(1.3, 1.1))
+        show_only(self.ids.plot_container, self._canvas)
+        self._canvas.draw_idle()
+
+
+class HeatmapScreen(VersionedScreen):
+    """
+    Screen showing a day × hour-of-day heatmap of Pain (Arb.) or one region.
+
+    The whole history is drawn once as a single image from a dense grid; zooming and
+    panning only change the visible day range and redraw the existing figure. After a
+    write, the new grid replaces the image data of that same figure.
+    """
+    metric = StringProperty("Pain (Arb.)")
+    # Number of days visible at once and the smallest zoom allowed.
+    DEFAULT_SPAN = 365
+    MIN_SPAN = 7
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.first_day = None
+        self.n_days = 0
+        self.view_end = 0
+        self.span = self.DEFAULT_SPAN
+        self._ax = None
+        self._canvas = None
+        self._image = None
+        self._colorbar = None
+
+    def on_pre_enter(self):
+        if not self.is_up_to_date():
+            self.load_grid()
+
+    def render_params(self) -> tuple:
+        return (self.metric,)
+
+    def on_metric(self, instance, value):
+        if self.manager and self.manager.current == self.name:
+            self.load_grid()
+
+    @perf.timed("on_pre_enter:heatmap")
+    def load_grid(self) -> None:
+        """
+        Build the grid for the selected metric and draw it, showing the most recent days.
+        """
+        if not os.path.exists(get_data_file_path()):
+            self.ids.plot_container.clear_widgets()
+            self._ax = self._canvas = None
+            return
+        try:
+            data = get_data_model().data
+            self.ids.heatmap_metric.values = ["Pain (Arb.)"] + data_store.present_sections(data)
+            self.first_day, grid = analysis.cached("day_hour_grid", data, analysis.day_hour_grid, self.metric)
+            self.n_days = len(grid)
+            if not self.n_days:
+                self.ids.plot_container.clear_widgets()
+                self._ax = self._canvas = None
+                self.ids.heatmap_range.text = "No pain data yet."
+                return
+            self.view_end = self.n_days
+            self.span = min(self.DEFAULT_SPAN, self.n_days)
+            self.render_heatmap(grid)
+            self.mark_rendered()
         except Exception as e:
-            App.get_running_app().logger.exception("Error generating radar plot: %s", e)
+            App.get_running_app().logger.exception("Error generating heatmap: %s", e)
+
+    @perf.timed("render:heatmap")
+    def render_heatmap(self, grid: np.ndarray) -> None:
+        """
+        Draw the grid as one image artist; rows are days, columns hours of the day.
+        The figure is created on the first call and only has its image data replaced
+        afterwards.
+
+        :param grid: Array (days, 24) from analysis.day_hour_grid.
+        """
+        masked = np.ma.masked_invalid(grid)
+        extent = (0, 24, len(grid), 0)
+        if self._ax is None:
+            fig, ax = plt.subplots()
+            self._image = ax.imshow(masked, aspect="auto", interpolation="nearest",
+                                    cmap="inferno", origin="upper", extent=extent)
+            self._colorbar = fig.colorbar(self._image, ax=ax, label=self.metric)
+            ax.set_xticks(range(0, 25, 6))
+            ax.set_xlabel("Hour of day")
+            ax.yaxis.set_major_formatter(FuncFormatter(
+                lambda y, pos: str(np.datetime64(self.first_day + int(y), "D"))))
+            self._ax = ax
+            self._canvas = FigureCanvasKivyAgg(fig)
+        else:
+            self._image.set_data(masked)
+            self._image.set_extent(extent)
+            self._image.autoscale()
+            self._colorbar.set_label(self.metric)
+        show_only(self.ids.plot_container, self._canvas)
+        self.apply_view()
 
+    def apply_view(self) -> None:
+        """
+        Show the days [view_end - span, view_end) and redraw the figure.
+        """
+        if self._ax is None:
+            return
+        start = self.view_end - self.span
+        self._ax.set_ylim(self.view_end, start)
+        self.ids.heatmap_range.text = (f"{np.datetime64(self.first_day + start, 'D')} to "
+                                       f"{np.datetime64(self.first_day + self.view_end - 1, 'D')}")
+        self._canvas.draw_idle()
 
-class StatsScreen(Screen):
+    def zoom(self, factor: float) -> None:
+        """
+        Change the number of visible days by ``factor``, keeping the last day in place.
+        """
+        self.span = int(min(self.n_days, max(self.MIN_SPAN, round(self.span * factor))))
+        self.view_end = max(self.view_end, self.span)
+        self.apply_view()
+
+    def pan(self, fraction: float) -> None:
+        """
+        Move the visible range by ``fraction`` of its length (negative is earlier).
+        """
+        shift = int(round(self.span * fraction))
+        self.view_end = min(self.n_days, max(self.span, self.view_end + shift))
+        self.apply_view()
+
+
+class TimeSeriesScreen(VersionedScreen):
+    """
+    Screen plotting pain over time, one line per region with readings or one metric alone.
+
+    Lines are drawn from precomputed min-max decimation levels at roughly the pixel
+    width of the plot; zooming or panning swaps the line data for the new range, taken
+    from the full-resolution series once it is short enough. As on PlotScreen, the
+    lines are drawn with matplotlib or, when ``engine`` is "canvas", with the native
+    LineChart, whose vertex data is replaced in place. A reload that keeps the same
+    metrics reuses the existing matplotlib lines as well.
+    """
+    metric = StringProperty("All regions")
+    engine = StringProperty("matplotlib")
+    MIN_SPAN_HOURS = 24
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.levels = {}
+        self.start = self.end = self.first = self.last = 0
+        self._ax = None
+        self._lines = {}
+        self._canvas = None
+        self._chart = None
+
+    def on_pre_enter(self):
+        if not self.is_up_to_date():
+            self.load_series()
+
+    def render_params(self) -> tuple:
+        return self.metric, self.engine
+
+    def on_metric(self, instance, value):
+        if self.manager and self.manager.current == self.name:
+            self.load_series()
+
+    def on_engine(self, instance, value):
+        if self.manager and self.manager.current == self.name:
+            self.load_series()
+
+    def toggle_engine(self) -> None:
+        """
+        Switch between the matplotlib and the native canvas chart.
+        """
+        self.engine = "canvas" if self.engine == "matplotlib" else "matplotlib"
+
+    @perf.timed("on_pre_enter:timeseries")
+    def load_series(self) -> None:
+        """
+        Fetch the decimation levels of the selected metrics and draw the whole history.
+        """
+        if not os.path.exists(get_data_file_path()):
+            self.clear_chart()
+            return
+        try:
+            data = get_data_model().data
+            sections = data_store.present_sections(data)
+            self.ids.timeseries_metric.values = ["All regions", "Pain (Arb.)"] + sections
+            metrics = sections if self.metric == "All regions" else [self.metric]
+            self.levels = {m: analysis.cached("series_levels", data, analysis.series_levels, m)
+                           for m in metrics}
+            bounds = [lv.bounds for lv in self.levels.values() if lv.bounds[0] is not None]
+            if not bounds:
+                self.clear_chart()
+                self.ids.timeseries_range.text = "No pain data yet."
+                return
+            self.first = min(b[0] for b in bounds)
+            self.last = max(b[1] for b in bounds)
+            self.start, self.end = self.first, self.last
+            if self.engine == "canvas":
+                self.render_series_canvas()
+            elif self._ax is not None and list(self._lines) == metrics:
+                show_only(self.ids.plot_container, self._canvas)
+                self.apply_view()
+            else:
+                self.render_series()
+            self.mark_rendered()
+        except Exception as e:
+            App.get_running_app().logger.exception("Error generating time series: %s", e)
+
+    def render_series_canvas(self) -> None:
+        """
+        Show the native line chart, reused between loads, with one series per metric.
+        """
+        if self._chart is None:
+            self._chart = LineChart(y_range=[0, 10.5])
+        self._chart.names = list(self.levels)
+        show_only(self.ids.plot_container, self._chart)
+        self.apply_view()
+
+    def render_series(self) -> None:
+        """
+        Create the figure with one (initially empty) line per metric.
+        """
+        fig, ax = plt.subplots()
+        cmap = get_cmap("tab10")
+        self._lines = {}
+        for i, metric in enumerate(self.levels):
+            self._lines[metric], = ax.plot([], [], lw=1, color=cmap(i % cmap.N), label=metric)
+        ax.set_ylim(0, 10.5)
+        ax.set_ylabel("Pain")
+        ax.xaxis.set_major_formatter(FuncFormatter(
+            lambda x, pos: str(np.datetime64(int(x), "h").astype("datetime64[D]"))))
+        ax.legend(loc="upper left", fontsize="small", ncol=3)
+        self._ax = ax
+        self._canvas = FigureCanvasKivyAgg(fig)
+        show_only(self.ids.plot_container, self._canvas)
+        self.apply_view()
+
+    def clear_chart(self) -> None:
+        """
+        Remove the chart and forget the matplotlib figure.
+        """
+        self.ids.plot_container.clear_widgets()
+        self._ax = self._canvas = None
+        self._lines = {}
+
+    @perf.timed("render:timeseries")
+    def apply_view(self) -> None:
+        """
+        Load the points of the visible range into the lines and redraw.
+        """
+        canvas_chart = self._chart is not None and self._chart.parent is not None
+        if self._ax is None and not canvas_chart:
+            return
+        width = max(100, int(self.ids.plot_container.width))
+        windows = {metric: self.levels[metric].window(self.start, self.end, width) for metric in self.levels}
+        self.ids.timeseries_range.text = (
+            f"{np.datetime64(int(self.start), 'h')} to {np.datetime64(int(self.end), 'h')}")
+        if canvas_chart:
+            self._chart.x_range = [self.start, max(self.end, self.start + 1)]
+            self._chart.series = list(windows.values())
+            return
+        for metric, line in self._lines.items():
+            line.set_data(*windows[metric])
+        self._ax.set_xlim(self.start, max(self.end, self.start + 1))
+        self._canvas.draw_idle()
+
+    def zoom(self, factor: float) -> None:
+        """
+        Scale the visible range by ``factor`` around its centre.
+        """
+        centre = (self.start + self.end) / 2.0
+        half = max(self.MIN_SPAN_HOURS, (self.end - self.start) * factor) / 2.0
+        half = min(half, (self.last - self.first) / 2.0)
+        centre = min(max(centre, self.first + half), self.last - half)
+        self.start, self.end = centre - half, centre + half
+        self.apply_view()
+
+    def pan(self, fraction: float) -> None:
+        """
+        Move the visible range by ``fraction`` of its length (negative is earlier).
+        """
+        span = self.end - self.start
+        self.start = min(max(self.first, self.start + span * fraction), self.last - span)
+        self.end = self.start + span
+        self.apply_view()
+
+
+class StatsScreen(VersionedScreen):
     """
     Screen for displaying statistics based on pain and sleep data.
 
     Now includes the calculation of Pain (Arb.) for every hour that has pain data.
     Pain (Arb.) is defined as:
-    (average of [RU, RL, LU, LL, Axial, Head] × number of non-zero scores) / 3.
+    (average over the six original regions × number of non-zero scores) / 3,
+    whatever regions are configured.
+    Per-region statistics cover the regions that have readings.
     """
 
+    def render_params(self) -> tuple:
+        # "Today's sleep" depends on the date as well as the data.
+        return (datetime.now().strftime("%Y-%m-%d"),)
+
+    @perf.timed("on_pre_enter:stats_screen")
     def on_pre_enter(self):
         """
         Calculate and display statistics including the Pain (Arb.) for each hour.
         """
-        self.ids.stats_box.clear_widgets()
+        if self.is_up_to_date():
+            return
+        rows = []
+
+        def add(text: str, **style) -> None:
+            rows.append(((text, tuple(sorted(style.items()))), lambda: Label(text=text, **style)))
+
         if not os.path.exists(get_data_file_path()):
-            self.ids.stats_box.add_widget(Label(text="No data found."))
+            add("No data found.")
+            self.sync_rows(self.ids.stats_box, rows)
             return
 
         try:
-            with open(get_data_file_path(), "r") as f:
-                data = json.load(f)
-            total_entries = 0
-            section_averages = {}
-            highest_score = -1
-            highest_entry = None
-            # Current stat calculations for individual sections (excluding sleep data)
-            for section, entries in data.items():
-                if section == "sleep_data":
-                    continue
-                if isinstance(entries, list):
-                    values = [e["value"] for e in entries]
-                    timestamps = [e["timestamp"] for e in entries]
-                    total_entries += len(values)
-                    if values:
-                        avg = sum(values) / len(values)
-                        section_averages[section] = avg
-                        max_val = max(values)
-                        if max_val > highest_score:
-                            highest_score = max_val
-                            idx = values.index(max_val)
-                            highest_entry = (section, max_val, timestamps[idx])
-            self.ids.stats_box.add_widget(Label(text=f"Total pain entries: {total_entries}", font_size="16sp"))
+            model = get_data_model()
+            data = model.data
+            summary = data_store.section_summary(data)
+            section_averages = summary["averages"]
+            highest_entry = summary["highest"]
+            add(f"Total pain entries: {summary['total_entries']}", font_size="16sp")
             for section, avg in section_averages.items():
-                self.ids.stats_box.add_widget(Label(text=f"{section}: avg pain {avg:.2f}", font_size="14sp"))
+                add(f"{section}: avg pain {avg:.2f}", font_size="14sp")
             if highest_entry:
                 s, v, t = highest_entry
-                self.ids.stats_box.add_widget(
-                    Label(text=f"Highest recorded: {v:.1f} in {s} at {t}", font_size="14sp", color=(1, 0.4, 0.4, 1)))
+                add(f"Highest recorded: {v:.1f} in {s} at {t}", font_size="14sp", color=(1, 0.4, 0.4, 1))
             if section_averages:
                 best = min(section_averages.items(), key=lambda x: x[1])
-                self.ids.stats_box.add_widget(
-                    Label(text=f"Lowest average: {best[0]} ({best[1]:.2f})", font_size="14sp", color=(0.6, 1, 0.6, 1)))
+                add(f"Lowest average: {best[0]} ({best[1]:.2f})", font_size="14sp", color=(0.6, 1, 0.6, 1))
 
             # --- Calculate and display Pain (Arb.) per hour ---
-            pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-            # Combine pain data keyed by rounded timestamp.
-            combined = {}
-            for sec in pain_sections:
-                if sec in data and isinstance(data[sec], list):
-                    for entry in data[sec]:
-                        try:
-                            dt = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-                        except Exception:
-                            continue
-                        if dt not in combined:
-                            combined[dt] = {s: 0 for s in pain_sections}
-                        combined[dt][sec] = entry.get("value", 0)
-
-            if combined:
-                self.ids.stats_box.add_widget(Label(text="Hourly Pain (Arb.):", font_size="16sp", underline=True))
-            # For each hour, calculate the Pain (Arb.) based on available pain scores
-            for dt in sorted(combined.keys()):
-                vals = combined[dt]
-                total = sum(vals[s] for s in pain_sections)
-                avg = total / 6.0  # average over six regions (using 0 where missing)
-                nonzero_count = sum(1 for s in pain_sections if vals[s] > 0)
-                pain_arb = (avg * nonzero_count) / 3.0
+            hourly = data_store.hourly_pain_arb(data_store.combine_pain(data))
+            if hourly:
+                add("Hourly Pain (Arb.):", font_size="16sp", underline=True)
+            for dt, pain_arb in hourly:
                 ts_formatted = dt.strftime("%d/%m/%Y %H:%M")
-                self.ids.stats_box.add_widget(
-                    Label(text=f"{ts_formatted}: Pain (Arb.) = {pain_arb:.2f}", font_size="14sp")
-                )
+                add(f"{ts_formatted}: Pain (Arb.) = {pain_arb:.2f}", font_size="14sp")
             # ----------------------------------------------------
 
             # Sleep data as before
             today_str = datetime.now().strftime("%Y-%m-%d")
-            sleep_entries_today = [entry for entry in data.get("sleep_data", []) if entry["date"] == today_str]
-            if sleep_entries_today:
-                sleep_entry = sleep_entries_today[-1]
+            sleep_entry = model.sleep_on(today_str)
+            if sleep_entry:
                 sleep_text = f"Today's Sleep: {sleep_entry['hours_slept']} hrs, Quality {sleep_entry['sleep_quality']}"
             else:
                 sleep_text = "No sleep data logged today."
-            self.ids.stats_box.add_widget(Label(text=sleep_text, font_size="14sp", color=(0.4, 0.6, 1, 1)))
+            add(sleep_text, font_size="14sp", color=(0.4, 0.6, 1, 1))
+
+            # Sleep against the pain of the day that follows it (cached per data version).
+            corr = analysis.cached("sleep_pain", data, analysis.sleep_pain_correlation)
+            if corr["nights"]:
+                add(f"Sleep vs next-day pain ({corr['nights']} nights):", font_size="16sp", underline=True)
+                for metric in corr["hours"]:
+                    r_hours, r_quality = corr["hours"][metric], corr["quality"][metric]
+                    hours_text = "n/a" if r_hours is None else f"{r_hours:+.2f}"
+                    quality_text = "n/a" if r_quality is None else f"{r_quality:+.2f}"
+                    add(f"{metric}: hours r={hours_text}, quality r={quality_text}",
+                        font_size="14sp", color=(0.4, 0.6, 1, 1))
+
+            # Activity against pain in the following hours (updated incrementally).
+            response = analysis.activity_response(data)
+            corr = response.cross_correlation()
+            curves = response.response_curves()
+            if np.isfinite(corr).any():
+                add("Activity vs pain in the following hours:", font_size="16sp", underline=True)
+                for col, metric in enumerate(response.metrics):
+                    if not np.isfinite(corr[:, col]).any():
+                        continue
+                    lag = int(np.nanargmax(np.abs(corr[:, col])))
+                    add(f"{metric}: strongest r={corr[lag, col]:+.2f} after {lag} h",
+                        font_size="14sp", color=(1, 0.8, 0.4, 1))
+                for level in range(analysis.ACTIVITY_LEVELS):
+                    points = [f"{lag} h {curves[level, lag, 0]:.2f}" for lag in (0, 6, 24, 48)
+                              if np.isfinite(curves[level, lag, 0])]
+                    if points:
+                        add(f"Level {level + 1} mean Pain (Arb.): " + ", ".join(points),
+                            font_size="14sp", color=(1, 0.8, 0.4, 1))
+
+            # Tomorrow's expected pain (updated incrementally, cached per data version).
+            tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+            forecast = analysis.pain_forecast(data, tomorrow)
+            if forecast:
+                add("Tomorrow's expected pain:", font_size="16sp", underline=True)
+                for metric, expected in forecast.items():
+                    add(f"{metric}: {expected['mean']:.2f} "
+                        f"(peak {expected['peak']:.2f} at {expected['peak_hour']:02d}:00)",
+                        font_size="14sp", color=(0.7, 0.6, 1, 1))
+            # Only labels whose text or style changed are rebuilt.
+            self.sync_rows(self.ids.stats_box, rows)
+            self.mark_rendered()
         except Exception as e:
             App.get_running_app().logger.exception("Error calculating statistics: %s", e)
 
@@ -710,14 +1389,15 @@ class SleepInputScreen(Screen):
             "hours_slept": hours,
             "sleep_quality": int(self.sleep_quality),
         }
-        data = self.load_data()
-        data.setdefault("sleep_data", []).append(sleep_entry)
-        self.write_data(data)
+        outcome = MeasurementInputScreen.update_data(lambda data: data_store.upsert_sleep(data, sleep_entry))
+        if outcome is None:
+            return
+        replaced = outcome[1]
 
         # confirmation popup
         popup = Popup(
             title="Info",
-            content=Label(text="Sleep data saved."),
+            content=Label(text="Sleep data updated." if replaced else "Sleep data saved."),
             size_hint=(None, None),
             size=(dp(300), dp(200)),
             auto_dismiss=True,
@@ -735,100 +1415,56 @@ class SleepInputScreen(Screen):
         self.historical_date = ""
         self.manager.current = target
 
-    @staticmethod
-    def load_data():
-        """
-        Load sleep data from the JSON file.
 
-        :return: The loaded data as a dictionary.
-        :rtype: dict
-        """
-        if os.path.exists(get_data_file_path()):
-            with open(get_data_file_path(), "r") as f:
-                return json.load(f)
-        return {}
-
-    @staticmethod
-    def write_data(data):
-        """
-        Write sleep data to the JSON file.
-
-        :param data: The data to be written.
-        :type data: dict
-        :return: None
-        """
-        with open(get_data_file_path(), "w") as f:
-            json.dump(data, f, indent=2)
-
-
-class CalendarScreen(Screen):
+class CalendarScreen(VersionedScreen):
     """
     Screen displaying a calendar view of available days.
 
     The screen collects all dates for which there is pain, activity, note or sleep data.
-    Tapping a day navigates to the DayDetailScreen.
+    Tapping a day navigates to the DayDetailScreen. Day buttons are kept between visits;
+    only the days that appeared or disappeared are added or removed.
     """
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._buttons = {}
+
+    @perf.timed("on_pre_enter:calendar")
     def on_pre_enter(self):
         """
         Populate the calendar with available days.
         """
-        # Clear previous entries in the container (assumed to have id "calendar_box" in KV)
-        self.ids.calendar_box.clear_widgets()
-        data = MeasurementInputScreen.load_data()  # Load all data from JSON
-        dates_set = set()
-
-        # From pain measurements in each pain section.
-        pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-        for sec in pain_sections:
-            if sec in data and isinstance(data[sec], list):
-                for entry in data[sec]:
-                    try:
-                        dt = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-                        dates_set.add(dt.date())
-                    except Exception:
-                        continue
-
-        # From activity data (keys are timestamps).
-        if "activity_data" in data:
-            for ts in data["activity_data"].keys():
-                try:
-                    dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-                    dates_set.add(dt.date())
-                except Exception:
-                    continue
-
-        # From notes data.
-        if "notes_data" in data:
-            for ts in data["notes_data"].keys():
-                try:
-                    dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-                    dates_set.add(dt.date())
-                except Exception:
-                    continue
-
-        # From sleep data (using the 'date' field).
-        if "sleep_data" in data:
-            for entry in data["sleep_data"]:
-                try:
-                    dt = datetime.strptime(entry.get("date", ""), "%Y-%m-%d").date()
-                    dates_set.add(dt)
-                except Exception:
-                    continue
-
-        # Sort dates in ascending order.
-        sorted_dates = sorted(list(dates_set))
+        if self.is_up_to_date():
+            return
+        # Only the dates are needed, so stream the file instead of loading it whole,
+        # unless journalled edits still have to be applied on top of it.
+        data_file = get_data_file_path()
+        try:
+            data = data_store.load_data(data_file) if journal.count(data_file) else StreamedData(data_file)
+            sorted_dates = data_store.calendar_dates(data)
+        except Exception as e:
+            App.get_running_app().logger.exception("Error reading calendar dates: %s", e)
+            sorted_dates = []
+        sync_children(self.ids.calendar_box, self._buttons, sorted_dates, self.make_button)
+        # The rainbow runs over the whole list, so shift the colours of existing buttons.
         app = App.get_running_app()
         total = len(sorted_dates)
         for idx, d in enumerate(sorted_dates):
-            btn = Button(text=d.strftime("%Y-%m-%d"),
-                         size_hint_y=None,
-                         height="40dp",
-                         background_normal="",
-                         background_color=app.get_rainbow_colour(idx, total, 0.7),
-                         color=(1, 1, 1, 1))
-            btn.bind(on_release=lambda instance, d=d: self.select_date(d))
-            self.ids.calendar_box.add_widget(btn)
+            self._buttons[d].background_color = app.get_rainbow_colour(idx, total, 0.7)
+        self.mark_rendered()
+
+    def make_button(self, d) -> Button:
+        """
+        :param d: A date with data.
+        :return: The button opening that day.
+        """
+        btn = Button(text=d.strftime("%Y-%m-%d"),
+                     size_hint_y=None,
+                     height="40dp",
+                     background_normal="",
+                     color=(1, 1, 1, 1))
+        btn.bind(on_release=lambda instance, d=d: self.select_date(d))
+        return btn
 
     def select_date(self, date_obj):
         """
@@ -841,94 +1477,99 @@ class CalendarScreen(Screen):
         self.manager.current = "day_detail"
 
 
-class DayDetailScreen(Screen):
+class DayDetailScreen(EntryEditScreen):
     """
     Screen displaying the details for a specific day.
 
-    The screen shows sleep data (if available) at the top and then a list of available hours.
-    Tapping an hour brings up HourDetailScreen.
+    The screen shows sleep data (if available, with Edit and Delete) at the top and
+    then a list of available hours. Tapping an hour brings up HourDetailScreen.
     """
     selected_date = StringProperty("")
 
+    def render_params(self) -> tuple:
+        return (self.selected_date,)
+
+    @perf.timed("on_pre_enter:day_detail")
     def on_pre_enter(self):
         """
         Populate the day detail view with sleep data and a list of available hours.
         """
-        self.ids.day_box.clear_widgets()
-        data = MeasurementInputScreen.load_data()
+        if self.is_up_to_date():
+            return
+        model = get_data_model()
+        date_str = self.selected_date
+        rows = []
 
         # Display sleep data for this day (if available).
-        sleep_text = ""
-        if "sleep_data" in data:
-            sleep_entries = [entry for entry in data["sleep_data"] if entry.get("date") == self.selected_date]
-            if sleep_entries:
-                # Assume the last recorded sleep entry for that day is most relevant.
-                entry = sleep_entries[-1]
-                sleep_text = f"Sleep: {entry.get('hours_slept', '')} hrs, Quality: {entry.get('sleep_quality', '')}"
-        if sleep_text:
-            sleep_label = Label(text=sleep_text, font_size="14sp", size_hint_y=None, height="30dp")
-            self.ids.day_box.add_widget(sleep_label)
+        entry = model.sleep_on(date_str)
+        if entry:
+            sleep_text = f"Sleep: {entry.get('hours_slept', '')} hrs, Quality: {entry.get('sleep_quality', '')}"
+            rows.append((("sleep", date_str, sleep_text), lambda: self.entry_row(
+                sleep_text,
+                on_edit=lambda: self.edit_sleep(entry),
+                on_delete=lambda: self.apply_edit("sleep", date_str, None))))
 
         # Gather available hours from pain measurements, activity and notes.
-        available_hours = set()
-        pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-        for sec in pain_sections:
-            if sec in data and isinstance(data[sec], list):
-                for entry in data[sec]:
-                    try:
-                        dt = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-                        if dt.strftime("%Y-%m-%d") == self.selected_date:
-                            available_hours.add(dt.hour)
-                    except Exception:
-                        continue
-
-        # Also include hours from activity_data.
-        if "activity_data" in data:
-            for ts in data["activity_data"].keys():
-                try:
-                    dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-                    if dt.strftime("%Y-%m-%d") == self.selected_date:
-                        available_hours.add(dt.hour)
-                except Exception:
-                    continue
-
-        # And from notes_data.
-        if "notes_data" in data:
-            for ts in data["notes_data"].keys():
-                try:
-                    dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-                    if dt.strftime("%Y-%m-%d") == self.selected_date:
-                        available_hours.add(dt.hour)
-                except Exception:
-                    continue
-
-        sorted_hours = sorted(list(available_hours))
+        sorted_hours = model.day_hours(date_str)
         app = App.get_running_app()
-        if sorted_hours:
-            total = len(sorted_hours)
-            for idx, hr in enumerate(sorted_hours):
-                hr_text = f"{hr:02d}:00"
-                btn = Button(text=hr_text,
-                             size_hint_y=None,
-                             height="40dp",
-                             background_normal="",
-                             background_color=app.get_rainbow_colour(idx, total, 0.7),
-                             color=(1, 1, 1, 1)
-                             )
-                btn.bind(on_release=lambda inst, hr=hr: self.select_hour(hr))
-                self.ids.day_box.add_widget(btn, index=0)
-        else:
-            self.ids.day_box.add_widget(Label(text="No hour data available for this day.", font_size="14sp"))
-        # Back button to return to the calendar view.
+        total = len(sorted_hours)
+        for idx, hr in enumerate(sorted_hours):
+            rows.append((("hour", date_str, hr, idx, total),
+                         lambda hr=hr, idx=idx: self.hour_button(hr, app.get_rainbow_colour(idx, total, 0.7))))
+        if not sorted_hours:
+            rows.append((("empty",), lambda: Label(text="No hour data available for this day.", font_size="14sp")))
+        rows.append((("undo",), self.undo_button))
+        rows.append((("back",), self.back_button))
+        # Only the rows that changed since the last visit are rebuilt.
+        self.sync_rows(self.ids.day_box, rows)
+        self.mark_rendered()
+
+    def hour_button(self, hr: int, colour) -> Button:
+        """
+        :return: The button opening hour ``hr`` of the selected day.
+        """
+        btn = Button(text=f"{hr:02d}:00",
+                     size_hint_y=None,
+                     height="40dp",
+                     background_normal="",
+                     background_color=colour,
+                     color=(1, 1, 1, 1)
+                     )
+        btn.bind(on_release=lambda inst: self.select_hour(hr))
+        return btn
+
+    def back_button(self) -> Button:
+        """
+        :return: The button returning to the calendar view.
+        """
         back_btn = Button(text="Back",
                           size_hint_y=None,
                           height="40dp",
                           background_normal="",
-                          background_color=app.get_rainbow_colour(0, 6),
+                          background_color=App.get_running_app().get_rainbow_colour(0, 6),
                           color=(1, 1, 1, 1)
                           )
         back_btn.bind(on_release=lambda x: setattr(self.manager, "current", "calendar"))
-        self.ids.day_box.add_widget(back_btn)
+        return back_btn
+
+    def edit_sleep(self, entry: dict) -> None:
+        """
+        Open the editor for this day's sleep entry.
+        """
+        def save(texts):
+            try:
+                hours = float(texts[0])
+                quality = int(texts[1])
+                if not (0 <= hours <= 24) or quality not in (1, 2, 3):
+                    raise ValueError
+            except ValueError:
+                return "Enter hours (0–24) and quality 1–3."
+            self.apply_edit("sleep", self.selected_date,
+                            dict(entry, hours_slept=hours, sleep_quality=quality))
+
+        self.open_editor(f"Sleep on {self.selected_date}",
+                         [("Hours slept", entry.get("hours_slept", "")),
+                          ("Quality (1–3)", entry.get("sleep_quality", ""))], save)
 
     def select_hour(self, hour):
         """
@@ -943,81 +1584,157 @@ class DayDetailScreen(Screen):
         self.manager.current = "hour_detail"
 
 
-class HourDetailScreen(Screen):
+class HourDetailScreen(EntryEditScreen):
     """
     Screen displaying detailed data for a specific hour.
 
-    Shows pain readings (in the order: RU, RL, LU, LL, Axial, Head),
-    followed by activity data (both level and name) and any note.
+    Shows the pain readings of the regions scored in that hour (in configured
+    region order), followed by activity data (both level and name), any note and
+    the medication doses active in that hour. Each reading, activity and note can be
+    edited or deleted, and a reading can be added for another region.
     """
     selected_date = StringProperty("")
     selected_hour = StringProperty("")
 
+    def render_params(self) -> tuple:
+        return self.selected_date, self.selected_hour
+
+    @property
+    def timestamp_key(self) -> str:
+        # Saved timestamps are stored rounded to the hour as "YYYY-mm-dd HH:00:00".
+        return f"{self.selected_date} {self.selected_hour}:00"
+
+    @perf.timed("on_pre_enter:hour_detail")
     def on_pre_enter(self):
         """
         Populate the detail view for the selected hour.
         """
-        self.ids.hour_box.clear_widgets()
-        # Construct the full timestamp key (assumed stored as "YYYY-mm-dd HH:00:00").
-        timestamp_key = f"{self.selected_date} {self.selected_hour}:00"
-        data = MeasurementInputScreen.load_data()
-        pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-        detail_values = {}
-
-        # Retrieve pain measurements.
-        for sec in pain_sections:
-            detail_values[sec] = ""
-            if sec in data and isinstance(data[sec], list):
-                for entry in data[sec]:
-                    if entry.get("timestamp") == timestamp_key:
-                        detail_values[sec] = entry.get("value", "")
-                        break
-
-        # Retrieve activity data.
-        activity_levels = []
-        activity_names = []
-        if "activity_data" in data:
-            for ts, entries in data["activity_data"].items():
-                if ts == timestamp_key:
-                    for entry in entries:
-                        activity_levels.append(str(entry.get("activity_level", "")))
-                        activity_names.append(entry.get("activity_name", ""))
-        # Retrieve notes.
-        note_text = ""
-        if "notes_data" in data:
-            for ts, note in data["notes_data"].items():
-                if ts == timestamp_key:
-                    note_text = note
-                    break
-
-        # Display pain data.
-        for sec in pain_sections:
-            lbl = Label(text=f"{sec}: {detail_values[sec]}", font_size="14sp", size_hint_y=None, height="30dp")
-            self.ids.hour_box.add_widget(lbl)
-
-        # Display activity data, if available.
-        if activity_levels or activity_names:
-            act_val_str = f"[{','.join(activity_levels)}]" if activity_levels else ""
-            act_names_str = f"[{','.join(activity_names)}]" if activity_names else ""
-            self.ids.hour_box.add_widget(Label(text=f"Activity Value: {act_val_str}", font_size="14sp",
-                                               size_hint_y=None, height="30dp"))
-            self.ids.hour_box.add_widget(Label(text=f"Activity: {act_names_str}", font_size="14sp",
-                                               size_hint_y=None, height="30dp"))
+        if self.is_up_to_date():
+            return
+        timestamp_key = self.timestamp_key
+        model = get_data_model()
+        detail = model.hour_detail(timestamp_key)
+        detail_values = detail["pain"]
+        note_text = detail["note"]
+        rows = []
+
+        warning = flare.describe(flare.flags_at(model.data, timestamp_key))
+        if warning:
+            rows.append((("warning", warning), lambda: Label(
+                text=warning, font_size="14sp", color=(1, 0.4, 0.3, 1), size_hint_y=None, height="30dp")))
+
+        # Display pain data; the hour only holds the regions that were scored.
+        for sec, value in detail_values.items():
+            rows.append((("pain", timestamp_key, sec, value), lambda sec=sec, value=value: self.entry_row(
+                f"{sec}: {value}",
+                on_edit=lambda: self.edit_pain(sec, value),
+                on_delete=lambda: self.apply_edit("pain", timestamp_key, None, sec))))
+        if len(detail_values) < len(PAIN_SECTIONS):
+            rows.append((("add_pain",), lambda: self.entry_row("Add a pain reading", on_edit=self.add_pain)))
+
+        # Display activity data, one row per activity, if available. The rows edit the
+        # hour's whole list, so they are keyed on all of it.
+        activities = model.data.get("activity_data", {}).get(timestamp_key, [])
+        listed = repr(activities)
+        for i, entry in enumerate(activities):
+            rows.append((("activity", timestamp_key, listed, i), lambda i=i, entry=entry: self.entry_row(
+                f"Activity: {entry.get('activity_name', '')} ({entry.get('activity_level', '')})",
+                on_edit=lambda: self.edit_activity(activities, i),
+                on_delete=lambda: self.apply_edit(
+                    "activity", timestamp_key, activities[:i] + activities[i + 1:] or None))))
         # Display note.
         if note_text.strip():
-            self.ids.hour_box.add_widget(Label(text=f"Note: {note_text}", font_size="14sp",
-                                               size_hint_y=None, height="30dp"))
-        # Back button to return to the day view.
-        app = App.get_running_app()
+            rows.append((("note", timestamp_key, note_text), lambda: self.entry_row(
+                f"Note: {note_text}",
+                on_edit=lambda: self.edit_note(note_text),
+                on_delete=lambda: self.apply_edit("note", timestamp_key, None))))
+        # Display the medication doses active in this hour.
+        for entry in detail["medications"]:
+            text = (f"Medication: {data_store.medication_label(entry)} "
+                    f"(from {entry['timestamp'][:16]}, {float(entry['duration_hours']):g} h)")
+            rows.append((("medication", text), lambda text=text: Label(text=text, size_hint_y=None, height="30dp")))
+        rows.append((("undo",), self.undo_button))
+        rows.append((("back",), self.back_button))
+        # Only the rows that changed since the last visit are rebuilt.
+        self.sync_rows(self.ids.hour_box, rows)
+        self.mark_rendered()
+
+    def back_button(self) -> Button:
+        """
+        :return: The button returning to the day view.
+        """
         back_btn = Button(text="Back",
                           size_hint_y=None,
                           height="40dp",
                           background_normal="",
-                          background_color=app.get_rainbow_colour(0, 6),
+                          background_color=App.get_running_app().get_rainbow_colour(0, 6),
                           color=(1, 1, 1, 1)
                           )
         back_btn.bind(on_release=lambda x: setattr(self.manager, "current", "day_detail"))
-        self.ids.hour_box.add_widget(back_btn)
+        return back_btn
+
+    def edit_pain(self, section: str, value) -> None:
+        """
+        Open the editor for one pain reading. Unlike a new measurement, the value
+        entered replaces the stored one even if it is lower.
+        """
+        def save(texts):
+            try:
+                new_value = float(texts[0])
+                if not (0 <= new_value <= 10):
+                    raise ValueError
+            except ValueError:
+                return "Please enter a number between 0 and 10"
+            self.apply_edit("pain", self.timestamp_key, new_value, section)
+
+        self.open_editor(f"{section} at {self.selected_date} {self.selected_hour}",
+                         [("Pain (0–10)", value)], save)
+
+    def add_pain(self) -> None:
+        """
+        Open the editor for a reading of a region not yet scored in this hour.
+        """
+        def save(texts):
+            section = texts[0]
+            if section not in PAIN_SECTIONS:
+                return f"Unknown region '{section}'"
+            try:
+                value = float(texts[1])
+                if not (0 <= value <= 10):
+                    raise ValueError
+            except ValueError:
+                return "Please enter a number between 0 and 10"
+            self.apply_edit("pain", self.timestamp_key, value, section)
+
+        self.open_editor(f"Pain at {self.selected_date} {self.selected_hour}",
+                         [("Region", ""), ("Pain (0–10)", "")], save)
+
+    def edit_activity(self, activities: list, index: int) -> None:
+        """
+        Open the editor for one of the hour's activities.
+        """
+        entry = activities[index]
+
+        def save(texts):
+            if texts[1] not in ("1", "2", "3", "4", "5"):
+                return "Enter a level from 1 to 5."
+            updated = list(activities)
+            updated[index] = dict(entry, activity_name=texts[0], activity_level=texts[1])
+            self.apply_edit("activity", self.timestamp_key, updated)
+
+        self.open_editor(f"Activity at {self.selected_date} {self.selected_hour}",
+                         [("Activity", entry.get("activity_name", "")),
+                          ("Level (1–5)", entry.get("activity_level", ""))], save)
+
+    def edit_note(self, note_text: str) -> None:
+        """
+        Open the editor for the hour's note; saving an empty note deletes it.
+        """
+        def save(texts):
+            self.apply_edit("note", self.timestamp_key, texts[0] or None)
+
+        self.open_editor(f"Note at {self.selected_date} {self.selected_hour}",
+                         [("Note", note_text)], save)
 
 class LogScreen(Screen):
     """
@@ -1027,6 +1744,7 @@ class LogScreen(Screen):
     Its contents are displayed in a scrollable, read-only TextInput.
     """
 
+    @perf.timed("on_pre_enter:log")
     def on_pre_enter(self):
         """
         Load the log file content before the screen is displayed.
@@ -1053,6 +1771,96 @@ class LogScreen(Screen):
             self.ids.log_output.text = f"Error clearing log file: {e}"
 
 
+class SearchScreen(Screen):
+    """
+    Screen for searching notes and activity names.
+
+    Every word of the query is matched as a prefix against the search index;
+    tapping a result opens that hour in HourDetailScreen.
+    """
+
+    def run_search(self) -> None:
+        """
+        Look up the query and list the matching hours, newest first.
+        """
+        box = self.ids.search_results
+        box.clear_widgets()
+        query = self.ids.search_input.text
+        if not query.strip():
+            return
+        app = App.get_running_app()
+        matches = app.search_index.search(query)
+        if not matches:
+            box.add_widget(Label(text="No matches.", font_size="14sp", size_hint_y=None, height=dp(30)))
+            return
+        data = MeasurementInputScreen.load_data()
+        total = len(matches)
+        for idx, ts in enumerate(matches):
+            text = ts[:16]
+            note = data.get("notes_data", {}).get(ts, "")
+            if note.strip():
+                text += " - " + (note if len(note) <= 40 else note[:37] + "...")
+            btn = Button(text=text,
+                         size_hint_y=None,
+                         height="40dp",
+                         background_normal="",
+                         background_color=app.get_rainbow_colour(idx, total, 0.7),
+                         color=(1, 1, 1, 1))
+            btn.bind(on_release=lambda instance, ts=ts: self.open_hour(ts))
+            box.add_widget(btn)
+
+    def open_hour(self, ts: str) -> None:
+        """
+        Show the given hour in HourDetailScreen; its Back button leads to the day.
+
+        :param ts: The hour key of the selected result.
+        """
+        date_str, time_str = ts.split(" ")
+        self.manager.get_screen("day_detail").selected_date = date_str
+        hour_screen = self.manager.get_screen("hour_detail")
+        hour_screen.selected_date = date_str
+        hour_screen.selected_hour = time_str[:5]
+        self.manager.current = "hour_detail"
+
+
+class DiagnosticsScreen(Screen):
+    """
+    Screen showing the recorded performance metrics.
+
+    Lists p50/p95 timings for every instrumented operation (screen entry, data
+    load/write, chart rendering and frame time) and the size of the data file.
+    """
+
+    @perf.timed("on_pre_enter:diagnostics")
+    def on_pre_enter(self):
+        """
+        Populate the metrics table.
+        """
+        box = self.ids.diagnostics_box
+        box.clear_widgets()
+        data_file = get_data_file_path()
+        size_kb = os.path.getsize(data_file) / 1024.0 if os.path.exists(data_file) else 0.0
+        box.add_widget(Label(text=f"Data file: {size_kb:.1f} KB", font_size="14sp",
+                             size_hint_y=None, height=dp(30)))
+
+        header = BoxLayout(orientation="horizontal", size_hint_y=None, height=dp(30), spacing=5)
+        for title in ["Operation", "n", "p50 ms", "p95 ms"]:
+            header.add_widget(Label(text=title, font_size="12sp"))
+        box.add_widget(header)
+        for op, count, p50, p95, _ in perf.metrics.summary():
+            row = BoxLayout(orientation="horizontal", size_hint_y=None, height=dp(25), spacing=5)
+            for field in [op, str(count), f"{p50:.1f}", f"{p95:.1f}"]:
+                row.add_widget(Label(text=field, font_size="11sp"))
+            box.add_widget(row)
+
+    def reset_metrics(self):
+        """
+        Clear all recorded timings and refresh the view.
+        """
+        perf.metrics.reset()
+        self.on_pre_enter()
+
+
 class HistoricalDateScreen(Screen):
     """
     First step for historical entry: pick a date and hour,
@@ -1061,6 +1869,7 @@ class HistoricalDateScreen(Screen):
     date_str = StringProperty("")    # holds YYYY-MM-DD
     hour_str = StringProperty("")    # holds HH:MM
 
+    @perf.timed("on_pre_enter:historical_date")
     def on_pre_enter(self) -> None:
         """
         Initialise date_str / hour_str if not already set,
@@ -1102,6 +1911,11 @@ class HistoricalDateScreen(Screen):
         act.ids.activity_name_input.text = ""
         self.manager.current = "activity"
 
+    def go_to_medication(self) -> None:
+        med = self.manager.get_screen("medication")
+        med.historical_timestamp = f"{self.ids.date_input.text} {self.ids.hour_spinner.text}:00"
+        self.manager.current = "medication"
+
     def go_to_sleep(self) -> None:
         sl = self.manager.get_screen("sleep_input")
         sl.historical_date = self.ids.date_input.text
@@ -1116,11 +1930,214 @@ class HistoricalDateScreen(Screen):
         nt.ids.notes_input.text = ""
         self.manager.current = "notes"
 
+    def go_to_batch(self) -> None:
+        batch = self.manager.get_screen("batch_entry")
+        batch.start_date = self.ids.date_input.text
+        self.manager.current = "batch_entry"
+
+
+class BatchRow(BoxLayout):
+    """
+    One recycled row of the batch grid: an hour label and a cell per pain section.
+
+    Rows are reused by the RecycleView as the grid scrolls, so edits are written
+    straight back to the screen's cell store rather than kept in the widgets.
+    """
+    ts = StringProperty("")
+    label = StringProperty("")
+    values = ListProperty([""] * len(PAIN_SECTIONS))
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cells = []
+        for column in range(len(PAIN_SECTIONS)):
+            cell = TextInput(multiline=False, input_filter="float", font_size="13sp")
+            cell.bind(text=lambda instance, text, column=column:
+                      self.cell_edited(column, text) if instance.focus else None)
+            self.cells.append(cell)
+            self.add_widget(cell)
+        self.on_values(self, self.values)
+
+    def on_values(self, instance, values):
+        for cell, text in zip(getattr(self, "cells", []), values):
+            cell.text = text
+
+    def cell_edited(self, column: int, text: str) -> None:
+        App.get_running_app().root.get_screen("batch_entry").set_cell(self.ts, column, text)
+
+
+class BatchEntryScreen(Screen):
+    """
+    Grid editor for backfilling several days of pain readings at once.
+
+    Shows one row per hour and a column per pain section for the chosen day range,
+    pre-filled with the stored values. Only changed cells are saved, all of them in
+    one load and write once every cell has been validated.
+    """
+    start_date = StringProperty("")
+    MAX_DAYS = 14
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cells = {}
+        self.original = {}
+
+    def on_pre_enter(self):
+        if not self.start_date:
+            self.start_date = datetime.now().strftime("%Y-%m-%d")
+        self.ids.batch_start.text = self.start_date
+        header = self.ids.batch_header
+        if len(header.children) == 1:
+            for sec in PAIN_SECTIONS:
+                header.add_widget(Label(text=sec))
+        self.load_grid()
+
+    @perf.timed("batch:load_grid")
+    def load_grid(self) -> None:
+        """
+        Fill the grid for the selected start date and number of days.
+        """
+        try:
+            start = datetime.strptime(self.ids.batch_start.text.strip(), "%Y-%m-%d")
+        except ValueError:
+            self.ids.batch_status.text = "Enter the start date as YYYY-MM-DD."
+            return
+        try:
+            days = int(self.ids.batch_days.text)
+            if not 1 <= days <= self.MAX_DAYS:
+                raise ValueError
+        except ValueError:
+            self.show_result(f"Choose between 1 and {self.MAX_DAYS} days.")
+            return
+        self.start_date = start.strftime("%Y-%m-%d")
+        hours = [(start + timedelta(hours=h)).strftime(data_store.TIMESTAMP_FORMAT)
+                 for h in range(days * 24)]
+        end = (start + timedelta(days=days)).strftime(data_store.TIMESTAMP_FORMAT)
+        self.original = {ts: [""] * len(PAIN_SECTIONS) for ts in hours}
+        if os.path.exists(get_data_file_path()):
+            for ts, section, value in get_data_model().readings(hours[0], end):
+                if ts in self.original:
+                    self.original[ts][PAIN_SECTIONS.index(section)] = f"{value:g}"
+        self.cells = {ts: list(values) for ts, values in self.original.items()}
+        self.ids.batch_rv.data = [
+            {"ts": ts, "label": ts[5:16], "values": self.cells[ts]} for ts in hours
+        ]
+        self.ids.batch_status.text = f"{days} day(s) from {self.start_date}"
+
+    def set_cell(self, ts: str, column: int, text: str) -> None:
+        """
+        Store an edited cell. The RecycleView data shares the same lists, so the
+        edit survives the row being recycled.
+        """
+        if ts in self.cells:
+            self.cells[ts][column] = text
+
+    def changed_cells(self) -> list:
+        """
+        :return: (section, hour key, text) of every cell that differs from the stored data.
+        """
+        return [(PAIN_SECTIONS[col], ts, text.strip())
+                for ts, values in self.cells.items()
+                for col, text in enumerate(values)
+                if text.strip() != self.original[ts][col]]
+
+    def save_batch(self) -> None:
+        """
+        Validate every edited cell and save them all in one transaction. Nothing is
+        written if any cell is invalid.
+        """
+        app = App.get_running_app()
+        readings, errors = [], []
+        for section, ts, text in self.changed_cells():
+            if not text:
+                errors.append(f"{ts[:16]} {section}: cleared values cannot be saved here")
+                continue
+            try:
+                value = float(text)
+                if not (0 <= value <= 10):
+                    raise ValueError
+            except ValueError:
+                errors.append(f"{ts[:16]} {section}: '{text}' is not between 0 and 10")
+                continue
+            readings.append((section, ts, value))
+
+        if errors:
+            more = f"\n... and {len(errors) - 5} more" if len(errors) > 5 else ""
+            self.show_result("Nothing saved:\n" + "\n".join(errors[:5]) + more)
+            return
+        if not readings:
+            self.show_result("No changes to save.")
+            return
+
+        with perf.measure("batch:save"):
+            outcome = MeasurementInputScreen.update_data(
+                lambda data: data_store.save_measurements(data, readings))
+        if outcome is None:
+            return
+        counts = outcome[1]
+        app.logger.info("Batch entry saved %d readings: %s", len(readings), counts)
+        self.show_result(f"Saved {counts['new']} new and {counts['updated']} updated readings; "
+                         f"{counts['skipped']} not higher than the stored value were skipped.")
+        self.load_grid()
+
+    @staticmethod
+    def show_result(msg: str) -> None:
+        popup = Popup(title="Batch Entry", content=Label(text=msg, halign="center"),
+                      size_hint=(0.9, None), height=dp(260), auto_dismiss=True)
+        popup.open()
+
+
+class ImportScreen(Screen):
+    """
+    Screen for bulk importing a CSV export or a data.json from another device.
+
+    The whole file is merged into the loaded data and written back once.
+    """
+
+    @perf.timed("on_pre_enter:import")
+    def on_pre_enter(self):
+        """
+        Suggest the default export location if no path has been entered yet.
+        """
+        if not self.ids.import_path_input.text:
+            if platform == 'android' and storagepath:
+                import_dir = storagepath.get_downloads_dir() or App.get_running_app().user_data_dir
+            else:
+                import_dir = os.path.join(os.path.expanduser("~"), "Downloads")
+            self.ids.import_path_input.text = os.path.join(import_dir, "pain_management.csv")
+        self.ids.import_status.text = ""
+
+    def run_import(self) -> None:
+        """
+        Import the chosen file and show the merge report.
+        """
+        app = App.get_running_app()
+        path = self.ids.import_path_input.text.strip()
+        if not os.path.exists(path):
+            self.ids.import_status.text = "File not found."
+            return
+        try:
+            outcome = MeasurementInputScreen.update_data(lambda data: import_file(data, path))
+        except Exception as e:
+            app.logger.exception("Error importing %s: %s", path, e)
+            self.ids.import_status.text = f"Import failed: {e}"
+            return
+        if outcome is None:
+            return
+        data, report = outcome
+        app.search_index.rebuild(data)
+        app.search_index.save()
+        self.ids.import_status.text = report.summary()
+
 
 class MeasurementApp(App):
     """
     Main application class.
     """
+    # Bumped on every write this process makes to data.json, for widgets that react
+    # to saves as they happen. Screens decide whether to rebuild from the data token
+    # stored in the file (see VersionedScreen), which other writers bump too.
+    data_version = NumericProperty(0)
 
     def build(self):
         """
@@ -1148,15 +2165,35 @@ class MeasurementApp(App):
         sm.add_widget(DayDetailScreen(name="day_detail"))
         sm.add_widget(HourDetailScreen(name="hour_detail"))
         sm.add_widget(PlotScreen(name="plot_screen"))
+        sm.add_widget(HeatmapScreen(name="heatmap"))
+        sm.add_widget(TimeSeriesScreen(name="timeseries"))
         sm.add_widget(StatsScreen(name="stats_screen"))
         sm.add_widget(SleepInputScreen(name="sleep_input"))
         sm.add_widget(ActivityScreen(name="activity"))
+        sm.add_widget(MedicationScreen(name="medication"))
         sm.add_widget(NotesScreen(name="notes"))
         sm.add_widget(LogScreen(name="log"))
         sm.add_widget(HistoricalDateScreen(name="historical_date"))
+        sm.add_widget(BatchEntryScreen(name="batch_entry"))
+        sm.add_widget(ImportScreen(name="import"))
+        sm.add_widget(DiagnosticsScreen(name="diagnostics"))
+        sm.add_widget(SearchScreen(name="search"))
+        storage = data_store.verify_storage(get_data_file_path())
+        if storage["bad"]:
+            self.logger.warning("Data blocks failed verification: %s (repaired: %s)",
+                                storage["bad"], storage["repaired"])
+        self.search_index = SearchIndex(os.path.join(self.user_data_dir, "search_index.json"))
+        self.search_index.load(MeasurementInputScreen.load_data)
+        self.setup_metrics()
         self.logger.info("Application UI built successfully.")
         return sm
 
+    def notify_data_changed(self) -> None:
+        """
+        Announce a write to data.json made by this process.
+        """
+        self.data_version += 1
+
     def setup_logger(self):
         """
         Set up logging to a file in the app's internal storage.
@@ -1179,6 +2216,51 @@ class MeasurementApp(App):
         self.logger = logger
         logger.info("Logger initialised. Log file saved at: %s", log_file)
 
+    def setup_metrics(self):
+        """
+        Load stored performance metrics, sample frame times through the Clock
+        and flush the histograms to metrics.json periodically.
+        """
+        perf.metrics.load(os.path.join(self.user_data_dir, "metrics.json"))
+        Clock.schedule_interval(self.sample_frame_time, 0.5)
+        Clock.schedule_interval(lambda dt: perf.metrics.flush(), 60)
+
+    @staticmethod
+    def sample_frame_time(dt):
+        """
+        Record the duration of the last rendered frame.
+        """
+        perf.metrics.record("frame", Clock.frametime)
+
+    def on_pause(self):
+        """
+        Flush metrics and compact the edit journal when the app is sent to the background.
+        """
+        perf.metrics.flush()
+        self.compact_journal()
+        return True
+
+    def on_stop(self):
+        """
+        Flush metrics and compact the edit journal on exit.
+        """
+        perf.metrics.flush()
+        self.compact_journal()
+
+    def compact_journal(self) -> None:
+        """
+        Fold the edit journal into data.json if the file is free. Compaction is only
+        housekeeping: it waits briefly for the lock and tries twice; when another
+        writer keeps the data, the edits stay in the journal (load_data replays them)
+        and are folded in by a later write.
+        """
+        data_file = get_data_file_path()
+        try:
+            data_store.retrying(lambda: data_store.compact(data_file, data_store.COMPACT_LOCK_TIMEOUT),
+                                retries=2)
+        except data_store.ConflictError as e:
+            self.logger.warning("Left the edit journal for later, data.json is busy: %s", e)
+
     @staticmethod
     def get_rainbow_colour(index, total, alpha=0.7):
         """
@@ -1215,59 +2297,18 @@ class MeasurementApp(App):
         Export pain and activity data to CSV in the required format.
 
         The exported columns are:
-        Timestamp (dd/mm/yyyy hh:mm), Activity Value, Activity, RU, RL, LU, LL, Axial, Head, Notes.
+        Timestamp (dd/mm/yyyy hh:mm), Activity Value, Activity, one column per region with
+        readings, Notes.
         Sleep data is appended separately.
-        The CSV file is saved to the Downloads folder.
+        The CSV file is saved to the Downloads folder. Only hours changed since the
+        previous export are appended; the file is rebuilt when older hours changed.
 
         :return: The absolute path to the saved CSV file.
         :rtype: str
         """
         logger = App.get_running_app().logger
         logger.debug("Exporting CSV with updated format to Downloads folder.")
-        # Load data from JSON file
-        if os.path.exists(get_data_file_path()):
-            with open(get_data_file_path(), "r") as f:
-                data = json.load(f)
-        else:
-            data = {}
-
-        # Define pain sections in desired order.
-        pain_sections = ["RU", "RL", "LU", "LL", "Axial", "Head"]
-        # Build combined rows keyed by rounded timestamp.
-        combined_rows = {}
-        for section in pain_sections:
-            if section in data and isinstance(data[section], list):
-                for entry in data[section]:
-                    try:
-                        dt = datetime.strptime(entry["timestamp"], "%Y-%m-%d %H:%M:%S")
-                    except Exception:
-                        continue
-                    if dt not in combined_rows:
-                        combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
-                    combined_rows[dt]["pain"][section] = entry["value"]
-
-        # Process activity data
-        if "activity_data" in data:
-            for ts_str, entries in data["activity_data"].items():
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    continue
-                if dt not in combined_rows:
-                    combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
-                for entry in entries:
-                    combined_rows[dt]["activity_levels"].append(str(entry.get("activity_level", "")))
-                    combined_rows[dt]["activity_names"].append(entry.get("activity_name", ""))
-        # Process notes data
-        if "notes_data" in data:
-            for ts_str, note in data["notes_data"].items():
-                try:
-                    dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    continue
-                if dt not in combined_rows:
-                    combined_rows[dt] = {"pain": {}, "activity_levels": [], "activity_names": [], "notes": ""}
-                combined_rows[dt]["notes"] = note
+        data = data_store.load_data(get_data_file_path())
 
         # Determine export directory (Downloads folder)
         if platform == 'android' and storagepath:
@@ -1278,33 +2319,10 @@ class MeasurementApp(App):
             export_dir = os.path.join(os.path.expanduser("~"), "Downloads")
         os.makedirs(export_dir, exist_ok=True)
         csv_path = os.path.join(export_dir, "pain_management.csv")
-        if os.path.exists(csv_path):
-            os.remove(csv_path)
 
         try:
-            with open(csv_path, "w", newline="") as csvfile:
-                writer = csv.writer(csvfile)
-                header = ["Timestamp (dd/mm/yyyy hh:mm)", "Activity Value", "Activity",
-                          "RU", "RL", "LU", "LL", "Axial", "Head", "Notes"]
-                writer.writerow(header)
-                for dt in sorted(combined_rows.keys()):
-                    ts_formatted = dt.strftime("%d/%m/%Y %H:%M")
-                    act_levels = combined_rows[dt]["activity_levels"]
-                    act_names = combined_rows[dt]["activity_names"]
-                    act_val_str = f"[{','.join(act_levels)}]" if act_levels else ""
-                    act_names_str = f"[{','.join(act_names)}]" if act_names else ""
-                    pain_vals = [combined_rows[dt]["pain"].get(sec, "") for sec in pain_sections]
-                    note_val = combined_rows[dt]["notes"]
-                    row = [ts_formatted, act_val_str, act_names_str] + pain_vals + [note_val]
-                    writer.writerow(row)
-                if "sleep_data" in data:
-                    writer.writerow([])
-                    writer.writerow(["Sleep Data"])
-                    writer.writerow(["date", "hours_slept", "sleep_quality"])
-                    for entry in data["sleep_data"]:
-                        writer.writerow(
-                            [entry.get("date", ""), entry.get("hours_slept", ""), entry.get("sleep_quality", "")])
-            logger.info("CSV exported successfully to: %s", csv_path)
+            mode = data_store.export_csv_incremental(data, csv_path, get_export_state_path())
+            logger.info("CSV exported successfully (%s) to: %s", mode, csv_path)
         except Exception as e:
             logger.exception("Error exporting CSV: %s", e)
         return csv_path
@@ -1375,8 +2393,16 @@ class MeasurementApp(App):
         """
         logger = App.get_running_app().logger
         if os.path.exists(get_data_file_path()):
-            os.remove(get_data_file_path())
+            with data_store.locked(get_data_file_path()):
+                os.remove(get_data_file_path())
+                block_store.remove(get_data_file_path())
+                journal.clear(get_data_file_path())
+                notes_blob.remove(get_data_file_path())
+            if os.path.exists(get_export_state_path()):
+                os.remove(get_export_state_path())
             logger.info("Data file '%s' deleted.", get_data_file_path())
+            App.get_running_app().search_index.clear()
+            App.get_running_app().notify_data_changed()
         else:
             logger.warning("Attempt to delete non-existent data file.")
         popup.dismiss()
@@ -0,0 +1,238 @@
+"""
+Note bodies kept outside data.json.
+
+Free-text notes are the bulk of data.json but are only shown on a few screens and in
+the export. They live in an append-only blob file next to data.json
+("data.json.notes.<generation>"); data.json keeps only an index,
+
+    "notes_index": {"blob": generation, "live": bytes in use, "entries": {hour key: offset}}
+
+Each body is stored as one line holding the JSON-encoded string, so a read is a seek
+and a readline. :class:`LazyNotes` stands in for data["notes_data"], reading a body from the blob
+only when it is asked for. New and changed notes are appended when data.json is
+written; once more than half of the blob is superseded text, the live notes are
+copied into the next generation.
+"""
+import glob
+import json
+import logging
+import os
+from collections.abc import MutableMapping
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+# Blobs smaller than this are never compacted.
+MIN_COMPACT_BYTES = 64 * 1024
+
+
+def blob_path(data_file: str, generation: int) -> str:
+    """
+    :return: The blob file of one generation.
+    """
+    return f"{data_file}.notes.{generation}"
+
+
+def _encode(text: str) -> bytes:
+    return (json.dumps(text) + "\n").encode("utf-8")
+
+
+def _generations(data_file: str) -> list:
+    found = []
+    for path in glob.glob(glob.escape(data_file) + ".notes.*"):
+        suffix = path.rsplit(".", 1)[1]
+        if suffix.isdigit():
+            found.append(int(suffix))
+    return sorted(found)
+
+
+class LazyNotes(MutableMapping):
+    """
+    Mapping of hour key to note text whose values are read from the blob on access.
+
+    Stored notes are in ``entries`` (hour key -> offset); assigned notes are held in
+    ``pending`` until :meth:`flush` appends them. An hour is in at most one of the two.
+    """
+
+    def __init__(self, data_file: str, index: dict = None):
+        index = index or {}
+        self.data_file = data_file
+        self.generation = index.get("blob", 0)
+        self.entries = dict(index.get("entries", {}))
+        self.live = index.get("live", 0)
+        self.pending = {}
+        self._superseded = []
+
+    @property
+    def path(self) -> str:
+        return blob_path(self.data_file, self.generation)
+
+    def __getitem__(self, ts):
+        if ts in self.pending:
+            return self.pending[ts]
+        offset = self.entries[ts]
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        except (OSError, ValueError) as e:
+            logger.error("Cannot read note %s from %s: %s", ts, self.path, e)
+            return ""
+
+    def __setitem__(self, ts, text) -> None:
+        if ts in self.entries:
+            self._superseded.append(self.entries.pop(ts))
+        self.pending[ts] = str(text)
+
+    def __delitem__(self, ts) -> None:
+        if ts in self.entries:
+            self._superseded.append(self.entries.pop(ts))
+        else:
+            del self.pending[ts]
+
+    def __contains__(self, ts) -> bool:
+        return ts in self.entries or ts in self.pending
+
+    def __iter__(self):
+        yield from self.entries
+        yield from self.pending
+
+    def __len__(self) -> int:
+        return len(self.entries) + len(self.pending)
+
+    def items(self):
+        """
+        Yield every (hour key, text), reading the blob front to back in one pass.
+        """
+        if self.entries:
+            try:
+                with open(self.path, "rb") as f:
+                    for offset, ts in sorted((offset, ts) for ts, offset in self.entries.items()):
+                        f.seek(offset)
+                        yield ts, json.loads(f.readline())
+            except (OSError, ValueError) as e:
+                logger.error("Cannot read notes from %s: %s", self.path, e)
+        yield from self.pending.items()
+
+    def flush(self) -> dict:
+        """
+        Append the pending notes to the blob, first copying the live notes into a
+        new generation if more than half of the blob is superseded text. Call it with
+        the data.json lock held.
+
+        :return: The index to store in data.json.
+        """
+        if not os.path.exists(self.path):
+            if self.entries:
+                logger.error("Note blob %s is missing; %d notes are lost", self.path, len(self.entries))
+            self.entries = {}
+            self.live = 0
+        else:
+            if self._superseded:
+                with open(self.path, "rb") as f:
+                    for offset in self._superseded:
+                        f.seek(offset)
+                        self.live -= len(f.readline())
+            size = os.path.getsize(self.path)
+            if size > MIN_COMPACT_BYTES and size > 2 * self.live:
+                self._compact()
+        self._superseded = []
+        if self.pending:
+            with open(self.path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                for ts, text in self.pending.items():
+                    payload = _encode(text)
+                    f.write(payload)
+                    self.entries[ts] = offset
+                    offset += len(payload)
+                    self.live += len(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending = {}
+        return self.index()
+
+    def _compact(self) -> None:
+        """
+        Copy the live notes into the next generation. The old blob stays readable
+        until :func:`remove_stale` drops it after data.json points to the new one.
+        """
+        generation = max(_generations(self.data_file) + [self.generation]) + 1
+        entries = {}
+        size = 0
+        with open(blob_path(self.data_file, generation), "wb") as out:
+            with open(self.path, "rb") as f:
+                for offset, ts in sorted((offset, ts) for ts, offset in self.entries.items()):
+                    f.seek(offset)
+                    payload = f.readline()
+                    out.write(payload)
+                    entries[ts] = size
+                    size += len(payload)
+            out.flush()
+            os.fsync(out.fileno())
+        logger.info("Compacted note blob into generation %d (%d bytes)", generation, size)
+        self.generation = generation
+        self.entries = entries
+        self.live = size
+
+    def require_blob(self) -> None:
+        """
+        :raises FileNotFoundError: If notes are stored but their blob is missing, e.g.
+                                   when data.json was copied without it.
+        """
+        if self.entries and not os.path.exists(self.path):
+            raise FileNotFoundError(
+                f"{len(self.entries)} notes are stored in {os.path.basename(self.path)}, which is missing; "
+                f"copy it next to {os.path.basename(self.data_file)} and try again")
+
+    def index(self) -> dict:
+        return {"blob": self.generation, "live": self.live, "entries": dict(self.entries)}
+
+
+def attach(data_file: str, data: dict) -> dict:
+    """
+    Replace the stored "notes_index" of freshly parsed data with a :class:`LazyNotes`
+    in data["notes_data"]. Data written before notes moved out keeps its plain dict.
+
+    :return: ``data``.
+    """
+    if "notes_index" in data:
+        data["notes_data"] = LazyNotes(data_file, data.pop("notes_index"))
+    return data
+
+
+def store(data_file: str, data: dict) -> dict:
+    """
+    Append new notes to the blob and build the document to write as data.json:
+    ``data`` without "notes_data" and with "notes_index" instead. Plain note dicts
+    (older files, imports) are moved into a new blob, and data["notes_data"]
+    becomes the lazy mapping.
+
+    :return: The document to serialise.
+    """
+    notes = data.get("notes_data")
+    if notes is None:
+        return data
+    if not isinstance(notes, LazyNotes):
+        lazy = LazyNotes(data_file, {"blob": max(_generations(data_file) + [-1]) + 1})
+        lazy.pending = {ts: str(text) for ts, text in notes.items()}
+        data["notes_data"] = notes = lazy
+    document = {key: value for key, value in data.items() if key != "notes_data"}
+    document["notes_index"] = notes.flush()
+    return document
+
+
+def remove_stale(data_file: str, generation: int) -> None:
+    """
+    Delete blobs older than the one before ``generation``, which data.json now uses.
+    The previous generation is kept for readers that loaded the data just before.
+    """
+    for old in _generations(data_file):
+        if old < generation - 1:
+            os.remove(blob_path(data_file, old))
+
+
+def remove(data_file: str) -> None:
+    """
+    Delete every note blob of ``data_file``.
+    """
+    for generation in _generations(data_file):
+        os.remove(blob_path(data_file, generation))
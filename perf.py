@@ -0,0 +1,194 @@
+"""
+Lightweight performance instrumentation.
+
+Timings are folded into fixed log-spaced histograms in memory, so recording costs a
+bucket increment and memory does not grow with use. The histograms are flushed to a
+small JSON metrics file and reloaded at start-up, so percentiles cover past sessions.
+"""
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+# Bucket i covers durations up to MIN_MS * GROWTH ** i milliseconds.
+MIN_MS = 0.05
+GROWTH = 1.25
+BUCKETS = 80
+
+
+def _bucket_for(ms: float) -> int:
+    """
+    :param ms: A duration in milliseconds.
+    :return: The index of the histogram bucket holding ``ms``.
+    """
+    if ms <= MIN_MS:
+        return 0
+    return min(BUCKETS - 1, int(math.ceil(math.log(ms / MIN_MS, GROWTH))))
+
+
+def _bucket_upper(index: int) -> float:
+    """
+    :return: The upper bound, in milliseconds, of bucket ``index``.
+    """
+    return MIN_MS * GROWTH ** index
+
+
+class Histogram:
+    """
+    A log-bucketed histogram of durations for one operation.
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[_bucket_for(ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p: float) -> float:
+        """
+        :param p: The percentile, 0-100.
+        :return: The upper bound of the bucket containing the percentile, in milliseconds.
+        """
+        if not self.count:
+            return 0.0
+        target = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for index, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(_bucket_upper(index), self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        """
+        :return: A compact representation holding only the non-empty buckets.
+        """
+        return {
+            "n": self.count,
+            "sum": round(self.total_ms, 3),
+            "max": round(self.max_ms, 3),
+            "b": {str(i): c for i, c in enumerate(self.counts) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Histogram":
+        hist = cls()
+        hist.count = d.get("n", 0)
+        hist.total_ms = d.get("sum", 0.0)
+        hist.max_ms = d.get("max", 0.0)
+        for index, c in d.get("b", {}).items():
+            if 0 <= int(index) < BUCKETS:
+                hist.counts[int(index)] = c
+        return hist
+
+
+class Metrics:
+    """
+    Registry of histograms keyed by operation name.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.path = None
+
+    def record(self, op: str, seconds: float) -> None:
+        """
+        Add one timing for ``op``.
+
+        :param op: Operation name, e.g. "load_data" or "on_pre_enter:calendar".
+        :param seconds: The measured duration in seconds.
+        """
+        hist = self.histograms.get(op)
+        if hist is None:
+            hist = self.histograms[op] = Histogram()
+        hist.add(seconds * 1000.0)
+
+    def summary(self) -> list:
+        """
+        :return: A list of (op, count, p50 ms, p95 ms, max ms) sorted by op name.
+        """
+        return [(op, h.count, h.percentile(50), h.percentile(95), h.max_ms)
+                for op, h in sorted(self.histograms.items())]
+
+    def load(self, path: str) -> None:
+        """
+        Load previously flushed histograms from ``path`` and remember it for flushing.
+
+        :param path: Location of the metrics file.
+        """
+        self.path = path
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r") as f:
+                stored = json.load(f)
+            for op, d in stored.items():
+                self.histograms[op] = Histogram.from_dict(d)
+        except Exception as e:
+            logger.exception("Error loading metrics: %s", e)
+
+    def flush(self) -> None:
+        """
+        Write all histograms to the metrics file given to :meth:`load`.
+        """
+        if not self.path:
+            return
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({op: h.to_dict() for op, h in self.histograms.items()}, f,
+                          separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.exception("Error writing metrics: %s", e)
+
+    def reset(self) -> None:
+        """
+        Drop all timings, in memory and on disk.
+        """
+        self.histograms = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def measure(op: str):
+    """
+    Context manager timing the enclosed block as ``op``.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.record(op, time.perf_counter() - start)
+
+
+def timed(op: str):
+    """
+    Decorator timing every call of the wrapped function as ``op``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(op, time.perf_counter() - start)
+        return wrapper
+    return decorator
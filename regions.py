@@ -0,0 +1,92 @@
+"""
+Body regions that pain is recorded for.
+
+The default map is the six regions of the original body chart. A finer map (for
+example 20-40 dermatomes) is configured in regions.json next to the app, or in the
+file named by the PAIN_REGIONS_FILE environment variable:
+
+    {"regions": [{"key": "C5", "label": "C5 lateral arm"}, {"key": "C6"}, "C7", ...],
+     "picker_order": ["C5", "C6", ...]}
+
+The region order is the column order of exports and statistics; the optional
+"picker_order" arranges the buttons of the body-region picker (default: the region
+order). Each key names the data.json section holding that region's readings, so an hour
+only stores the regions actually scored in it and unused regions cost nothing.
+Keys must be unique and must not clash with the other data.json sections.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+DEFAULT_REGIONS = [
+    ("RU", "Right Upper"),
+    ("RL", "Right Lower"),
+    ("LU", "Left Upper"),
+    ("LL", "Left Lower"),
+    ("Axial", "Axial"),
+    ("Head", "Head"),
+]
+# The picker lays the default regions out like the body: left, head, right.
+DEFAULT_PICKER_ORDER = ["LU", "Head", "RU", "LL", "Axial", "RL"]
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regions.json")
+# data.json sections and metric names that cannot be region keys.
+RESERVED_KEYS = {"meta", "activity_data", "notes_data", "notes_index", "sleep_data", "medication_data",
+                 "rollups", "flare", "Pain (Arb.)", "All regions"}
+
+
+def config_path() -> str:
+    """
+    :return: The region config file to read: $PAIN_REGIONS_FILE or regions.json next to the app.
+    """
+    return os.environ.get("PAIN_REGIONS_FILE") or CONFIG_FILE
+
+
+def parse_config(config: dict) -> dict:
+    """
+    :param config: The parsed config, {"regions": [key or {"key": ..., "label": ...}],
+                   "picker_order": [key] (optional)}.
+    :return: {"regions": [(key, label)] in display order, "picker_order": [key]}.
+    :raises ValueError: If the region list is empty, malformed or has duplicate or
+                        reserved keys, or the picker order is not a permutation of it.
+    """
+    items = config.get("regions") if isinstance(config, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError("The region config needs a non-empty \"regions\" list")
+    result = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"key": item}
+        key = item.get("key") if isinstance(item, dict) else None
+        if not isinstance(key, str) or not key.strip():
+            raise ValueError(f"Region without a key: {item!r}")
+        if key in RESERVED_KEYS:
+            raise ValueError(f"Region key {key!r} is reserved")
+        result.append((key, str(item.get("label") or key)))
+    keys = [key for key, _ in result]
+    if len(set(keys)) != len(keys):
+        raise ValueError("Region keys must be unique")
+    picker_order = config.get("picker_order", keys)
+    if not isinstance(picker_order, list) or sorted(picker_order, key=str) != sorted(keys):
+        raise ValueError("\"picker_order\" must list every region key once")
+    return {"regions": result, "picker_order": picker_order}
+
+
+def load_config(path: str = None) -> dict:
+    """
+    :param path: The config file; defaults to :func:`config_path`.
+    :return: As :func:`parse_config`; the default regions if there is no config file.
+    :raises ValueError: If the config file cannot be read or is invalid.
+    """
+    path = path or config_path()
+    if not os.path.exists(path):
+        return {"regions": list(DEFAULT_REGIONS), "picker_order": list(DEFAULT_PICKER_ORDER)}
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read the region config {path}: {e}") from e
+    result = parse_config(config)
+    logger.info("Loaded %d body regions from %s", len(result["regions"]), path)
+    return result
@@ -0,0 +1,227 @@
+"""
+Inverted index over notes and activity names.
+
+Terms map to the hour keys whose note or activity names contain them. The index is
+kept up to date hour by hour as notes and activities are saved and persisted next to
+data.json, so it is only built from scratch when the index file does not exist yet.
+
+Saving one hour appends that hour's terms to a delta log ("search_index.json.log")
+instead of rewriting the index file; loading replays the log over the file, and
+once DELTA_LIMIT hours have been logged the index file is rewritten and the log
+dropped.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger("MeasurementAppLogger")
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Logged hour updates after which the index file is rewritten.
+DELTA_LIMIT = 500
+
+
+def tokenize(text: str) -> list:
+    """
+    :param text: Free text.
+    :return: The lower-cased word tokens of ``text``.
+    """
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def hour_text(data: dict, ts: str) -> str:
+    """
+    :param data: The loaded data dictionary.
+    :param ts: An hour key.
+    :return: The searchable text of that hour: its note and activity names.
+    """
+    names = [e.get("activity_name", "") for e in data.get("activity_data", {}).get(ts, [])]
+    return " ".join([data.get("notes_data", {}).get(ts, "")] + names)
+
+
+class SearchIndex:
+    """
+    Term -> hour keys postings plus the reverse hour -> terms map needed to update
+    an hour in place.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.postings = {}
+        self.docs = {}
+        self._sorted_terms = None
+        self._deltas = 0
+
+    @property
+    def delta_path(self) -> str:
+        return self.path + ".log"
+
+    def index_hour(self, ts: str, text: str) -> None:
+        """
+        Replace the indexed terms of one hour.
+
+        :param ts: The hour key.
+        :param text: The full searchable text of the hour (empty removes it).
+        """
+        self._set_terms(ts, set(tokenize(text)))
+
+    def _set_terms(self, ts: str, new_terms: set) -> None:
+        old_terms = set(self.docs.get(ts, []))
+        for term in old_terms - new_terms:
+            hours = self.postings.get(term)
+            if hours is not None:
+                hours.discard(ts)
+                if not hours:
+                    del self.postings[term]
+                    self._sorted_terms = None
+        for term in new_terms - old_terms:
+            if term not in self.postings:
+                self.postings[term] = set()
+                self._sorted_terms = None
+            self.postings[term].add(ts)
+        if new_terms:
+            self.docs[ts] = sorted(new_terms)
+        else:
+            self.docs.pop(ts, None)
+
+    def update_from_data(self, data: dict, ts: str) -> None:
+        """
+        Re-index one hour from the stored data and persist the change to the delta log.
+
+        :param data: The loaded data dictionary (after the save).
+        :param ts: The hour key that changed.
+        """
+        self.index_hour(ts, hour_text(data, ts))
+        if not self.path:
+            return
+        if self._deltas + 1 >= DELTA_LIMIT:
+            self.save()
+            return
+        try:
+            with open(self.delta_path, "a") as f:
+                f.write(json.dumps({"ts": ts, "terms": self.docs.get(ts, [])}, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._deltas += 1
+        except Exception as e:
+            logger.exception("Error writing search index delta, rewriting the index: %s", e)
+            self.save()
+
+    def rebuild(self, data: dict) -> None:
+        """
+        Index every hour with a note or activity from scratch.
+
+        :param data: The loaded data dictionary.
+        """
+        self.postings = {}
+        self.docs = {}
+        self._sorted_terms = None
+        # Read the note bodies in one pass over the note blob, not one read per hour.
+        texts = {"notes_data": dict(data.get("notes_data", {}).items()),
+                 "activity_data": data.get("activity_data", {})}
+        hours = set(texts["notes_data"]) | set(texts["activity_data"])
+        for ts in hours:
+            self.index_hour(ts, hour_text(texts, ts))
+
+    def _terms_with_prefix(self, prefix: str) -> list:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\uffff")
+        return self._sorted_terms[start:end]
+
+    def search(self, query: str) -> list:
+        """
+        Find the hours matching every word of ``query``. Each word is matched as a
+        prefix, so "migr" finds "migraine".
+
+        :param query: Free text query.
+        :return: Matching hour keys, newest first.
+        """
+        result = None
+        for word in tokenize(query):
+            hours = set()
+            for term in self._terms_with_prefix(word):
+                hours |= self.postings[term]
+            result = hours if result is None else result & hours
+            if not result:
+                return []
+        return sorted(result or [], reverse=True)
+
+    def load(self, data_loader) -> None:
+        """
+        Load the persisted index, or build and persist it if there is none yet.
+
+        :param data_loader: Callable returning the data dictionary, only used when
+                            the index has to be built.
+        """
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    stored = json.load(f)
+                self.docs = stored.get("docs", {})
+                self.postings = {term: set(hours) for term, hours in stored.get("terms", {}).items()}
+                self._sorted_terms = None
+                if not self._replay_deltas():
+                    # Start a clean log rather than appending after a torn line.
+                    self.save()
+                return
+            except Exception as e:
+                logger.exception("Error loading search index, rebuilding: %s", e)
+        self.rebuild(data_loader())
+        self.save()
+
+    def _replay_deltas(self) -> bool:
+        """
+        Apply the logged hour updates over the loaded index file. A line cut short
+        by a crash is skipped.
+
+        :return: False if a line had to be skipped.
+        """
+        self._deltas = 0
+        intact = True
+        if not os.path.exists(self.delta_path):
+            return intact
+        with open(self.delta_path, "r") as f:
+            for line in f:
+                try:
+                    delta = json.loads(line)
+                    self._set_terms(delta["ts"], set(delta["terms"]))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Skipping unreadable search index delta: %r", line[:80])
+                    intact = False
+                    continue
+                self._deltas += 1
+        return intact
+
+    def save(self) -> None:
+        """
+        Persist the whole index to its file and drop the delta log.
+        """
+        if not self.path:
+            return
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"terms": {t: sorted(h) for t, h in self.postings.items()},
+                           "docs": self.docs}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            if os.path.exists(self.delta_path):
+                os.remove(self.delta_path)
+            self._deltas = 0
+        except Exception as e:
+            logger.exception("Error writing search index: %s", e)
+
+    def clear(self) -> None:
+        """
+        Drop the index in memory and on disk.
+        """
+        self.postings = {}
+        self.docs = {}
+        self._sorted_terms = None
+        self._deltas = 0
+        for path in (self.path, self.path and self.delta_path):
+            if path and os.path.exists(path):
+                os.remove(path)
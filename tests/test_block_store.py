@@ -0,0 +1,19 @@
+import block_store
+import data_store
+
+
+def test_snapshot_keeps_other_block_current(tmp_path):
+    data_file = str(tmp_path / "data.json")
+    data = {}
+    data_store.save_measurement(data, "RU", "2024-01-01 08:00:00", 3.0)
+    data_store.write_data(data_file, data)
+
+    # A later reading changes a monthly block and, through the rollups, the other block.
+    data = data_store.load_data(data_file)
+    data_store.save_measurement(data, "RU", "2024-01-01 09:00:00", 9.0)
+    data_store.write_data(data_file, data)
+
+    recovered, lost = block_store.recover(data_file)
+    assert lost == []
+    assert recovered["rollups"] == data_store.load_data(data_file)["rollups"]
+    assert recovered["rollups"]["version"] == data["meta"]["version"]
@@ -0,0 +1,19 @@
+import csv
+
+import cli
+import data_store
+
+
+def test_stream_export_applies_journalled_deletions(tmp_path):
+    data_file = str(tmp_path / "data.json")
+    data = {}
+    data_store.save_measurement(data, "RU", "2024-01-01 08:00:00", 3.0)
+    data_store.save_measurement(data, "RU", "2024-01-01 09:00:00", 4.0)
+    data_store.write_data(data_file, data)
+    data_store.edit_entry(data_file, data_store.load_data(data_file), "pain", "2024-01-01 08:00:00", None, "RU")
+
+    csv_path = str(tmp_path / "export.csv")
+    assert cli.main([data_file, "--export", csv_path, "--stream"]) == 0
+    with open(csv_path, newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    assert [row[0] for row in rows] == ["01/01/2024 09:00"]
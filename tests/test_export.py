@@ -0,0 +1,62 @@
+import csv
+
+import data_store
+
+
+def _history(day: str, hours: int) -> dict:
+    data = {}
+    for hour in range(hours):
+        data_store.save_measurement(data, "RU", f"{day} {hour:02d}:00:00", 3.0)
+    return data
+
+
+def _rows(csv_path) -> list:
+    with open(csv_path, newline="") as f:
+        return [row for row in csv.reader(f)][1:]
+
+
+def test_export_after_delete_rebuilds(tmp_path):
+    csv_path = str(tmp_path / "export.csv")
+    state_path = str(tmp_path / "export_state.json")
+    assert data_store.export_csv_incremental(_history("2024-01-01", 10), csv_path, state_path) == "full"
+
+    # "Delete all data" starts a new history with a new file id, here at a higher version.
+    fresh = _history("2024-02-01", 12)
+    assert data_store.export_csv_incremental(fresh, csv_path, state_path) == "full"
+
+    rows = _rows(csv_path)
+    assert len(rows) == 12
+    assert all(row[0].startswith("01/02/2024") for row in rows)
+
+
+def test_export_incremental_matches_full(tmp_path):
+    csv_path = str(tmp_path / "export.csv")
+    state_path = str(tmp_path / "export_state.json")
+    data = _history("2024-01-01", 10)
+    data_store.export_csv_incremental(data, csv_path, state_path)
+    data_store.save_measurement(data, "RU", "2024-01-02 08:00:00", 5.0)
+    assert data_store.export_csv_incremental(data, csv_path, state_path) == "incremental"
+
+    full_path = str(tmp_path / "full.csv")
+    data_store.export_csv(data, full_path)
+    with open(csv_path, "rb") as a, open(full_path, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_incremental_export_lists_long_doses_from_before_the_watermark(tmp_path):
+    csv_path = str(tmp_path / "export.csv")
+    state_path = str(tmp_path / "export_state.json")
+    data = _history("2024-01-01", 10)
+    data_store.add_medication(data, {"timestamp": "2024-01-01 02:00:00", "name": "Long", "dose": "1",
+                                     "duration_hours": 48})
+    data_store.add_medication(data, {"timestamp": "2024-01-01 01:00:00", "name": "Short", "dose": "1",
+                                     "duration_hours": 2})
+    data_store.export_csv_incremental(data, csv_path, state_path)
+    data_store.save_measurement(data, "RU", "2024-01-02 08:00:00", 5.0)
+    assert data_store.export_csv_incremental(data, csv_path, state_path) == "incremental"
+
+    full_path = str(tmp_path / "full.csv")
+    data_store.export_csv(data, full_path)
+    with open(csv_path, "rb") as a, open(full_path, "rb") as b:
+        assert a.read() == b.read()
+    assert _rows(csv_path)[-1][-1] == "[Long 1]"
@@ -0,0 +1,28 @@
+import data_store
+import flare
+
+HOUR = "2024-01-01 08:00:00"
+
+
+def _observe(data, section, value):
+    data_store.save_measurement(data, section, HOUR, value)
+    return flare.observe(data, section, HOUR, value)
+
+
+def test_arb_follows_edits_of_the_hour(tmp_path):
+    data_file = str(tmp_path / "data.json")
+    data = {}
+    flare.configure(data, arb_threshold=0.0)
+    _observe(data, "RU", 10.0)
+    _observe(data, "LU", 10.0)
+    data_store.write_data(data_file, data)
+
+    # Deleting both readings through the journal leaves the hour empty ...
+    data = data_store.load_data(data_file)
+    data_store.edit_entry(data_file, data, "pain", HOUR, None, "RU")
+    data_store.edit_entry(data_file, data, "pain", HOUR, None, "LU")
+    data = data_store.load_data(data_file)
+
+    # ... so a new low reading is scored on its own, not with the deleted ones.
+    reasons = _observe(data, "RL", 1.0)
+    assert reasons[data_store.ARB_METRIC] == round(data_store.pain_arb({"RL": 1.0}), 2)
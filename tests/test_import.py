@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import bulk_import
+import data_store
+
+
+def test_json_import_skips_malformed_sleep_and_activity(tmp_path):
+    path = str(tmp_path / "other.json")
+    with open(path, "w") as f:
+        json.dump({
+            "activity_data": {"2024-01-01 08:00:00": [{"activity_level": 2, "activity_name": "Walk"}, "bad"],
+                              "yesterday": [{"activity_level": 1, "activity_name": "Run"}]},
+            "sleep_data": [{"date": "2024-01-01", "hours_slept": "7.5", "sleep_quality": 4},
+                           {"date": "01/02/2024", "hours_slept": 7, "sleep_quality": 4},
+                           {"date": "2024-01-03", "sleep_quality": 4}],
+        }, f)
+    data = {}
+    report = bulk_import.import_file(data, path)
+
+    assert report.skipped == 4
+    assert data["activity_data"] == {"2024-01-01 08:00:00": [{"activity_level": "2", "activity_name": "Walk"}]}
+    assert data["sleep_data"] == [{"date": "2024-01-01", "hours_slept": 7.5, "sleep_quality": 4}]
+
+
+def test_json_import_replays_the_source_journal(tmp_path):
+    path = str(tmp_path / "other.json")
+    source = {}
+    data_store.save_measurement(source, "RU", "2024-01-01 08:00:00", 3.0)
+    data_store.save_measurement(source, "RU", "2024-01-01 09:00:00", 4.0)
+    data_store.write_data(path, source)
+    data_store.edit_entry(path, data_store.load_data(path), "pain", "2024-01-01 08:00:00", None, "RU")
+
+    data = {}
+    bulk_import.import_file(data, path)
+    assert data["RU"] == [{"value": 4.0, "timestamp": "2024-01-01 09:00:00"}]
+
+
+def test_json_import_fails_without_the_note_blob(tmp_path):
+    path = str(tmp_path / "other.json")
+    source = {"notes_data": {"2024-01-01 08:00:00": "Stiff neck"}}
+    data_store.save_measurement(source, "RU", "2024-01-01 08:00:00", 3.0)
+    data_store.write_data(path, source)
+
+    data = {}
+    assert bulk_import.import_file(data, path).added == 2
+    assert data["notes_data"] == {"2024-01-01 08:00:00": "Stiff neck"}
+
+    copied = str(tmp_path / "copied.json")
+    with open(path) as src, open(copied, "w") as dst:
+        dst.write(src.read())
+    data = {}
+    with pytest.raises(FileNotFoundError):
+        bulk_import.import_file(data, copied)
+    assert "RU" not in data and not data.get("notes_data")
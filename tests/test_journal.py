@@ -0,0 +1,37 @@
+import threading
+import time
+
+import pytest
+
+import data_store
+
+
+def test_compact_gives_up_while_another_writer_holds_the_lock(tmp_path):
+    data_file = str(tmp_path / "data.json")
+    data = {}
+    data_store.save_measurement(data, "RU", "2024-01-01 08:00:00", 3.0)
+    data_store.write_data(data_file, data)
+    data_store.edit_entry(data_file, data_store.load_data(data_file), "pain", "2024-01-01 08:00:00", 5.0, "RU")
+
+    taken, release = threading.Event(), threading.Event()
+
+    def writer():
+        with data_store.locked(data_file):
+            taken.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        taken.wait(5)
+        start = time.monotonic()
+        with pytest.raises(data_store.ConflictError):
+            data_store.compact(data_file, timeout=0.05)
+        assert time.monotonic() - start < data_store.LOCK_TIMEOUT
+    finally:
+        release.set()
+        thread.join()
+
+    # The edit was kept in the journal and is folded in once the lock is free.
+    assert data_store.compact(data_file)
+    assert data_store.load_data(data_file)["RU"][0]["value"] == 5.0
@@ -0,0 +1,22 @@
+import numpy as np
+
+import analysis
+import data_store
+
+HOUR = {"RU": 6.0, "LU": 3.0}
+
+
+def test_extra_regions_do_not_change_pain_arb(monkeypatch):
+    before = data_store.pain_arb(HOUR)
+    assert before == 1.0
+
+    extended = data_store.PAIN_SECTIONS + ["C5", "C6", "T1"]
+    monkeypatch.setattr(data_store, "PAIN_SECTIONS", extended)
+    monkeypatch.setattr(analysis, "PAIN_SECTIONS", extended)
+
+    assert data_store.pain_arb(HOUR) == before
+    assert data_store.pain_arb(dict(HOUR, C5=0)) == before
+    dense = np.array([[6.0, np.nan, 3.0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan]])
+    assert analysis.pain_arb_array(dense).tolist() == [before]
+    sparse = analysis.pain_arb_sparse(np.array([0, 2]), np.array([6.0, 3.0]))
+    assert sparse.tolist() == [before]
@@ -0,0 +1,34 @@
+import json
+
+import data_store
+
+
+def _full(data: dict) -> dict:
+    fresh = json.loads(json.dumps({k: v for k, v in data.items() if k != "rollups"}))
+    rollups = data_store.refresh_rollups(fresh)
+    return {level: rollups[level] for level in ("day", "week", "month")}
+
+
+def test_incremental_rollups_match_a_full_rebuild(tmp_path):
+    data_file = str(tmp_path / "data.json")
+    # Entries written out of order, as by older versions, are sorted on load.
+    data = {"RU": [{"value": 4.0, "timestamp": "2024-03-02 10:00:00"},
+                   {"value": 2.0, "timestamp": "2024-03-01 09:00:00"}]}
+    data_store.write_data(data_file, data)
+    data = data_store.load_data(data_file)
+    assert [e["timestamp"] for e in data["RU"]] == ["2024-03-01 09:00:00", "2024-03-02 10:00:00"]
+
+    data_store.save_measurement(data, "RU", "2024-03-01 08:00:00", 7.0)
+    data_store.save_measurement(data, "LU", "2024-03-01 09:00:00", 5.0)
+    data_store.save_measurements(data, [("RU", "2024-04-30 23:00:00", 1.0), ("RU", "2024-03-02 10:00:00", 9.0)])
+    data_store.upsert_sleep(data, {"date": "2024-03-02", "hours_slept": 6.5, "sleep_quality": 3})
+    data_store.write_data(data_file, data)
+
+    data = data_store.load_data(data_file)
+    data_store.edit_entry(data_file, data, "pain", "2024-03-01 09:00:00", None, "RU")
+    data_store.write_data(data_file, data)
+
+    data = data_store.load_data(data_file)
+    rollups = data["rollups"]
+    assert {level: rollups[level] for level in ("day", "week", "month")} == _full(data)
+    assert rollups["day"]["2024-03-01"]["RU"] == [1, 7.0, 7.0, 7.0]